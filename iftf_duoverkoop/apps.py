@@ -8,3 +8,7 @@ class IftfApp(AppConfig):
     def ready(self):
         # Ensure login/logout signal receivers in src/core/models.py are registered.
         import iftf_duoverkoop.src.core.models  # noqa: F401
+        # Ensure the email template cache invalidation receivers are registered.
+        import iftf_duoverkoop.src.core.email  # noqa: F401
+        # Ensure the permission-version receivers in src/core/auth.py are registered.
+        import iftf_duoverkoop.src.core.auth  # noqa: F401
@@ -0,0 +1,2 @@
+# Django management command proxy – actual implementation in src/management/commands/
+from iftf_duoverkoop.src.management.commands.archive_audit_logs import Command  # noqa: F401
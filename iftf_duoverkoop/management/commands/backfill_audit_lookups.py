@@ -0,0 +1,2 @@
+# Django management command proxy – actual implementation in src/management/commands/
+from iftf_duoverkoop.src.management.commands.backfill_audit_lookups import Command  # noqa: F401
@@ -0,0 +1,2 @@
+# Django management command proxy – actual implementation in src/management/commands/
+from iftf_duoverkoop.src.management.commands.benchmark_email_render import Command  # noqa: F401
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('iftf_duoverkoop', '0018_alter_emailtemplatesettings_html_template_address_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailResendJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('date_from', models.DateField(blank=True, help_text='Only purchases made on or after this date.', null=True)),
+                ('date_to', models.DateField(blank=True, help_text='Only purchases made on or before this date.', null=True)),
+                ('purchase_ids', models.JSONField(blank=True, default=list, help_text='Purchases selected when the job was created; the job only resends these.')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('PARTIAL_FAILED', 'Partially failed'), ('FAILED', 'Failed')], db_index=True, default='QUEUED', max_length=20)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('associations', models.ManyToManyField(blank=True, to='iftf_duoverkoop.association')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='email_resend_jobs_created', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iftf_duoverkoop', '0019_emailresendjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databaseoperation',
+            name='parallel_jobs',
+            field=models.PositiveSmallIntegerField(default=1, help_text='pg_dump/pg_restore worker count; backups with more than one job use the directory format.'),
+        ),
+        migrations.AddField(
+            model_name='databaseoperation',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Seconds spent per phase, e.g. {"dump": 12.3, "pack": 0.8} or {"restore": 30.1}.'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iftf_duoverkoop', '0020_databaseoperation_parallel_jobs_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databaseoperation',
+            name='depends_on',
+            field=models.ForeignKey(blank=True, help_text='Operation that has to finish first, e.g. the safety backup taken before a restore.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dependents', to='iftf_duoverkoop.databaseoperation'),
+        ),
+        migrations.AddField(
+            model_name='databaseoperation',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='databaseoperation',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='databaseoperation',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='emailcampaign',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailcampaign',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailcampaign',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='emailresendjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailresendjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailresendjob',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.13 on 2026-10-19 17:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iftf_duoverkoop', '0021_job_leases'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loginauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='purchaseauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='When the action occurred'),
+        ),
+    ]
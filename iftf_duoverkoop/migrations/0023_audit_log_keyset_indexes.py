@@ -0,0 +1,54 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+USERNAME_INDEX = 'iftf_login_username_prefix_idx'
+
+
+def add_username_prefix_index(apps, schema_editor):
+    # The dashboard filters login events with username__istartswith.  Each
+    # backend needs its own index shape for that LIKE to use an index.
+    table = schema_editor.quote_name(apps.get_model('iftf_duoverkoop', 'LoginAuditLog')._meta.db_table)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {USERNAME_INDEX} ON {table} '
+            f'(UPPER("username"::text) text_pattern_ops, "timestamp" DESC)'
+        )
+    elif vendor == 'sqlite':
+        # SQLite's LIKE is case-insensitive and only uses NOCASE indexes.
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {USERNAME_INDEX} ON {table} ("username" COLLATE NOCASE, "timestamp" DESC)'
+        )
+
+
+def drop_username_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {USERNAME_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iftf_duoverkoop', '0022_audit_log_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='loginauditlog',
+            name='iftf_duover_timesta_714ed4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='purchaseauditlog',
+            name='iftf_duover_timesta_482972_idx',
+        ),
+        migrations.AddIndex(
+            model_name='loginauditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='iftf_duover_timesta_b97250_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseauditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='iftf_duover_timesta_90780d_idx'),
+        ),
+        migrations.RunPython(add_username_prefix_index, drop_username_prefix_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('iftf_duoverkoop', '0023_audit_log_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseAuditLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('email', 'Email'), ('code', 'Verification code'), ('ticket', 'Ticket')], max_length=10)),
+                ('value', models.CharField(max_length=254)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookups', to='iftf_duoverkoop.purchaseauditlog')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='purchaseauditlookup',
+            index=models.Index(fields=['value', 'kind'], name='iftf_duover_value_45374b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='purchaseauditlookup',
+            constraint=models.UniqueConstraint(fields=('entry', 'kind', 'value'), name='unique_audit_lookup'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.13 on 2026-10-19 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('iftf_duoverkoop', '0024_purchase_audit_lookup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Admission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('admitted_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('scan_id', models.CharField(help_text='Identifies the check-in request that inserted this row', max_length=32)),
+                ('admitted_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='admissions', to=settings.AUTH_USER_MODEL)),
+                ('performance', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='admissions', to='iftf_duoverkoop.performance')),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='admissions', to='iftf_duoverkoop.purchase')),
+            ],
+            options={
+                'ordering': ['-admitted_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='admission',
+            index=models.Index(fields=['performance', '-admitted_at'], name='iftf_duover_perform_4d8318_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='admission',
+            constraint=models.UniqueConstraint(fields=('purchase', 'performance'), name='unique_admission'),
+        ),
+    ]
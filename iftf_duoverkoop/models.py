@@ -2,14 +2,17 @@
 # All model definitions live in src/core/models.py.
 from iftf_duoverkoop.src.core.models import (  # noqa: F401
     Address,
+    Admission,
     Association,
     AssociationRepProfile,
     DatabaseOperation,
     EmailCampaign,
     EmailCampaignRecipient,
+    EmailResendJob,
     EmailTemplateSettings,
     Performance,
     Purchase,
     PurchaseAuditLog,
+    PurchaseAuditLookup,
     LoginAuditLog,
 )
@@ -62,11 +62,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise for static files, plus the association logos under MEDIA_ROOT.
+    'iftf_duoverkoop.src.core.middleware.MediaFilesMiddleware',
+    # Write the request's audit log entries in one bulk insert after the view.
+    'iftf_duoverkoop.src.core.middleware.AuditBufferMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Serve group/permission checks from the session instead of the database.
+    'iftf_duoverkoop.src.core.middleware.RoleCacheMiddleware',
     # Block mutating app traffic while a database restore is active.
     'iftf_duoverkoop.src.core.middleware.RestoreMaintenanceLockMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -153,6 +158,27 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'iftf_duoverkoop' / 'media'
 DATABASE_BACKUP_DIR = MEDIA_ROOT / 'backups'
 DATABASE_BACKUP_MAX_UPLOAD_MB = int(os.environ.get('DATABASE_BACKUP_MAX_UPLOAD_MB', '300'))
+# pg_dump/pg_restore workers per operation; 1 dumps one custom-format file, more (or 'auto',
+# one per CPU up to 4) makes parallel .tar backups.
+DATABASE_BACKUP_JOBS = os.environ.get('DATABASE_BACKUP_JOBS', '1')
+# Retention for the deduplicated backup store: last N backups plus one per day for M days.
+# Pre-restore safety backups are always kept.
+DATABASE_BACKUP_KEEP_LAST = int(os.environ.get('DATABASE_BACKUP_KEEP_LAST', '7'))
+DATABASE_BACKUP_KEEP_DAILY_DAYS = int(os.environ.get('DATABASE_BACKUP_KEEP_DAILY_DAYS', '14'))
+# Audit log entries that could not be written are spooled here and replayed on the next write.
+AUDIT_SPOOL_DIR = Path(os.environ.get('AUDIT_SPOOL_DIR', BASE_DIR / 'var' / 'audit-spool'))
+# Audit log entries older than this many days are moved to compressed files in
+# AUDIT_ARCHIVE_DIR (`python manage.py archive_audit_logs`, or daily by run_jobs); 0 disables it.
+# The archive is kept out of MEDIA_ROOT so it is never served publicly.
+AUDIT_ARCHIVE_AFTER_DAYS = int(os.environ.get('AUDIT_ARCHIVE_AFTER_DAYS', '0'))
+AUDIT_ARCHIVE_DIR = Path(os.environ.get('AUDIT_ARCHIVE_DIR', BASE_DIR / 'var' / 'audit-archive'))
+
+# Background jobs (backups, restores, email campaigns, resends): 'thread' runs them in
+# the web process; 'worker' only queues them for `python manage.py run_jobs`.
+JOB_RUNNER = os.environ.get('JOB_RUNNER', 'thread').strip().lower()
+# A worker renews its lease on a running job every third of this; once it expires
+# (the worker died) another worker takes the job over.
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -167,6 +193,8 @@ MAILGUN_API_BASE_URL = os.environ.get("MAILGUN_API_BASE_URL", "https://api.eu.ma
 MAILGUN_FROM_EMAIL = os.environ.get("MAILGUN_FROM_EMAIL", "no-reply@mg.iftfduoverkoop.dpdns.org")
 MAILGUN_FROM_NAME = os.environ.get("MAILGUN_FROM_NAME", "IFTF Duoverkoop")
 MAIL_REQUEST_TIMEOUT = int(os.environ.get("MAIL_REQUEST_TIMEOUT", "15"))
+# Upper bound on Mailgun calls per second for bulk resends of failed confirmation mails.
+EMAIL_RESEND_RATE_PER_SECOND = float(os.environ.get("EMAIL_RESEND_RATE_PER_SECOND", "5"))
 IFTF_LOGO_URL = os.environ.get("IFTF_LOGO_URL", "/static/Site%20logo.png")
 
 # Kept for compatibility with parts of Django that rely on DEFAULT_FROM_EMAIL.
@@ -8,11 +8,13 @@ from django.conf import settings
 
 from iftf_duoverkoop.src.core.models import (
     Address,
+    Admission,
     Association,
     AssociationRepProfile,
     DatabaseOperation,
     EmailCampaign,
     EmailCampaignRecipient,
+    EmailResendJob,
     EmailTemplateSettings,
     Performance,
     Purchase,
@@ -71,6 +73,22 @@ class PurchaseAdmin(admin.ModelAdmin):
     readonly_fields = ['verification_code', 'created_by', 'date', 'email_status']
 
 
+@admin.register(Admission)
+class AdmissionAdmin(admin.ModelAdmin):
+    """Door check-ins; deleting one lets a wrongly scanned ticket in again."""
+    list_display = ['id', 'purchase', 'performance', 'admitted_at', 'admitted_by']
+    list_filter = ['performance__association', 'performance', 'admitted_at']
+    search_fields = ['purchase__verification_code', 'purchase__name', 'admitted_by__username']
+    readonly_fields = ['purchase', 'performance', 'admitted_at', 'admitted_by', 'scan_id']
+    ordering = ['-admitted_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(PurchaseAuditLog)
 class PurchaseAuditLogAdmin(admin.ModelAdmin):
     """Admin interface for purchase audit logs — read-only for security."""
@@ -122,6 +140,7 @@ class DatabaseOperationAdmin(admin.ModelAdmin):
         'operation_type', 'status', 'created_at', 'started_at', 'finished_at',
         'created_by', 'backup_filename', 'original_upload_name', 'file_size_bytes',
         'file_sha256', 'is_pre_restore_backup', 'notes', 'output_log', 'error_message',
+        'depends_on', 'lease_owner', 'lease_expires_at', 'heartbeat_at',
     ]
     ordering = ['-created_at']
 
@@ -176,6 +195,7 @@ class EmailCampaignAdmin(admin.ModelAdmin):
     readonly_fields = [
         'created_at', 'started_at', 'finished_at',
         'status', 'total_recipients', 'sent_count', 'failed_count', 'error_message',
+        'lease_owner', 'lease_expires_at', 'heartbeat_at',
     ]
 
 
@@ -196,3 +216,15 @@ class EmailCampaignRecipientAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(EmailResendJob)
+class EmailResendJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'total_count', 'sent_count', 'failed_count', 'created_by', 'created_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = [
+        'created_by', 'created_at', 'started_at', 'finished_at', 'purchase_ids',
+        'status', 'total_count', 'sent_count', 'failed_count', 'error_message',
+        'lease_owner', 'lease_expires_at', 'heartbeat_at',
+    ]
+
+    def has_add_permission(self, request):
+        return False
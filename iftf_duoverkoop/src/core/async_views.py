@@ -0,0 +1,58 @@
+"""
+Async counterparts of the view decorators used by the JSON endpoints.
+
+Django 4.1's ``login_required``, ``permission_required`` and
+``require_http_methods`` wrap a view in a sync function, which turns an
+async view back into a sync one.  These check the same things without
+leaving the event loop: by the time a view runs, RoleCacheMiddleware has
+resolved ``request.user`` and filled its permission cache from the session,
+so neither check queries the database.
+"""
+from functools import wraps
+
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseNotAllowed
+from django.utils.log import log_response
+
+
+def login_required(view_func):
+    """Redirect anonymous users to the login page, like django.contrib.auth's decorator."""
+    @wraps(view_func)
+    async def _wrapped(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+def permission_required(perm: str):
+    """Answer 403 without *perm*; the sync decorator with ``raise_exception=True``."""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped(request, *args, **kwargs):
+            if not request.user.has_perm(perm):
+                raise PermissionDenied
+            return await view_func(request, *args, **kwargs)
+        return _wrapped
+    return decorator
+
+
+def require_http_methods(methods: list[str]):
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                response = HttpResponseNotAllowed(methods)
+                log_response(
+                    'Method Not Allowed (%s): %s', request.method, request.path,
+                    response=response, request=request,
+                )
+                return response
+            return await view_func(request, *args, **kwargs)
+        return _wrapped
+    return decorator
+
+
+require_GET = require_http_methods(['GET'])
+require_POST = require_http_methods(['POST'])
@@ -0,0 +1,293 @@
+"""
+Buffered audit log writer.
+
+Purchase and login audit entries are not inserted one row at a time in the
+request path.  ``record()`` hands each entry to ``transaction.on_commit``, so
+an entry whose transaction rolls back (the sale did not happen) is dropped
+with it.  Committed entries are queued per request and written with a single
+``bulk_create`` when AuditBufferMiddleware finishes the request.  Outside a
+request (management commands, background threads) they are written as soon
+as their transaction commits.
+
+If that insert fails the entries are appended to a JSONL spool file under
+AUDIT_SPOOL_DIR, and the next successful flush replays the spool, so a
+database hiccup does not lose audit records.  A spool file that does not
+insert in one go is replayed entry by entry: references to rows deleted in
+the meantime are cleared, and entries that still fail are moved to an
+``audit-quarantine-*`` file next to it instead of blocking the rest.  The
+directory is only scanned when this process spooled something (or has not
+looked since it started).
+
+Purchase entries get their PurchaseAuditLookup rows (emails, verification
+codes, tickets found in ``changes``) in the same transaction.
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+logger = logging.getLogger(__name__)
+
+SPOOL_SUFFIX = '.jsonl'
+SPOOL_REPLAY_SUFFIX = '.replaying'
+QUARANTINE_SUFFIX = '.quarantine'
+
+# Whether the spool directory may hold files to replay.  True at start-up,
+# so leftovers of an earlier process are picked up by the first flush.
+_spool_pending = True
+
+_request_buffer: contextvars.ContextVar = contextvars.ContextVar('audit_request_buffer', default=None)
+
+
+def _spool_dir() -> Path:
+    return Path(getattr(settings, 'AUDIT_SPOOL_DIR', Path(settings.BASE_DIR) / 'var' / 'audit-spool'))
+
+
+# ---------------------------------------------------------------------------
+# Buffering
+# ---------------------------------------------------------------------------
+
+def begin_request() -> contextvars.Token:
+    return _request_buffer.set([])
+
+
+def end_request(token: contextvars.Token) -> None:
+    entries = _request_buffer.get()
+    _request_buffer.reset(token)
+    if entries:
+        flush(entries)
+
+
+async def aend_request(token: contextvars.Token) -> None:
+    """end_request() for async requests: the token is reset here, the insert runs in the sync thread."""
+    entries = _request_buffer.get()
+    _request_buffer.reset(token)
+    if entries:
+        await sync_to_async(flush)(entries)
+
+
+def _on_committed(entry) -> None:
+    buffer = _request_buffer.get()
+    if buffer is not None:
+        buffer.append(entry)
+    else:
+        flush([entry])
+
+
+def record(entry) -> None:
+    """Queue an unsaved PurchaseAuditLog/LoginAuditLog; it is written once its transaction commits."""
+    transaction.on_commit(lambda: _on_committed(entry))
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def _group_by_model(entries) -> dict:
+    grouped: dict = {}
+    for entry in entries:
+        grouped.setdefault(type(entry), []).append(entry)
+    return grouped
+
+
+# Snapshot sections of PurchaseAuditLog.changes (see log_purchase_action).
+SNAPSHOT_KEYS = ('state', 'before', 'after', 'final_state')
+LOOKUP_FIELDS = {
+    'email': 'email',
+    'verification_code': 'code',
+    'ticket1': 'ticket',
+    'ticket2': 'ticket',
+}
+
+
+def normalize_lookup(value) -> str:
+    return str(value).strip().lower()[:254]
+
+
+def lookup_values(changes) -> set[tuple[str, str]]:
+    """The (kind, value) pairs of PurchaseAuditLookup rows for a ``changes`` payload."""
+    found = set()
+    if not isinstance(changes, dict):
+        return found
+    for key in SNAPSHOT_KEYS:
+        snapshot = changes.get(key)
+        if not isinstance(snapshot, dict):
+            continue
+        for field, kind in LOOKUP_FIELDS.items():
+            value = snapshot.get(field)
+            if value not in (None, ''):
+                found.add((kind, normalize_lookup(value)))
+    return found
+
+
+def build_lookups(entries) -> list:
+    """Unsaved PurchaseAuditLookup rows for saved purchase audit *entries*."""
+    from iftf_duoverkoop.src.core.models import PurchaseAuditLookup  # local import avoids circularity
+    return [
+        PurchaseAuditLookup(entry_id=entry.pk, kind=kind, value=value)
+        for entry in entries
+        for kind, value in sorted(lookup_values(entry.changes))
+    ]
+
+
+def _insert(entries) -> None:
+    from iftf_duoverkoop.src.core.models import PurchaseAuditLog, PurchaseAuditLookup  # local import avoids circularity
+    with transaction.atomic():
+        for model, rows in _group_by_model(entries).items():
+            model.objects.bulk_create(rows)
+            if model is PurchaseAuditLog:
+                PurchaseAuditLookup.objects.bulk_create(build_lookups(rows))
+
+
+def flush(entries) -> None:
+    """Insert *entries* with one bulk_create per model; spool them to disk if that fails."""
+    try:
+        _insert(entries)
+    except Exception:
+        logger.exception('Writing %s audit log entries failed; spooling them to disk.', len(entries))
+        _spool(entries)
+        return
+    _replay_spool()
+
+
+def _serialize(entry) -> dict:
+    fields = {}
+    for field in entry._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        value = getattr(entry, field.attname)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        fields[field.attname] = value
+    return {'model': entry._meta.label, 'fields': fields}
+
+
+def _deserialize(data: dict):
+    from django.apps import apps
+    model = apps.get_model(data['model'])
+    fields = dict(data['fields'])
+    fields['timestamp'] = datetime.fromisoformat(fields['timestamp'])
+    return model(**fields)
+
+
+def _spool(entries) -> None:
+    global _spool_pending
+    _spool_pending = True
+    spool_dir = _spool_dir()
+    try:
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        path = spool_dir / f'audit-{os.getpid()}{SPOOL_SUFFIX}'
+        with path.open('a', encoding='utf-8') as fh:
+            for entry in entries:
+                fh.write(json.dumps(_serialize(entry), default=str) + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+    except Exception:
+        # Last resort: the entries still reach the log output.
+        logger.exception('Could not spool audit log entries: %s', [_serialize(e) for e in entries])
+
+
+def _clear_missing_references(entry) -> None:
+    """Null the nullable foreign keys of *entry* whose rows were deleted while it sat in the spool."""
+    for field in entry._meta.concrete_fields:
+        if not field.is_relation or not field.null:
+            continue
+        value = getattr(entry, field.attname)
+        if value is not None and not field.related_model._default_manager.filter(pk=value).exists():
+            setattr(entry, field.attname, None)
+
+
+def _replay_lines(lines: list[str]) -> tuple[int, list[str], list[str]]:
+    """
+    Insert the spooled *lines* one by one.  Returns (entries written, lines
+    to quarantine, lines left for the next flush once the database fails).
+    """
+    written = 0
+    rejected = []
+    for index, line in enumerate(lines):
+        try:
+            entry = _deserialize(json.loads(line))
+        except (ValueError, KeyError, TypeError, LookupError):
+            rejected.append(line)
+            continue
+        try:
+            _insert([entry])
+        except IntegrityError:
+            try:
+                entry.pk = None
+                _clear_missing_references(entry)
+                _insert([entry])
+            except IntegrityError:
+                rejected.append(line)
+                continue
+            except Exception:
+                return written, rejected, lines[index:]
+        except Exception:
+            return written, rejected, lines[index:]
+        written += 1
+    return written, rejected, []
+
+
+def _write_spool_file(path: Path, lines: list[str]) -> None:
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+
+def _replay_file(path: Path, claimed: Path) -> bool:
+    """Replay one claimed spool file; False if entries are left for a later flush."""
+    lines = [line for line in claimed.read_text(encoding='utf-8').splitlines() if line.strip()]
+    try:
+        _insert([_deserialize(json.loads(line)) for line in lines])
+    except Exception:
+        written, rejected, remaining = _replay_lines(lines)
+    else:
+        written, rejected, remaining = len(lines), [], []
+
+    if rejected:
+        quarantine = path.with_name(f'audit-quarantine-{time.time_ns()}{SPOOL_SUFFIX}{QUARANTINE_SUFFIX}')
+        _write_spool_file(quarantine, rejected)
+        logger.error(
+            'Moved %s spooled audit log entries from %s that cannot be inserted to %s.',
+            len(rejected), path.name, quarantine.name,
+        )
+    if remaining:
+        _write_spool_file(path.with_name(f'audit-retry-{time.time_ns()}{SPOOL_SUFFIX}'), remaining)
+        logger.warning(
+            'Replaying audit spool %s stopped on a database error; %s entries will be retried on the next flush.',
+            path.name, len(remaining),
+        )
+    claimed.unlink(missing_ok=True)
+    if written:
+        logger.warning('Replayed %s spooled audit log entries from %s.', written, path.name)
+    return not remaining
+
+
+def _replay_spool() -> None:
+    global _spool_pending
+    if not _spool_pending:
+        return
+    _spool_pending = False
+    try:
+        spooled = [p for p in _spool_dir().iterdir() if p.name.endswith(SPOOL_SUFFIX)]
+    except FileNotFoundError:
+        return
+    for path in spooled:
+        claimed = path.with_name(path.name + SPOOL_REPLAY_SUFFIX)
+        try:
+            # The rename makes sure only one process replays a given file.
+            path.rename(claimed)
+        except OSError:
+            continue
+        try:
+            if not _replay_file(path, claimed):
+                _spool_pending = True
+        except Exception:
+            logger.exception('Replaying audit spool %s failed; will retry on the next flush.', path.name)
+            claimed.rename(path.with_name(f'audit-retry-{time.time_ns()}{SPOOL_SUFFIX}'))
+            _spool_pending = True
@@ -0,0 +1,413 @@
+"""
+Cold storage for old audit log entries.
+
+``archive()`` moves PurchaseAuditLog and LoginAuditLog rows older than
+AUDIT_ARCHIVE_AFTER_DAYS out of the database into gzip-compressed JSONL
+files, one partition per model and (local) day:
+
+    <AUDIT_ARCHIVE_DIR>/<model>/<YYYY>/<model>-<YYYY-MM-DD>-<seq>.jsonl.gz
+
+``manifest.json`` in the archive root lists every partition with its row
+count, id range and SHA-256.  Partitions are never rewritten: entries that
+reach an already archived day later (a replayed spool) go into a new
+segment with the next sequence number.
+
+Rows are only deleted after their partition has been written, fsynced, read
+back and recorded in the manifest, and they are deleted in batches by id.
+A run that stops between those steps leaves the partition marked
+``deleted: false``; the next run finishes the deletes before exporting
+anything new, so no entry is lost or archived twice.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from iftf_duoverkoop.src.core import audit
+from iftf_duoverkoop.src.core.file_lock import file_lock
+from iftf_duoverkoop.src.core.models import LoginAuditLog, Purchase, PurchaseAuditLog
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+LOCK_NAME = '.archive.lock'
+PARTITION_SUFFIX = '.jsonl.gz'
+DEFAULT_BATCH_SIZE = 1000
+# Archived matches shown per dashboard search; the partitions are read newest first.
+SEARCH_LIMIT = 200
+
+MODELS = {
+    'purchase': PurchaseAuditLog,
+    'login': LoginAuditLog,
+}
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+def _archive_root() -> Path:
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'var' / 'audit-archive'))
+
+
+def archive_after_days() -> int:
+    return int(getattr(settings, 'AUDIT_ARCHIVE_AFTER_DAYS', 0) or 0)
+
+
+def _model_key(model) -> str:
+    for key, candidate in MODELS.items():
+        if candidate is model:
+            return key
+    raise ValueError(f'{model.__name__} is not an archived audit model.')
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+
+def _atomic_write(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(payload)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_manifest() -> dict:
+    try:
+        return json.loads((_archive_root() / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return {'version': MANIFEST_VERSION, 'partitions': []}
+
+
+def _save_manifest(manifest: dict) -> None:
+    _atomic_write(_archive_root() / MANIFEST_NAME, json.dumps(manifest, indent=1).encode('utf-8'))
+
+
+def partitions(model=None) -> list[dict]:
+    """Manifest entries, newest day first, optionally only those of *model*."""
+    entries = load_manifest()['partitions']
+    if model is not None:
+        key = _model_key(model)
+        entries = [p for p in entries if p['model'] == key]
+    return sorted(entries, key=lambda p: (p['date'], p['path']), reverse=True)
+
+
+@contextmanager
+def _archive_lock():
+    # Cron and the run_jobs worker may both start an archive run.
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(file_lock(_archive_root() / LOCK_NAME, blocking=False))
+        except BlockingIOError:
+            raise ArchiveError('Another audit log archive run is in progress.') from None
+        yield
+
+
+# ---------------------------------------------------------------------------
+# Rows <-> JSON
+# ---------------------------------------------------------------------------
+
+def _serialize(entry) -> dict:
+    row = {'id': entry.pk}
+    for field in entry._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        value = getattr(entry, field.attname)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        row[field.attname] = value
+    if isinstance(entry, PurchaseAuditLog):
+        # The user may be deleted once the PROTECT-ing row has left the database.
+        row['username'] = entry.user.username
+    return row
+
+
+def _deserialize(model, row: dict):
+    row = dict(row)
+    username = row.pop('username') if model is PurchaseAuditLog else None
+    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+    entry = model(**row)
+    entry.is_archived = True
+    if username is not None:
+        entry.archived_username = username
+    return entry
+
+
+def _attach_relations(entries: list) -> list:
+    """Resolve users and purchases in bulk; missing ones become placeholders instead of queries."""
+    user_ids = {e.user_id for e in entries if e.user_id}
+    users = User.objects.in_bulk(user_ids) if user_ids else {}
+    purchase_ids = {e.purchase_id for e in entries if getattr(e, 'purchase_id', None)}
+    purchases = Purchase.objects.in_bulk(purchase_ids) if purchase_ids else {}
+    for entry in entries:
+        if entry.user_id:
+            entry.user = users.get(entry.user_id) or User(
+                pk=entry.user_id, username=getattr(entry, 'archived_username', ''),
+            )
+        if isinstance(entry, PurchaseAuditLog):
+            entry.purchase = purchases.get(entry.purchase_id) if entry.purchase_id else None
+    return entries
+
+
+# ---------------------------------------------------------------------------
+# Writing partitions
+# ---------------------------------------------------------------------------
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _cutoff(older_than_days: int) -> datetime:
+    # Partitions cover whole days, so the cutoff is midnight.
+    return _day_bounds(timezone.localdate() - timedelta(days=older_than_days))[0]
+
+
+def _next_partition_path(key: str, day, manifest: dict) -> Path:
+    root = _archive_root()
+    taken = {p['path'] for p in manifest['partitions']}
+    seq = 1
+    while True:
+        relative = f'{key}/{day:%Y}/{key}-{day.isoformat()}-{seq:03d}{PARTITION_SUFFIX}'
+        if relative not in taken and not (root / relative).exists():
+            return Path(relative)
+        seq += 1
+
+
+def _day_queryset(model, day, cutoff):
+    start, end = _day_bounds(day)
+    queryset = model.objects.filter(timestamp__gte=start, timestamp__lt=min(end, cutoff))
+    if model is PurchaseAuditLog:
+        queryset = queryset.select_related('user')
+    return queryset
+
+
+def _write_partition(model, day, cutoff, batch_size: int, manifest: dict) -> dict | None:
+    key = _model_key(model)
+    relative = _next_partition_path(key, day, manifest)
+    target = _archive_root() / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+    queryset = _day_queryset(model, day, cutoff)
+
+    ids: list[int] = []
+    purchase_ids: list[int] = []
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            # mtime=0 keeps the bytes, and with them the checksum, reproducible.
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+                last_id = 0
+                while True:
+                    batch = list(queryset.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+                    if not batch:
+                        break
+                    for entry in batch:
+                        gz.write(json.dumps(_serialize(entry), default=str).encode('utf-8') + b'\n')
+                        ids.append(entry.pk)
+                        if getattr(entry, 'purchase_id_snapshot', None) is not None:
+                            purchase_ids.append(entry.purchase_id_snapshot)
+                    last_id = batch[-1].pk
+            raw.flush()
+            os.fsync(raw.fileno())
+        if not ids:
+            Path(tmp_name).unlink(missing_ok=True)
+            return None
+        os.replace(tmp_name, target)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+    partition = {
+        'path': relative.as_posix(),
+        'model': key,
+        'date': day.isoformat(),
+        'rows': len(ids),
+        'min_id': min(ids),
+        'max_id': max(ids),
+        'sha256': hashlib.sha256(target.read_bytes()).hexdigest(),
+        'bytes': target.stat().st_size,
+        'created_at': timezone.now().isoformat(),
+        'deleted': False,
+    }
+    if purchase_ids:
+        partition['min_purchase_id'] = min(purchase_ids)
+        partition['max_purchase_id'] = max(purchase_ids)
+    # Read it back before anything is deleted.
+    if [row['id'] for row in read_partition(partition)] != ids:
+        target.unlink(missing_ok=True)
+        raise ArchiveError(f'Partition {relative} did not read back correctly; nothing was deleted.')
+    return partition
+
+
+def _delete_archived(partition: dict, batch_size: int) -> int:
+    model = MODELS[partition['model']]
+    ids = [row['id'] for row in read_partition(partition)]
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            deleted += model.objects.filter(pk__in=ids[start:start + batch_size]).delete()[0]
+    return deleted
+
+
+def _finish_pending_deletes(manifest: dict, batch_size: int) -> int:
+    deleted = 0
+    for partition in manifest['partitions']:
+        if not partition.get('deleted'):
+            deleted += _delete_archived(partition, batch_size)
+            partition['deleted'] = True
+            _save_manifest(manifest)
+            logger.warning('Finished deleting archived rows of %s from an interrupted run.', partition['path'])
+    return deleted
+
+
+def archive(*, older_than_days: int | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+            dry_run: bool = False) -> dict:
+    """
+    Move audit log entries older than *older_than_days* into archive partitions.
+
+    Returns {'partitions': [...new manifest entries...], 'rows': n} (with
+    dry_run, the partitions that would be written, without checksums).
+    """
+    if older_than_days is None:
+        older_than_days = archive_after_days()
+    if older_than_days < 1:
+        raise ArchiveError(
+            'Audit log archiving is off: set AUDIT_ARCHIVE_AFTER_DAYS or pass an age of at least one day.'
+        )
+    cutoff = _cutoff(older_than_days)
+    result = {'partitions': [], 'rows': 0}
+
+    with _archive_lock():
+        manifest = load_manifest()
+        if not dry_run:
+            _finish_pending_deletes(manifest, batch_size)
+        for model in MODELS.values():
+            next_day_start = None
+            while True:
+                pending = model.objects.filter(timestamp__lt=cutoff)
+                if next_day_start is not None:
+                    pending = pending.filter(timestamp__gte=next_day_start)
+                oldest = pending.order_by('timestamp', 'pk').values_list('timestamp', flat=True).first()
+                if oldest is None:
+                    break
+                day = timezone.localdate(oldest)
+                next_day_start = _day_bounds(day)[1]
+
+                if dry_run:
+                    rows = _day_queryset(model, day, cutoff).count()
+                    result['partitions'].append({'model': _model_key(model), 'date': day.isoformat(), 'rows': rows})
+                    result['rows'] += rows
+                    continue
+
+                partition = _write_partition(model, day, cutoff, batch_size, manifest)
+                if partition is None:
+                    continue
+                manifest['partitions'].append(partition)
+                _save_manifest(manifest)
+                _delete_archived(partition, batch_size)
+                partition['deleted'] = True
+                _save_manifest(manifest)
+                result['partitions'].append(partition)
+                result['rows'] += partition['rows']
+                logger.info('Archived %s %s audit log entries of %s to %s.',
+                            partition['rows'], partition['model'], partition['date'], partition['path'])
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Reading partitions
+# ---------------------------------------------------------------------------
+
+def read_partition(partition: dict) -> list[dict]:
+    """Decompress a partition after checking it against the manifest's SHA-256."""
+    data = (_archive_root() / partition['path']).read_bytes()
+    if hashlib.sha256(data).hexdigest() != partition['sha256']:
+        raise ArchiveError(f"Archive partition {partition['path']} does not match its recorded SHA-256.")
+    return [json.loads(line) for line in gzip.decompress(data).splitlines() if line.strip()]
+
+
+def verify() -> list[str]:
+    """Check every partition's checksum and row count; returns a list of problems."""
+    problems = []
+    for partition in partitions():
+        try:
+            rows = read_partition(partition)
+        except (OSError, ArchiveError, ValueError) as exc:
+            problems.append(f"{partition['path']}: {exc}")
+            continue
+        if len(rows) != partition['rows']:
+            problems.append(f"{partition['path']}: {len(rows)} rows, manifest says {partition['rows']}.")
+    return problems
+
+
+def _matches(row: dict, filters: dict) -> bool:
+    for field, value in filters.items():
+        if field == 'lookup':
+            if value not in {v for _, v in audit.lookup_values(row.get('changes'))}:
+                return False
+        elif field.endswith('__istartswith'):
+            if not (row.get(field[:-len('__istartswith')]) or '').lower().startswith(value.lower()):
+                return False
+        elif field.endswith('__icontains'):
+            if value.lower() not in (row.get(field[:-len('__icontains')]) or '').lower():
+                return False
+        elif row.get(field) != value:
+            return False
+    return True
+
+
+def search(model, *, limit: int = SEARCH_LIMIT, **filters) -> list:
+    """
+    Archived entries of *model* matching *filters*, newest first.
+
+    Filters are exact field matches on the stored row (``action``, ``event``,
+    ``purchase_id_snapshot``), ``<field>__istartswith``, ``<field>__icontains`` or
+    ``lookup`` (an email, verification code or ticket in ``changes``).  Partitions whose id
+    range rules out a purchase filter are skipped without being read.
+    """
+    found = []
+    purchase_id = filters.get('purchase_id_snapshot')
+    for partition in partitions(model):
+        if purchase_id is not None and 'min_purchase_id' in partition and not (
+            partition['min_purchase_id'] <= purchase_id <= partition['max_purchase_id']
+        ):
+            continue
+        try:
+            rows = read_partition(partition)
+        except (OSError, ArchiveError):
+            logger.exception('Skipping unreadable audit archive partition %s.', partition['path'])
+            continue
+        rows.sort(key=lambda r: (r['timestamp'], r['id']), reverse=True)
+        found.extend(_deserialize(model, row) for row in rows if _matches(row, filters))
+        if len(found) >= limit:
+            break
+    return _attach_relations(found[:limit])
+
+
+def find(model, pk: int):
+    """The archived entry of *model* with primary key *pk*, or None."""
+    for partition in partitions(model):
+        if not partition['min_id'] <= pk <= partition['max_id']:
+            continue
+        for row in read_partition(partition):
+            if row['id'] == pk:
+                return _attach_relations([_deserialize(model, row)])[0]
+    return None
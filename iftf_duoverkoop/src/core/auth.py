@@ -1,10 +1,17 @@
 """
 core/auth.py – Permission groups, role helpers, audit log helper.
 """
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
 from typing import Optional, TYPE_CHECKING
+from django.conf import settings
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 
 if TYPE_CHECKING:
     from iftf_duoverkoop.src.core.models import Purchase, PurchaseAuditLog
@@ -59,21 +66,193 @@ def setup_permission_groups() -> None:
             Permission.objects.get(codename='verify_purchase', content_type=purchase_ct),
         ])
 
+    bump_permission_version()
+
+
+# ---------------------------------------------------------------------------
+# Per-session role cache
+# ---------------------------------------------------------------------------
+
+ROLE_CACHE_SESSION_KEY = '_iftf_roles'
+# Cached roles are recomputed after this long even without a version bump,
+# which bounds staleness on a host that does not share the media disk.
+ROLE_CACHE_MAX_AGE_SECONDS = 300
+PERMISSION_VERSION_FILENAME = '.permission-version'
+
+
+def _permission_version_path() -> Path:
+    return Path(settings.MEDIA_ROOT) / PERMISSION_VERSION_FILENAME
+
+
+def permission_version() -> int:
+    """Current permission-version stamp: the mtime of a file every worker process can stat."""
+    try:
+        return _permission_version_path().stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def bump_permission_version() -> None:
+    """Invalidate every session's cached roles after groups, permissions or rep assignments change."""
+    path = _permission_version_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(str(time.time_ns()), encoding='utf-8')
+
+
+@dataclass(frozen=True)
+class UserRoles:
+    """Group names, permissions and rep scope of one user, as cached in their session."""
+    groups: frozenset
+    permissions: frozenset
+    rep_association_id: Optional[str]
+    rep_performances: tuple
+
+    @property
+    def is_pos_staff(self) -> bool:
+        return GROUP_POS_STAFF in self.groups
+
+    @property
+    def is_support_staff(self) -> bool:
+        return GROUP_SUPPORT_STAFF in self.groups
+
+    @property
+    def is_association_rep(self) -> bool:
+        return GROUP_ASSOCIATION_REP in self.groups
+
+    def association(self):
+        """The rep's association as an unsaved model instance (no query); None without a profile."""
+        from iftf_duoverkoop.src.core.models import Association  # local import avoids circularity
+        if self.rep_association_id is None:
+            return None
+        return Association(name=self.rep_association_id)
+
+    def performances(self) -> list:
+        """The rep's performances, ordered by date, as unsaved model instances (no query)."""
+        from iftf_duoverkoop.src.core.models import Performance  # local import avoids circularity
+        association = self.association()
+        return [
+            Performance(key=key, name=name, date=datetime.fromisoformat(date), association=association)
+            for key, name, date in self.rep_performances
+        ]
+
+    def to_session(self, user_id: int, version: int) -> dict:
+        return {
+            'user_id': user_id,
+            'version': version,
+            'computed_at': time.time(),
+            'groups': sorted(self.groups),
+            'permissions': sorted(self.permissions),
+            'rep_association_id': self.rep_association_id,
+            'rep_performances': [list(p) for p in self.rep_performances],
+        }
+
+    @classmethod
+    def from_session(cls, data: dict) -> 'UserRoles':
+        return cls(
+            groups=frozenset(data['groups']),
+            permissions=frozenset(data['permissions']),
+            rep_association_id=data['rep_association_id'],
+            rep_performances=tuple(tuple(p) for p in data['rep_performances']),
+        )
+
+
+def _resolve_roles(user: User) -> UserRoles:
+    from iftf_duoverkoop.src.core.models import AssociationRepProfile, Performance  # local import avoids circularity
+
+    groups = frozenset(user.groups.values_list('name', flat=True))
+    rep_association_id = None
+    rep_performances = ()
+    if GROUP_ASSOCIATION_REP in groups:
+        rep_association_id = (
+            AssociationRepProfile.objects.filter(user=user).values_list('association_id', flat=True).first()
+        )
+        if rep_association_id is not None:
+            rep_performances = tuple(
+                (key, name, date.isoformat())
+                for key, name, date in Performance.objects.filter(association_id=rep_association_id)
+                .order_by('date')
+                .values_list('key', 'name', 'date')
+            )
+    return UserRoles(
+        groups=groups,
+        permissions=frozenset(user.get_all_permissions()),
+        rep_association_id=rep_association_id,
+        rep_performances=rep_performances,
+    )
+
+
+def get_user_roles(request) -> UserRoles:
+    """
+    Return the roles of the logged-in user, computed at most once per session.
+
+    The session copy is reused until the permission version changes or it is
+    older than ROLE_CACHE_MAX_AGE_SECONDS.  The result is also kept on
+    ``request.user`` so the role helpers below do not query either.
+    """
+    user = request.user
+    roles = getattr(user, '_iftf_roles', None)
+    if roles is not None:
+        return roles
+
+    version = permission_version()
+    data = request.session.get(ROLE_CACHE_SESSION_KEY)
+    if (
+        data
+        and data.get('user_id') == user.pk
+        and data.get('version') == version
+        and time.time() - data.get('computed_at', 0) < ROLE_CACHE_MAX_AGE_SECONDS
+    ):
+        roles = UserRoles.from_session(data)
+    else:
+        roles = _resolve_roles(user)
+        request.session[ROLE_CACHE_SESSION_KEY] = roles.to_session(user.pk, version)
+
+    user._iftf_roles = roles
+    if not hasattr(user, '_perm_cache'):
+        # ModelBackend.has_perm() reads this attribute before querying.
+        user._perm_cache = set(roles.permissions)
+    return roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _on_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permission_version()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender='iftf_duoverkoop.Association')
+@receiver(post_save, sender='iftf_duoverkoop.AssociationRepProfile')
+@receiver(post_delete, sender='iftf_duoverkoop.AssociationRepProfile')
+@receiver(post_save, sender='iftf_duoverkoop.Performance')
+@receiver(post_delete, sender='iftf_duoverkoop.Performance')
+def _on_rep_scope_changed(sender, **kwargs):
+    bump_permission_version()
+
 
 # ---------------------------------------------------------------------------
 # Role helpers
 # ---------------------------------------------------------------------------
 
+def _group_names(user: User) -> frozenset:
+    roles = getattr(user, '_iftf_roles', None)
+    if roles is not None:
+        return roles.groups
+    return frozenset(user.groups.values_list('name', flat=True))
+
+
 def is_pos_staff(user: User) -> bool:
-    return user.groups.filter(name=GROUP_POS_STAFF).exists()
+    return GROUP_POS_STAFF in _group_names(user)
 
 
 def is_support_staff(user: User) -> bool:
-    return user.groups.filter(name=GROUP_SUPPORT_STAFF).exists()
+    return GROUP_SUPPORT_STAFF in _group_names(user)
 
 
 def is_association_rep(user: User) -> bool:
-    return user.groups.filter(name=GROUP_ASSOCIATION_REP).exists()
+    return GROUP_ASSOCIATION_REP in _group_names(user)
 
 
 def can_edit_purchases(user: User) -> bool:
@@ -98,21 +277,34 @@ def get_client_ip(request) -> Optional[str]:
     return xff.split(',')[0].strip() if xff else request.META.get('REMOTE_ADDR')
 
 
-def _purchase_snapshot(purchase: 'Purchase') -> dict:
+def _username(purchase: 'Purchase', field_name: str, acting_user: Optional[User]) -> Optional[str]:
+    """Username behind a user FK of *purchase*, without a query when it is already at hand."""
+    user_id = getattr(purchase, f'{field_name}_id')
+    if user_id is None:
+        return None
+    if acting_user is not None and acting_user.pk == user_id:
+        return acting_user.username
+    return getattr(purchase, field_name).username
+
+
+def _purchase_snapshot(purchase: 'Purchase', acting_user: Optional[User] = None) -> dict:
     """
     Return a flat dict capturing the full observable state of a Purchase.
     Used as the canonical snapshot format inside audit log ``changes`` payloads.
+
+    Built from data already loaded: ticket keys are the FK values, and the
+    creator/modifier is usually the acting user, so no lookups are needed.
     """
     return {
         'id': purchase.pk,
         'name': purchase.name,
         'email': purchase.email,
-        'ticket1': purchase.ticket1.key,
-        'ticket2': purchase.ticket2.key,
+        'ticket1': purchase.ticket1_id,
+        'ticket2': purchase.ticket2_id,
         'verification_code': purchase.verification_code,
-        'created_by': purchase.created_by.username,
+        'created_by': _username(purchase, 'created_by', acting_user),
         'created_at': purchase.date.isoformat(),
-        'modified_by': purchase.modified_by.username if purchase.modified_by else None,
+        'modified_by': _username(purchase, 'modified_by', acting_user),
         'modified_at': purchase.modified_date.isoformat() if purchase.modified_date else None,
     }
 
@@ -144,20 +336,29 @@ def log_purchase_action(
 
     Any caller may also pass a fully-formed ``changes`` dict to override this
     behaviour (used by the order-creation view which pre-builds the payload).
+
+    The entry is not inserted right away: it is queued and written in bulk
+    once the surrounding transaction has committed (see core/audit.py).  The
+    returned instance is therefore unsaved.
     """
+    from iftf_duoverkoop.src.core import audit  # local import avoids circularity
     from iftf_duoverkoop.src.core.models import PurchaseAuditLog  # local import avoids circularity
 
     if action == 'CREATE' and changes is None:
-        changes = {'state': _purchase_snapshot(purchase)}
+        changes = {'state': _purchase_snapshot(purchase, user)}
 
     elif action == 'DELETE' and changes is None:
-        changes = {'final_state': _purchase_snapshot(purchase)}
+        changes = {'final_state': _purchase_snapshot(purchase, user)}
 
-    return PurchaseAuditLog.objects.create(
-        purchase=purchase,
+    entry = PurchaseAuditLog(
+        # A deleted purchase is gone by the time the entry is written; the
+        # FK would be set to NULL anyway, purchase_id_snapshot keeps the ID.
+        purchase=None if action == 'DELETE' else purchase,
         purchase_id_snapshot=purchase.pk,
         action=action,
         user=user,
         ip_address=ip_address,
         changes=changes,
     )
+    audit.record(entry)
+    return entry
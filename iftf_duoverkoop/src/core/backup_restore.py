@@ -1,21 +1,40 @@
-"""Database backup/restore helpers using PostgreSQL native tools."""
-import hashlib
+"""Database backup/restore helpers using PostgreSQL native tools or the SQLite online backup API."""
 import logging
 import os
+import gzip
 import shutil
+import sqlite3
 import subprocess
-import threading
+import tarfile
+import tempfile
+import time
+import zlib
+from datetime import datetime
 from pathlib import Path
 from urllib.parse import urlparse
 
 from django.conf import settings
-from django.db import connections
+from django.db import connections, transaction
 from django.utils import timezone
 
+from iftf_duoverkoop.src.core import backup_store, jobs, maintenance
 from iftf_duoverkoop.src.core.models import DatabaseOperation
 
 logger = logging.getLogger('iftf_duoverkoop.dbops')
 
+# Parallel backups are pg_dump directory-format dumps packed into a tarball.
+DIRECTORY_ARCHIVE_SUFFIX = '.tar'
+# SQLite backups are gzip-compressed database files.
+SQLITE_ARCHIVE_SUFFIX = '.sqlite3.gz'
+# Pages copied per step of the SQLite online backup; other connections can
+# write between steps, so the copy never blocks writers for its whole duration.
+SQLITE_BACKUP_PAGES = 1024
+SQLITE_BACKUP_SLEEP_SECONDS = 0.01
+# Asking for 'auto' parallel jobs runs one worker per CPU, up to this many;
+# pg_dump opens one database connection per worker.
+PARALLEL_JOBS_AUTO = 'auto'
+MAX_AUTO_PARALLEL_JOBS = 4
+
 
 def _backup_dir() -> Path:
     backup_dir = Path(getattr(settings, 'DATABASE_BACKUP_DIR', Path(settings.MEDIA_ROOT) / 'backups'))
@@ -23,6 +42,49 @@ def _backup_dir() -> Path:
     return backup_dir
 
 
+def auto_parallel_jobs() -> int:
+    """Workers for an operation that asks for parallel mode without a number: the CPU count, capped."""
+    return max(1, min(MAX_AUTO_PARALLEL_JOBS, os.cpu_count() or 1))
+
+
+def default_parallel_jobs() -> int:
+    """
+    Worker processes for pg_dump/pg_restore when an operation does not choose its own.
+
+    One, i.e. a single-file custom-format dump over one connection, unless
+    DATABASE_BACKUP_JOBS asks for the parallel directory format with a number
+    of jobs or 'auto'.
+    """
+    configured = str(getattr(settings, 'DATABASE_BACKUP_JOBS', '') or '').strip().lower()
+    if configured == PARALLEL_JOBS_AUTO:
+        return auto_parallel_jobs()
+    return max(1, int(configured or 0))
+
+
+def resolve_parallel_jobs(parallel_jobs: int | str | None) -> int:
+    """The worker count for an operation that asked for *parallel_jobs* (a number, 'auto' or None)."""
+    if parallel_jobs == PARALLEL_JOBS_AUTO:
+        return auto_parallel_jobs()
+    return int(parallel_jobs or 0) or default_parallel_jobs()
+
+
+def database_vendor() -> str:
+    """Return 'postgresql' or 'sqlite' for the default database; anything else cannot be backed up."""
+    engine = settings.DATABASES.get('default', {}).get('ENGINE', '')
+    if 'postgresql' in engine:
+        return 'postgresql'
+    if 'sqlite3' in engine:
+        return 'sqlite'
+    raise RuntimeError('Database backup/restore is only supported for PostgreSQL and SQLite.')
+
+
+def _sqlite_path() -> Path:
+    name = str(settings.DATABASES.get('default', {}).get('NAME') or '')
+    if not name or name == ':memory:' or name.startswith('file:'):
+        raise RuntimeError('Only file-based SQLite databases can be backed up.')
+    return Path(name)
+
+
 def _split_db_config() -> tuple[dict, str]:
     db_cfg = settings.DATABASES.get('default', {})
     engine = db_cfg.get('ENGINE', '')
@@ -60,12 +122,7 @@ def _split_db_config() -> tuple[dict, str]:
     return env, str(dbname)
 
 
-def _sha256_for_file(path: Path) -> str:
-    digest = hashlib.sha256()
-    with path.open('rb') as fh:
-        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
-            digest.update(chunk)
-    return digest.hexdigest()
+STREAM_CHUNK_SIZE = 1024 * 1024
 
 
 def _run_process(command: list[str], env_updates: dict) -> tuple[str, str]:
@@ -92,6 +149,32 @@ def _run_process(command: list[str], env_updates: dict) -> tuple[str, str]:
     return (completed.stdout or '').strip(), (completed.stderr or '').strip()
 
 
+def _stream_process(command: list[str], env_updates: dict, sink) -> str:
+    """
+    Run *command* and feed its stdout to ``sink.write`` chunk by chunk.
+
+    Returns stderr; raises RuntimeError when the command fails.
+    """
+    env = os.environ.copy()
+    env.update(env_updates)
+    with tempfile.TemporaryFile() as stderr_fh:
+        try:
+            process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=stderr_fh)
+        except FileNotFoundError as exc:
+            raise RuntimeError(
+                f"Required executable '{command[0]}' is not available on this host."
+            ) from exc
+        with process:
+            for chunk in iter(lambda: process.stdout.read(STREAM_CHUNK_SIZE), b''):
+                sink.write(chunk)
+        returncode = process.wait()
+        stderr_fh.seek(0)
+        stderr = stderr_fh.read().decode('utf-8', errors='replace').strip()
+    if returncode != 0:
+        raise RuntimeError(stderr or f'{command[0]} exited with status {returncode}.')
+    return stderr
+
+
 def _set_running(job: DatabaseOperation) -> None:
     job.status = DatabaseOperation.STATUS_RUNNING
     job.started_at = timezone.now()
@@ -116,35 +199,199 @@ def _set_succeeded(job: DatabaseOperation, output: str = '') -> None:
     job.save(update_fields=['status', 'finished_at', 'output_log'])
 
 
-def _dump_database(output_path: Path) -> tuple[str, str]:
+def _dump_database(sink) -> str:
+    """Stream pg_dump straight into *sink* (a backup store writer); returns pg_dump's stderr."""
     pg_env, dbname = _split_db_config()
     command = [
         shutil.which('pg_dump') or 'pg_dump',
         '--format=custom',
         '--no-owner',
         '--no-privileges',
-        '--file',
-        str(output_path),
         dbname,
     ]
-    return _run_process(command, pg_env)
+    return _stream_process(command, pg_env, sink)
 
 
-def _validate_restore_file(path: Path) -> None:
-    max_upload_mb = int(getattr(settings, 'DATABASE_BACKUP_MAX_UPLOAD_MB', 300))
-    max_upload_bytes = max_upload_mb * 1024 * 1024
-    if path.stat().st_size > max_upload_bytes:
-        raise RuntimeError(f'Backup file exceeds {max_upload_mb} MB upload limit.')
+def _dump_database_parallel(sink, jobs: int, timings: dict) -> str:
+    """
+    Run pg_dump --format=directory with *jobs* workers and stream the result
+    into *sink* as a tarball.
+    """
+    pg_env, dbname = _split_db_config()
+    with tempfile.TemporaryDirectory(dir=_backup_dir(), prefix='.dump-') as tmp_dir:
+        dump_dir = Path(tmp_dir) / 'dump'
+        command = [
+            shutil.which('pg_dump') or 'pg_dump',
+            '--format=directory',
+            f'--jobs={jobs}',
+            '--no-owner',
+            '--no-privileges',
+            '--file',
+            str(dump_dir),
+            dbname,
+        ]
+        started = time.monotonic()
+        stdout, stderr = _run_process(command, pg_env)
+        timings['dump'] = round(time.monotonic() - started, 3)
+
+        started = time.monotonic()
+        # pg_dump already compresses each table file, so the tarball is left uncompressed.
+        with tarfile.open(fileobj=sink, mode='w|') as archive:
+            archive.add(str(dump_dir), arcname='dump')
+        timings['pack'] = round(time.monotonic() - started, 3)
+    return f'{stdout}\n{stderr}'.strip()
+
+
+def _sqlite_online_copy(source_path: Path, target_path: Path) -> int:
+    """Copy a live SQLite database page batch by page batch; returns the page count."""
+    progress = {'pages': 0}
+
+    def on_progress(status, remaining, total):
+        progress['pages'] = total
+
+    source = sqlite3.connect(str(source_path))
+    target = sqlite3.connect(str(target_path))
+    try:
+        source.backup(
+            target,
+            pages=SQLITE_BACKUP_PAGES,
+            progress=on_progress,
+            sleep=SQLITE_BACKUP_SLEEP_SECONDS,
+        )
+    finally:
+        target.close()
+        source.close()
+    return progress['pages']
+
+
+def _gzip_file_into(source_path: Path, sink) -> None:
+    """
+    Stream *source_path* into *sink* as gzip.
+
+    A full flush after every block byte-aligns the output and resets the
+    dictionary, so an unchanged region of the database compresses to the same
+    bytes in the next backup and deduplicates in the chunk store.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    with source_path.open('rb') as fh:
+        for block in iter(lambda: fh.read(STREAM_CHUNK_SIZE), b''):
+            sink.write(compressor.compress(block))
+            sink.write(compressor.flush(zlib.Z_FULL_FLUSH))
+    sink.write(compressor.flush())
+
+
+def _dump_sqlite(sink, timings: dict) -> str:
+    with tempfile.TemporaryDirectory(dir=_backup_dir(), prefix='.sqlite-') as tmp_dir:
+        copy_path = Path(tmp_dir) / 'backup.sqlite3'
+        started = time.monotonic()
+        pages = _sqlite_online_copy(_sqlite_path(), copy_path)
+        timings['copy'] = round(time.monotonic() - started, 3)
+
+        started = time.monotonic()
+        _gzip_file_into(copy_path, sink)
+        timings['compress'] = round(time.monotonic() - started, 3)
+    return f'Copied {pages} SQLite pages with the online backup API.'
+
+
+def _validate_sqlite_file(path: Path) -> None:
+    try:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            result = conn.execute('PRAGMA quick_check').fetchone()
+            has_migrations = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'django_migrations'"
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as exc:
+        raise RuntimeError(f'Uploaded file is not a valid SQLite database: {exc}') from exc
+    if not result or result[0] != 'ok':
+        raise RuntimeError(f'SQLite integrity check failed: {result[0] if result else "no result"}')
+    if not has_migrations:
+        raise RuntimeError('Uploaded SQLite database is not a backup of this application.')
+
+
+def _restore_sqlite(archive_path: Path, work_dir: Path, timings: dict) -> str:
+    started = time.monotonic()
+    restored_path = work_dir / 'restore.sqlite3'
+    try:
+        with gzip.open(archive_path, 'rb') as src, restored_path.open('wb') as dst:
+            shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+    except (OSError, EOFError) as exc:
+        raise RuntimeError(f'Backup file is not a valid {SQLITE_ARCHIVE_SUFFIX} archive: {exc}') from exc
+    timings['decompress'] = round(time.monotonic() - started, 3)
+
+    started = time.monotonic()
+    _validate_sqlite_file(restored_path)
+    timings['validate'] = round(time.monotonic() - started, 3)
+
+    connections.close_all()
+    started = time.monotonic()
+    pages = _sqlite_online_copy(restored_path, _sqlite_path())
+    timings['restore'] = round(time.monotonic() - started, 3)
+    return f'Restored {pages} SQLite pages with the online backup API.'
+
+
+def _restore_postgres(backup_path: Path, work_dir: Path, jobs: int, timings: dict) -> str:
+    restore_source = backup_path
+    if _is_directory_archive(backup_path):
+        started = time.monotonic()
+        restore_source = _unpack_directory_archive(backup_path, work_dir / 'archive')
+        backup_path.unlink()
+        timings['unpack'] = round(time.monotonic() - started, 3)
+
+    started = time.monotonic()
+    _validate_restore_file(restore_source)
+    timings['validate'] = round(time.monotonic() - started, 3)
+
+    connections.close_all()
+    started = time.monotonic()
+    stdout, stderr = _restore_database(restore_source, jobs=jobs)
+    timings['restore'] = round(time.monotonic() - started, 3)
+    return f'{stdout}\n{stderr}'.strip()
+
+
+def _is_sqlite_archive(path: Path) -> bool:
+    return path.name.lower().endswith(SQLITE_ARCHIVE_SUFFIX)
+
+
+def _is_directory_archive(path: Path) -> bool:
+    return path.suffix.lower() == DIRECTORY_ARCHIVE_SUFFIX
+
+
+def _unpack_directory_archive(archive_path: Path, target_dir: Path) -> Path:
+    """Extract a parallel backup tarball and return the pg_dump directory inside it."""
+    with tarfile.open(archive_path, 'r:*') as archive:
+        members = archive.getmembers()
+        for member in members:
+            name = Path(member.name)
+            if name.is_absolute() or '..' in name.parts or not (member.isfile() or member.isdir()):
+                raise RuntimeError(f'Backup archive contains an unsafe entry: {member.name}')
+        archive.extractall(target_dir, members=members)
 
+    dump_dir = target_dir / 'dump'
+    if not (dump_dir / 'toc.dat').is_file():
+        raise RuntimeError('Backup archive does not contain a pg_dump directory-format dump.')
+    return dump_dir
+
+
+def _max_upload_bytes() -> int:
+    return int(getattr(settings, 'DATABASE_BACKUP_MAX_UPLOAD_MB', 300)) * 1024 * 1024
+
+
+def _validate_restore_file(path: Path) -> None:
+    # The size limit is enforced while the upload is written, and --list only
+    # reads the archive's table of contents, so the data is not read again here.
     pg_env, _ = _split_db_config()
     command = [shutil.which('pg_restore') or 'pg_restore', '--list', str(path)]
     _run_process(command, pg_env)
 
 
-def _restore_database(input_path: Path) -> tuple[str, str]:
+def _restore_database(input_path: Path, jobs: int = 1) -> tuple[str, str]:
     pg_env, dbname = _split_db_config()
     command = [
         shutil.which('pg_restore') or 'pg_restore',
+        f'--jobs={max(1, jobs)}',
         '--clean',
         '--if-exists',
         '--no-owner',
@@ -169,104 +416,277 @@ def has_running_database_operation() -> bool:
     ).exists()
 
 
-def enqueue_backup_job(*, created_by, notes: str = '', is_pre_restore_backup: bool = False) -> DatabaseOperation:
-    job = DatabaseOperation.objects.create(
+def _create_backup_job(
+    *,
+    created_by,
+    notes: str = '',
+    is_pre_restore_backup: bool = False,
+    parallel_jobs: int | str | None = None,
+) -> DatabaseOperation:
+    return DatabaseOperation.objects.create(
         operation_type=DatabaseOperation.TYPE_BACKUP,
         created_by=created_by,
         notes=notes,
         is_pre_restore_backup=is_pre_restore_backup,
+        parallel_jobs=resolve_parallel_jobs(parallel_jobs),
+    )
+
+
+def enqueue_backup_job(
+    *,
+    created_by,
+    notes: str = '',
+    is_pre_restore_backup: bool = False,
+    parallel_jobs: int | str | None = None,
+) -> DatabaseOperation:
+    job = _create_backup_job(
+        created_by=created_by,
+        notes=notes,
+        is_pre_restore_backup=is_pre_restore_backup,
+        parallel_jobs=parallel_jobs,
     )
-    thread = threading.Thread(target=run_backup_job, args=(job.pk,), daemon=True)
-    thread.start()
+    jobs.dispatch(run_backup_job, job.pk, f'db-backup-{job.pk}')
     return job
 
 
-def enqueue_restore_job(*, created_by, uploaded_file, notes: str = '') -> DatabaseOperation:
-    backup_dir = _backup_dir()
+def enqueue_restore_job(
+    *,
+    created_by,
+    uploaded_file,
+    notes: str = '',
+    parallel_jobs: int | str | None = None,
+) -> DatabaseOperation:
     timestamp = timezone.now().strftime('%Y%m%d-%H%M%S')
-    filename = f'restore-upload-{timestamp}.dump'
-    target_path = backup_dir / filename
+    upload_name = Path(uploaded_file.name)
+    if _is_sqlite_archive(upload_name):
+        suffix = SQLITE_ARCHIVE_SUFFIX
+    elif _is_directory_archive(upload_name):
+        suffix = DIRECTORY_ARCHIVE_SUFFIX
+    else:
+        suffix = '.dump'
+    filename = f'restore-upload-{timestamp}{suffix}'
+
+    # Uploads go through the chunk store too, so re-uploading a downloaded
+    # backup costs almost no extra disk space.
+    with backup_store.BackupWriter(
+        filename,
+        kind=backup_store.KIND_UPLOAD,
+        metadata={'original_upload_name': uploaded_file.name},
+        max_bytes=_max_upload_bytes(),
+    ) as writer:
+        for chunk in uploaded_file.chunks(STREAM_CHUNK_SIZE):
+            writer.write(chunk)
+
+    file_size = writer.size
+    file_sha = writer.hexdigest()
+
+    # The restore and its safety backup become visible together, so a worker
+    # never sees the restore without the backup it has to wait for.
+    with transaction.atomic():
+        job = DatabaseOperation.objects.create(
+            operation_type=DatabaseOperation.TYPE_RESTORE,
+            created_by=created_by,
+            backup_filename=filename,
+            original_upload_name=uploaded_file.name,
+            file_size_bytes=file_size,
+            file_sha256=file_sha,
+            notes=notes,
+            parallel_jobs=resolve_parallel_jobs(parallel_jobs),
+        )
+        job.depends_on = _create_pre_restore_backup_job(job)
+        job.save(update_fields=['depends_on'])
 
-    with target_path.open('wb') as fh:
-        for chunk in uploaded_file.chunks():
-            fh.write(chunk)
+    # Write requests are refused from here on, until the restore has ended.
+    maintenance.set_maintenance(job.pk)
+    jobs.dispatch(run_restore_job, job.pk, f'db-restore-{job.pk}')
+    return job
 
-    file_size = target_path.stat().st_size
-    file_sha = _sha256_for_file(target_path)
 
-    job = DatabaseOperation.objects.create(
-        operation_type=DatabaseOperation.TYPE_RESTORE,
-        created_by=created_by,
-        backup_filename=filename,
-        original_upload_name=uploaded_file.name,
-        file_size_bytes=file_size,
-        file_sha256=file_sha,
-        notes=notes,
+def _create_pre_restore_backup_job(restore_job: DatabaseOperation) -> DatabaseOperation:
+    return _create_backup_job(
+        created_by=restore_job.created_by,
+        notes=f'Automatic backup before restore job #{restore_job.pk}',
+        is_pre_restore_backup=True,
+        parallel_jobs=restore_job.parallel_jobs,
     )
 
-    thread = threading.Thread(target=run_restore_job, args=(job.pk,), daemon=True)
-    thread.start()
-    return job
-
 
 def run_backup_job(job_id: int) -> None:
     job = DatabaseOperation.objects.get(pk=job_id)
     _set_running(job)
+    restore_id = None
+    if job.is_pre_restore_backup:
+        restore_id = DatabaseOperation.objects.filter(depends_on=job).values_list('pk', flat=True).first()
+    if restore_id is None:
+        _run_backup(job)
+        return
+    # The restore waits for this backup; keep its flag fresh meanwhile.
+    with maintenance.hold_maintenance(restore_id, clear=False):
+        _run_backup(job)
+
+
+def _run_backup(job: DatabaseOperation) -> None:
 
     timestamp = timezone.now().strftime('%Y%m%d-%H%M%S')
-    output_name = f'postgres-backup-{timestamp}-job{job.pk}.dump'
-    output_path = _backup_dir() / output_name
+    timings = {}
 
     try:
+        vendor = database_vendor()
+        parallel = vendor == 'postgresql' and job.parallel_jobs > 1
+        if vendor == 'sqlite':
+            output_name = f'sqlite-backup-{timestamp}-job{job.pk}{SQLITE_ARCHIVE_SUFFIX}'
+        else:
+            suffix = DIRECTORY_ARCHIVE_SUFFIX if parallel else '.dump'
+            output_name = f'postgres-backup-{timestamp}-job{job.pk}{suffix}'
+
         connections.close_all()
-        stdout, stderr = _dump_database(output_path)
+        with backup_store.BackupWriter(
+            output_name,
+            metadata={'operation_id': job.pk, 'is_pre_restore_backup': job.is_pre_restore_backup},
+        ) as writer:
+            if vendor == 'sqlite':
+                output = _dump_sqlite(writer, timings)
+            elif parallel:
+                output = _dump_database_parallel(writer, job.parallel_jobs, timings)
+            else:
+                started = time.monotonic()
+                output = _dump_database(writer)
+                timings['dump'] = round(time.monotonic() - started, 3)
 
         job.backup_filename = output_name
-        job.file_size_bytes = output_path.stat().st_size
-        job.file_sha256 = _sha256_for_file(output_path)
-        job.save(update_fields=['backup_filename', 'file_size_bytes', 'file_sha256'])
-
-        _set_succeeded(job, output=f'{stdout}\n{stderr}'.strip())
-        logger.info('Database backup job %s finished successfully.', job.pk)
+        job.file_size_bytes = writer.size
+        job.file_sha256 = writer.hexdigest()
+        job.timings = timings
+        job.save(update_fields=['backup_filename', 'file_size_bytes', 'file_sha256', 'timings'])
+
+        _set_succeeded(job, output=output)
+        logger.info(
+            'Database backup job %s finished successfully (%s bytes, %s new on disk).',
+            job.pk, writer.size, writer.new_bytes,
+        )
     except Exception as exc:
         _set_failed(job, str(exc))
         logger.exception('Database backup job %s failed.', job.pk)
+        return
+
+    try:
+        result = backup_store.apply_retention()
+        if result['pruned']:
+            logger.info(
+                'Backup retention pruned %s backup(s), freeing %s bytes.',
+                len(result['pruned']), result['bytes_freed'],
+            )
+    except Exception:
+        logger.exception('Backup retention failed after backup job %s.', job.pk)
+
+
+def _settle_restored_operations(restore_job: DatabaseOperation) -> None:
+    """
+    Finish the rows a restore brought back as queued or running.
+
+    Backups capture their own row as RUNNING, so the restored backup's row
+    (and that of its safety backup, if the dump has it) comes back that way.
+    Backups whose manifest is in the store did complete and are marked
+    succeeded from it; nothing is running the other rows any more.
+    """
+    manifests = {
+        manifest.get('operation_id'): manifest
+        for manifest in backup_store.list_manifests()
+        if manifest.get('kind') == backup_store.KIND_BACKUP
+    }
+    unfinished = DatabaseOperation.objects.filter(
+        status__in=[DatabaseOperation.STATUS_QUEUED, DatabaseOperation.STATUS_RUNNING],
+    ).exclude(pk=restore_job.pk)
+    for operation in unfinished:
+        manifest = manifests.get(operation.pk) if operation.operation_type == DatabaseOperation.TYPE_BACKUP else None
+        if manifest is not None and operation.backup_filename in ('', manifest['filename']) \
+                and backup_store.exists(manifest['filename']):
+            operation.status = DatabaseOperation.STATUS_SUCCEEDED
+            operation.finished_at = datetime.fromisoformat(manifest['created_at'])
+            operation.backup_filename = manifest['filename']
+            operation.file_size_bytes = manifest['size']
+            operation.file_sha256 = manifest['sha256']
+        else:
+            operation.status = DatabaseOperation.STATUS_FAILED
+            operation.finished_at = timezone.now()
+            operation.error_message = f'Interrupted: superseded by restore job #{restore_job.pk}.'
+        operation.lease_owner = ''
+        operation.lease_expires_at = None
+        operation.save(update_fields=[
+            'status', 'finished_at', 'backup_filename', 'file_size_bytes', 'file_sha256',
+            'error_message', 'lease_owner', 'lease_expires_at',
+        ])
 
 
 def run_restore_job(job_id: int) -> None:
     job = DatabaseOperation.objects.get(pk=job_id)
     _set_running(job)
+    # Renewed for as long as the restore runs, removed when it has ended.
+    with maintenance.hold_maintenance(job.pk):
+        _run_restore(job)
 
-    backup_path = _backup_dir() / job.backup_filename
-    if not backup_path.exists():
+
+def _run_restore(job: DatabaseOperation) -> None:
+    if not backup_store.exists(job.backup_filename):
         _set_failed(job, 'Uploaded restore file no longer exists.')
         return
 
-    pre_restore_job = None
+    pre_restore_job = job.depends_on
+    timings = {}
     try:
-        # Create a safety backup first so the restore remains reversible.
-        pre_restore_job = enqueue_backup_job(
-            created_by=job.created_by,
-            notes=f'Automatic backup before restore job #{job.pk}',
-            is_pre_restore_backup=True,
-        )
-
-        # Poll until the safety backup has finished.
-        while True:
-            pre_restore_job.refresh_from_db(fields=['status'])
-            if pre_restore_job.status in (DatabaseOperation.STATUS_FAILED, DatabaseOperation.STATUS_SUCCEEDED):
-                break
-            threading.Event().wait(0.5)
+        # The safety backup keeps the restore reversible.  A run_jobs worker
+        # only claims the restore once the backup has finished; in the
+        # web-process thread mode the backup is simply run first, here.
+        if pre_restore_job is None:
+            pre_restore_job = _create_pre_restore_backup_job(job)
+            job.depends_on = pre_restore_job
+            job.save(update_fields=['depends_on'])
+        if pre_restore_job.status == DatabaseOperation.STATUS_QUEUED:
+            run_backup_job(pre_restore_job.pk)
+            pre_restore_job.refresh_from_db()
 
         if pre_restore_job.status != DatabaseOperation.STATUS_SUCCEEDED:
             raise RuntimeError('Automatic pre-restore backup failed; restore aborted.')
-
-        _validate_restore_file(backup_path)
-        connections.close_all()
-        stdout, stderr = _restore_database(backup_path)
-        _set_succeeded(job, output=f'{stdout}\n{stderr}'.strip())
+        if pre_restore_job.started_at and pre_restore_job.finished_at:
+            timings['pre_restore_backup'] = round(
+                (pre_restore_job.finished_at - pre_restore_job.started_at).total_seconds(), 3,
+            )
+
+        vendor = database_vendor()
+        backup_is_sqlite = _is_sqlite_archive(Path(job.backup_filename))
+        if vendor == 'sqlite' and not backup_is_sqlite:
+            raise RuntimeError(f'This instance runs on SQLite; upload a {SQLITE_ARCHIVE_SUFFIX} backup.')
+        if vendor == 'postgresql' and backup_is_sqlite:
+            raise RuntimeError('This instance runs on PostgreSQL; upload a .dump or .tar backup.')
+
+        with tempfile.TemporaryDirectory(dir=_backup_dir(), prefix='.restore-') as tmp_dir:
+            started = time.monotonic()
+            backup_path = Path(tmp_dir) / job.backup_filename
+            backup_store.reassemble(job.backup_filename, backup_path)
+            timings['reassemble'] = round(time.monotonic() - started, 3)
+
+            if vendor == 'sqlite':
+                output = _restore_sqlite(backup_path, Path(tmp_dir), timings)
+            else:
+                output = _restore_postgres(backup_path, Path(tmp_dir), job.parallel_jobs, timings)
+
+        job.timings = timings
+        job.status = DatabaseOperation.STATUS_SUCCEEDED
+        job.finished_at = timezone.now()
+        job.output_log = output[:16000]
+        # The restored database may predate this job; a full save re-inserts the row then.
+        # Its safety backup row is usually missing as well.
+        if not DatabaseOperation.objects.filter(pk=job.depends_on_id).exists():
+            job.depends_on = None
+        job.save()
+        _settle_restored_operations(job)
         logger.info('Database restore job %s finished successfully.', job.pk)
     except Exception as exc:
+        job.timings = timings
+        job.save(update_fields=['timings'])
         _set_failed(job, str(exc))
         logger.exception('Database restore job %s failed.', job.pk)
+    finally:
+        # The upload has served its purpose; its chunks go with the next garbage collection.
+        backup_store.delete(job.backup_filename)
 
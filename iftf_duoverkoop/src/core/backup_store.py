@@ -0,0 +1,338 @@
+"""
+Content-addressed, deduplicated storage for database backups.
+
+Dumps are split into content-defined chunks while they are written.  Each
+unique chunk is stored once under ``<backup dir>/chunks/<aa>/<sha256>`` and
+every backup gets a JSON manifest under ``<backup dir>/manifests/`` listing
+its chunks.  Manifests live on disk rather than in the database so a restore
+(which replaces the DatabaseOperation table) never orphans the store.
+
+pg_dump compresses each table separately, so unchanged tables produce the
+same bytes in consecutive dumps and end up in the same chunks.
+
+Writers and garbage collection share a lock file in the store: storing or
+reusing a chunk takes it shared, a collection run exclusively, so a chunk
+cannot be removed between a writer finding it and refreshing its mtime.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from iftf_duoverkoop.src.core.file_lock import file_lock
+
+logger = logging.getLogger('iftf_duoverkoop.dbops')
+
+MANIFEST_VERSION = 1
+KIND_BACKUP = 'backup'
+KIND_UPLOAD = 'upload'
+
+# Chunk boundaries are placed right after the first occurrence of ANCHOR
+# once a chunk has reached MIN_CHUNK_SIZE.  Dumps are compressed, so a two
+# byte anchor shows up every ~64 KiB and boundaries follow the content:
+# an insertion only changes the chunks around it.  bytes.find keeps the
+# boundary search in C instead of hashing every byte in Python.
+ANCHOR = b'\x9f\x3c'
+MIN_CHUNK_SIZE = 512 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Chunks written or reused this recently are never garbage collected, so a
+# backup that is still being written keeps its chunks.
+GC_GRACE_SECONDS = 3600
+# Uploads are removed once their restore ends; this only catches leftovers.
+UPLOAD_MAX_AGE = timedelta(days=1)
+LOCK_NAME = '.lock'
+
+
+def _store_root() -> Path:
+    return Path(getattr(settings, 'DATABASE_BACKUP_DIR', Path(settings.MEDIA_ROOT) / 'backups'))
+
+
+def _chunks_dir() -> Path:
+    path = _store_root() / 'chunks'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _manifests_dir() -> Path:
+    path = _store_root() / 'manifests'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _store_lock(exclusive: bool):
+    return file_lock(_store_root() / LOCK_NAME, shared=not exclusive)
+
+
+def _chunk_path(digest: str) -> Path:
+    return _chunks_dir() / digest[:2] / digest
+
+
+def _manifest_path(filename: str) -> Path:
+    if not filename or Path(filename).name != filename:
+        raise ValueError(f'Invalid backup filename: {filename!r}')
+    return _manifests_dir() / f'{filename}.json'
+
+
+def _atomic_write(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(payload)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _find_boundary(buffer: bytearray, scan_from: int, final: bool) -> int | None:
+    """Return the length of the next chunk in *buffer*, or None if more data is needed."""
+    if len(buffer) < MIN_CHUNK_SIZE:
+        return len(buffer) if final and buffer else None
+    index = buffer.find(ANCHOR, max(scan_from, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+    if index >= 0:
+        return index + len(ANCHOR)
+    if len(buffer) >= MAX_CHUNK_SIZE:
+        return MAX_CHUNK_SIZE
+    return len(buffer) if final else None
+
+
+class BackupWriter:
+    """
+    File-like sink that chunks, deduplicates and hashes a backup as it is written.
+
+    Use as a context manager: the manifest is only saved when the block exits
+    without an exception, so a failed dump never shows up as a backup.
+    """
+
+    def __init__(self, filename: str, *, kind: str = KIND_BACKUP, metadata: dict | None = None,
+                 max_bytes: int | None = None):
+        self.filename = filename
+        self.kind = kind
+        self.metadata = metadata or {}
+        self.size = 0
+        self.new_bytes = 0
+        self._max_bytes = max_bytes
+        self._digest = hashlib.sha256()
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._chunks: list[list] = []
+        _manifest_path(filename)  # validate the name before any data is written
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self._max_bytes is not None and self.size > self._max_bytes:
+            raise RuntimeError(f'Backup file exceeds {self._max_bytes // (1024 * 1024)} MB upload limit.')
+        self._digest.update(data)
+        self._buffer += data
+        self._flush(final=False)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    def _flush(self, final: bool) -> None:
+        while True:
+            cut = _find_boundary(self._buffer, self._scan_from, final)
+            if cut is None:
+                # Everything up to here has been searched for the anchor already.
+                self._scan_from = max(len(self._buffer) - len(ANCHOR) + 1, 0)
+                return
+            self._store_chunk(bytes(self._buffer[:cut]))
+            del self._buffer[:cut]
+            self._scan_from = 0
+            if not self._buffer:
+                return
+
+    def _store_chunk(self, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        path = _chunk_path(digest)
+        with _store_lock(exclusive=False):
+            try:
+                # Refresh mtime so garbage collection treats the chunk as in use.
+                os.utime(path)
+            except FileNotFoundError:
+                _atomic_write(path, data)
+                self.new_bytes += len(data)
+        self._chunks.append([digest, len(data)])
+
+    def close(self) -> dict:
+        self._flush(final=True)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'filename': self.filename,
+            'kind': self.kind,
+            'created_at': timezone.now().isoformat(),
+            'size': self.size,
+            'sha256': self.hexdigest(),
+            'chunks': self._chunks,
+            **self.metadata,
+        }
+        _atomic_write(_manifest_path(self.filename), json.dumps(manifest).encode('utf-8'))
+        logger.info(
+            'Stored backup %s: %s bytes in %s chunks, %s bytes new.',
+            self.filename, self.size, len(self._chunks), self.new_bytes,
+        )
+        return manifest
+
+    def __enter__(self) -> 'BackupWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+
+def exists(filename: str) -> bool:
+    try:
+        return _manifest_path(filename).is_file()
+    except ValueError:
+        return False
+
+
+def load_manifest(filename: str) -> dict:
+    try:
+        return json.loads(_manifest_path(filename).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        raise FileNotFoundError(f'Backup {filename} is not in the backup store.') from None
+
+
+def delete(filename: str) -> None:
+    """Drop a backup's manifest; its chunks are removed by the next garbage collection."""
+    _manifest_path(filename).unlink(missing_ok=True)
+
+
+def iter_backup(filename: str):
+    """Yield the reassembled backup chunk by chunk, verifying every chunk hash."""
+    manifest = load_manifest(filename)
+    for digest, size in manifest['chunks']:
+        data = _chunk_path(digest).read_bytes()
+        if len(data) != size or hashlib.sha256(data).hexdigest() != digest:
+            raise RuntimeError(f'Backup chunk {digest} is corrupt; backup {filename} cannot be reassembled.')
+        yield data
+
+
+def reassemble(filename: str, target_path: Path) -> dict:
+    """Write the full backup to *target_path* and check it against the manifest's SHA-256."""
+    manifest = load_manifest(filename)
+    digest = hashlib.sha256()
+    with target_path.open('wb') as fh:
+        for data in iter_backup(filename):
+            digest.update(data)
+            fh.write(data)
+    if digest.hexdigest() != manifest['sha256']:
+        target_path.unlink(missing_ok=True)
+        raise RuntimeError(f'Backup {filename} does not match its recorded SHA-256.')
+    return manifest
+
+
+def list_manifests() -> list[dict]:
+    manifests = []
+    for path in _manifests_dir().glob('*.json'):
+        try:
+            manifests.append(json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            logger.warning('Skipping unreadable backup manifest %s.', path.name)
+    return manifests
+
+
+def _created_at(manifest: dict) -> datetime:
+    return datetime.fromisoformat(manifest['created_at'])
+
+
+def select_for_pruning(manifests: list[dict], *, keep_last: int, keep_daily_days: int, now=None) -> list[dict]:
+    """
+    Apply the retention policy and return the manifests that should go.
+
+    Kept: the newest *keep_last* backups, the newest backup of each day for
+    the last *keep_daily_days* days, and every pre-restore safety backup.
+    Uploads older than a day are leftovers from restores that never finished.
+    """
+    now = now or timezone.now()
+    backups = sorted(
+        (m for m in manifests if m.get('kind') == KIND_BACKUP),
+        key=_created_at,
+        reverse=True,
+    )
+    keep = {m['filename'] for m in backups[:max(keep_last, 0)]}
+    keep.update(m['filename'] for m in backups if m.get('is_pre_restore_backup'))
+
+    daily_cutoff = now - timedelta(days=keep_daily_days)
+    seen_days = set()
+    for manifest in backups:
+        created = _created_at(manifest)
+        if created < daily_cutoff:
+            continue
+        day = timezone.localtime(created).date()
+        if day not in seen_days:
+            seen_days.add(day)
+            keep.add(manifest['filename'])
+
+    prune = [m for m in backups if m['filename'] not in keep]
+    prune.extend(
+        m for m in manifests
+        if m.get('kind') == KIND_UPLOAD and _created_at(m) < now - UPLOAD_MAX_AGE
+    )
+    return prune
+
+
+def collect_garbage(dry_run: bool = False) -> tuple[int, int]:
+    """Remove chunks no manifest refers to.  Returns (chunks removed, bytes freed)."""
+    with _store_lock(exclusive=True):
+        referenced = {digest for manifest in list_manifests() for digest, _ in manifest['chunks']}
+        grace_cutoff = timezone.now().timestamp() - GC_GRACE_SECONDS
+        removed = 0
+        freed = 0
+        for path in _chunks_dir().glob('*/*'):
+            if path.name.startswith('.') or path.name in referenced:
+                continue
+            # Stat right before the unlink, so the mtime checked is the current one.
+            try:
+                stat_result = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat_result.st_mtime > grace_cutoff:
+                continue
+            removed += 1
+            freed += stat_result.st_size
+            if not dry_run:
+                path.unlink(missing_ok=True)
+        return removed, freed
+
+
+def apply_retention(*, keep_last: int | None = None, keep_daily_days: int | None = None,
+                    dry_run: bool = False) -> dict:
+    """Prune backups outside the retention policy, then garbage-collect their chunks."""
+    if keep_last is None:
+        keep_last = int(getattr(settings, 'DATABASE_BACKUP_KEEP_LAST', 7))
+    if keep_daily_days is None:
+        keep_daily_days = int(getattr(settings, 'DATABASE_BACKUP_KEEP_DAILY_DAYS', 14))
+
+    pruned = select_for_pruning(list_manifests(), keep_last=keep_last, keep_daily_days=keep_daily_days)
+    if not dry_run:
+        for manifest in pruned:
+            delete(manifest['filename'])
+            logger.info('Pruned backup %s (retention policy).', manifest['filename'])
+    chunks_removed, bytes_freed = collect_garbage(dry_run=dry_run)
+    return {
+        'pruned': [m['filename'] for m in pruned],
+        'chunks_removed': chunks_removed,
+        'bytes_freed': bytes_freed,
+    }
+
+
+def usage() -> dict:
+    """Logical size of all stored backups versus the bytes the chunk store actually uses."""
+    manifests = list_manifests()
+    return {
+        'backups': sum(1 for m in manifests if m.get('kind') == KIND_BACKUP),
+        'logical_bytes': sum(m['size'] for m in manifests),
+        'stored_bytes': sum(p.stat().st_size for p in _chunks_dir().glob('*/*') if not p.name.startswith('.')),
+    }
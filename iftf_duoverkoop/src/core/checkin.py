@@ -0,0 +1,223 @@
+"""
+Batch code verification and admission tracking for door scanners.
+
+``check_in`` answers a whole batch of scanned codes for one performance with
+the four outcomes of the verify page:
+
+    valid              a ticket of the purchase is for this performance
+    wrong_performance  tickets for the association, but other performances
+    wrong_association  the code exists, for other associations only
+    not_found          no purchase has this code
+
+plus ``invalid_format`` for input that cannot be a code.  All codes of the
+batch are looked up in one query on the unique verification_code index,
+with the tickets' associations joined in.  Codes that were not found get
+``suggestions``: existing codes of the association a typo away (see
+``verification_codes.suggest_codes``), again one query for the batch.
+
+Valid codes are admitted: one Admission row per purchase and performance.
+The rows are inserted with ``ignore_conflicts``, so a code scanned twice (at
+two doors at once, even) ends up with one row, and the row's ``scan_id``
+tells which request admitted it first.  Codes whose row carries another
+scan id are reported as already admitted, with when and by whom.
+
+``acheck_in`` is the same for the async check-in view, on the async ORM.
+"""
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Q
+
+from iftf_duoverkoop.src.core.models import Admission, Purchase
+from iftf_duoverkoop.src.core.verification_codes import normalize_code, suggest_codes, validate_code_format
+
+OUTCOME_VALID = 'valid'
+OUTCOME_WRONG_PERFORMANCE = 'wrong_performance'
+OUTCOME_WRONG_ASSOCIATION = 'wrong_association'
+OUTCOME_NOT_FOUND = 'not_found'
+OUTCOME_INVALID_FORMAT = 'invalid_format'
+
+ADMISSION_ADMITTED = 'admitted'
+ADMISSION_ALREADY_ADMITTED = 'already_admitted'
+
+MAX_BATCH_SIZE = 200
+
+
+def classify(tickets, performance_key: str | None, association_id: str) -> tuple[str, list[str]]:
+    """
+    The outcome for a purchase whose *tickets* are (performance key,
+    association name) pairs, checked at *performance_key* of
+    *association_id*; plus the keys of the association's own tickets.
+    """
+    own_keys = [key for key, ticket_association in tickets if ticket_association == association_id]
+    if not own_keys:
+        return OUTCOME_WRONG_ASSOCIATION, own_keys
+    if performance_key in own_keys:
+        return OUTCOME_VALID, own_keys
+    return OUTCOME_WRONG_PERFORMANCE, own_keys
+
+
+def association_purchases(association_id: str):
+    """Purchases with a ticket for one of *association_id*'s performances."""
+    return Purchase.objects.filter(Q(ticket1__association_id=association_id) | Q(ticket2__association_id=association_id))
+
+
+def _purchase_rows(codes):
+    return Purchase.objects.filter(verification_code__in=codes).values_list(
+        'pk', 'verification_code', 'name',
+        'ticket1_id', 'ticket1__association_id', 'ticket2_id', 'ticket2__association_id',
+    )
+
+
+def _lookup(codes) -> dict:
+    return {row[1]: row for row in _purchase_rows(codes)}
+
+
+async def _alookup(codes) -> dict:
+    return {row[1]: row async for row in _purchase_rows(codes)}
+
+
+def _new_admissions(purchase_ids, performance_key: str, user, scan_id: str) -> list[Admission]:
+    return [
+        Admission(purchase_id=pk, performance_id=performance_key, admitted_by=user, scan_id=scan_id)
+        for pk in purchase_ids
+    ]
+
+
+def _admit(purchase_ids, performance_key: str, user, scan_id: str) -> None:
+    with transaction.atomic():
+        Admission.objects.bulk_create(
+            _new_admissions(purchase_ids, performance_key, user, scan_id), ignore_conflicts=True,
+        )
+
+
+async def _aadmit(purchase_ids, performance_key: str, user, scan_id: str) -> None:
+    # One INSERT statement, so it needs no surrounding transaction.
+    await Admission.objects.abulk_create(
+        _new_admissions(purchase_ids, performance_key, user, scan_id), ignore_conflicts=True,
+    )
+
+
+def _admission_rows(purchase_ids, performance_key: str):
+    return Admission.objects.filter(performance_id=performance_key, purchase_id__in=purchase_ids).values_list(
+        'purchase_id', 'scan_id', 'admitted_at', 'admitted_by__username',
+    )
+
+
+def _admissions(purchase_ids, performance_key: str) -> dict:
+    return {row[0]: row[1:] for row in _admission_rows(purchase_ids, performance_key)}
+
+
+async def _aadmissions(purchase_ids, performance_key: str) -> dict:
+    return {row[0]: row[1:] async for row in _admission_rows(purchase_ids, performance_key)}
+
+
+def _normalize(codes) -> list:
+    return [normalize_code(code) if validate_code_format(code) else None for code in codes]
+
+
+def _classify_batch(codes, normalized, found: dict, performance_key: str, association_id: str) -> tuple[list, set]:
+    results = []
+    valid_ids = set()
+    for raw, code in zip(codes, normalized):
+        result = {'code': raw}
+        row = found.get(code) if code else None
+        if code is None:
+            result['outcome'] = OUTCOME_INVALID_FORMAT
+        elif row is None:
+            result['outcome'] = OUTCOME_NOT_FOUND
+        else:
+            pk, _code, name, ticket1, association1, ticket2, association2 = row
+            outcome, own_keys = classify(
+                ((ticket1, association1), (ticket2, association2)), performance_key, association_id,
+            )
+            result['outcome'] = outcome
+            if outcome == OUTCOME_VALID:
+                result['name'] = name
+                result['purchase_id'] = pk
+                valid_ids.add(pk)
+            elif outcome == OUTCOME_WRONG_PERFORMANCE:
+                result['performances'] = own_keys
+        results.append(result)
+    return results, valid_ids
+
+
+def _missed(results: list) -> list:
+    return [result for result in results if result['outcome'] in (OUTCOME_NOT_FOUND, OUTCOME_INVALID_FORMAT)]
+
+
+def _add_suggestions(missed: list, suggestions: dict) -> None:
+    for result in missed:
+        result['suggestions'] = suggestions[result['code']]
+
+
+def _add_admissions(results: list, admissions: dict, scan_id: str) -> None:
+    # The same code twice in one batch is a double entry as well.
+    seen = set()
+    for result in results:
+        pk = result.pop('purchase_id', None)
+        if pk is None:
+            continue
+        admission = admissions.get(pk)
+        if admission is None:
+            result['admission'] = None
+            continue
+        admission_scan_id, admitted_at, admitted_by = admission
+        first = admission_scan_id == scan_id and pk not in seen
+        seen.add(pk)
+        result['admission'] = ADMISSION_ADMITTED if first else ADMISSION_ALREADY_ADMITTED
+        result['admitted_at'] = admitted_at.isoformat()
+        result['admitted_by'] = admitted_by
+
+
+def check_in(codes, performance_key: str, association_id: str, user, *, admit: bool = True) -> list[dict]:
+    """
+    One result dict per entry of *codes*, in order.
+
+    Valid codes also carry ``name`` and an ``admission`` status; with
+    ``admit=False`` nothing is recorded and the status only reports earlier
+    admissions.  ``wrong_performance`` results list the association's
+    ``performances`` on the ticket instead, codes that were not found the
+    ``suggestions`` of codes they may have been meant as.
+    """
+    normalized = _normalize(codes)
+    found = _lookup({code for code in normalized if code})
+    results, valid_ids = _classify_batch(codes, normalized, found, performance_key, association_id)
+
+    missed = _missed(results)
+    if missed:
+        suggestions = suggest_codes([result['code'] for result in missed], association_purchases(association_id))
+        _add_suggestions(missed, suggestions)
+
+    if not valid_ids:
+        return results
+
+    scan_id = uuid.uuid4().hex
+    if admit:
+        _admit(valid_ids, performance_key, user, scan_id)
+    _add_admissions(results, _admissions(valid_ids, performance_key), scan_id)
+    return results
+
+
+async def acheck_in(codes, performance_key: str, association_id: str, user, *, admit: bool = True) -> list[dict]:
+    """check_in() on the async ORM; the suggestion search is CPU work and runs in the sync thread."""
+    normalized = _normalize(codes)
+    found = await _alookup({code for code in normalized if code})
+    results, valid_ids = _classify_batch(codes, normalized, found, performance_key, association_id)
+
+    missed = _missed(results)
+    if missed:
+        suggestions = await sync_to_async(suggest_codes)(
+            [result['code'] for result in missed], association_purchases(association_id),
+        )
+        _add_suggestions(missed, suggestions)
+
+    if not valid_ids:
+        return results
+
+    scan_id = uuid.uuid4().hex
+    if admit:
+        await _aadmit(valid_ids, performance_key, user, scan_id)
+    _add_admissions(results, await _aadmissions(valid_ids, performance_key), scan_id)
+    return results
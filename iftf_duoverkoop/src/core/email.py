@@ -1,19 +1,39 @@
 """Async confirmation email sending with status tracking and Mailgun API support."""
+import base64
+import hashlib
 import logging
 import mimetypes
+import re
+import stat
 import threading
+import time
+from collections import OrderedDict
 from datetime import timedelta
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import quote_plus
 from zoneinfo import ZoneInfo
 
 import requests
 from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Lower, Trim
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.template import Context, Template, TemplateSyntaxError
 from django.utils import timezone as dj_timezone
+from django.utils.html import escape
 from django.utils.translation import gettext as _
 
-from iftf_duoverkoop.src.core.models import EmailCampaign, EmailCampaignRecipient, EmailTemplateSettings, Purchase
+from iftf_duoverkoop.src.core import jobs, qr
+from iftf_duoverkoop.src.core.models import (
+    EmailCampaign,
+    EmailCampaignRecipient,
+    EmailResendJob,
+    EmailTemplateSettings,
+    Purchase,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +76,21 @@ def _required_mail_info_html() -> str:
     )
 
 
+@lru_cache(maxsize=32)
+def _required_mail_info_html_for(border_color: str) -> str:
+    """Pre-rendered required-info block; only the border colour varies between mails."""
+    return _required_mail_info_html().replace('{{ border_color }}', border_color or '#dbe3ec')
+
+
+@lru_cache(maxsize=8)
+def _logo_block_html(logo_url: str) -> str:
+    return (
+        '<div style="text-align:center;margin:0 0 14px 0;">'
+        f'<img src="{logo_url}" alt="IFTF" style="max-height:64px;max-width:220px;">'
+        '</div>'
+    )
+
+
 def _ensure_subject_has_code(subject: str, verification_code: str) -> str:
     subject_clean = (subject or '').strip()
     code_clean = (verification_code or '').strip()
@@ -68,30 +103,27 @@ def _ensure_subject_has_code(subject: str, verification_code: str) -> str:
     return code_clean
 
 
+_BODY_TAG_RE = re.compile(r'<body[^>]*>', re.IGNORECASE)
+
+
 def _inject_logo_into_html(html: str, logo_url: str) -> str:
     if not logo_url:
         return html
     if logo_url in html:
         return html
 
-    logo_block = (
-        '<div style="text-align:center;margin:0 0 14px 0;">'
-        f'<img src="{logo_url}" alt="IFTF" style="max-height:64px;max-width:220px;">'
-        '</div>'
-    )
-    lower_html = html.lower()
-    body_start = lower_html.find('<body')
-    if body_start >= 0:
-        body_tag_end = lower_html.find('>', body_start)
-        if body_tag_end >= 0:
-            insert_at = body_tag_end + 1
-            return html[:insert_at] + logo_block + html[insert_at:]
+    logo_block = _logo_block_html(logo_url)
+    # Search for the opening body tag without lower-casing a copy of the whole mail.
+    body_tag = _BODY_TAG_RE.search(html)
+    if body_tag is not None:
+        insert_at = body_tag.end()
+        return html[:insert_at] + logo_block + html[insert_at:]
     return logo_block + html
 
 
 def _append_required_info(text_body: str, html_body: str, border_color: str) -> tuple[str, str]:
     required_text = _required_mail_info_text()
-    required_html = _required_mail_info_html().replace('{{ border_color }}', border_color or '#dbe3ec')
+    required_html = _required_mail_info_html_for(border_color or '#dbe3ec')
 
     text_out = text_body
     if 'https://iftf.be/contact/' not in (text_body or ''):
@@ -103,20 +135,72 @@ def _append_required_info(text_body: str, html_body: str, border_color: str) ->
     return text_out, html_out
 
 
+class _InlineLogoCache:
+    """
+    Keeps the inline logo attachment in memory between sends.
+
+    The file is only re-stat'ed every ``recheck_seconds`` and only re-read when
+    its mtime or size changed, so large campaigns do not hit the disk per mail.
+    The returned tuple is shared by every send, so requests reuses the same
+    bytes buffer for the multipart body.
+    """
+
+    def __init__(self, recheck_seconds: float = 30.0):
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._checked_at: float | None = None
+        self._signature: tuple | None = None
+        self._attachment: tuple[str, bytes, str] | None = None
+
+    @staticmethod
+    def _candidate_paths() -> list[Path]:
+        return [
+            Path(settings.BASE_DIR) / 'iftf_duoverkoop' / 'static' / 'Site logo.png',
+            Path(getattr(settings, 'STATIC_ROOT', Path(settings.BASE_DIR) / 'staticfiles')) / 'Site logo.png',
+        ]
+
+    def get(self) -> tuple[str, bytes, str] | None:
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.recheck_seconds:
+                return self._attachment
+
+            attachment = None
+            signature = None
+            for path in self._candidate_paths():
+                try:
+                    stat_result = path.stat()
+                    if not stat.S_ISREG(stat_result.st_mode):
+                        continue
+                    signature = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+                    if signature == self._signature:
+                        attachment = self._attachment
+                    else:
+                        content_type = mimetypes.guess_type(str(path))[0] or 'image/png'
+                        attachment = ('iftf-logo.png', path.read_bytes(), content_type)
+                    break
+                except Exception:
+                    signature = None
+                    continue
+
+            self._checked_at = now
+            self._signature = signature
+            self._attachment = attachment
+            return attachment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._checked_at = None
+            self._signature = None
+            self._attachment = None
+
+
+_inline_logo_cache = _InlineLogoCache()
+
+
 def _load_iftf_logo_inline_attachment() -> tuple[str, bytes, str] | None:
     """Return inline logo tuple (filename, bytes, content_type) when available."""
-    candidate_paths = [
-        Path(settings.BASE_DIR) / 'iftf_duoverkoop' / 'static' / 'Site logo.png',
-        Path(getattr(settings, 'STATIC_ROOT', Path(settings.BASE_DIR) / 'staticfiles')) / 'Site logo.png',
-    ]
-    for path in candidate_paths:
-        try:
-            if path.exists() and path.is_file():
-                content_type = mimetypes.guess_type(str(path))[0] or 'image/png'
-                return 'iftf-logo.png', path.read_bytes(), content_type
-        except Exception:
-            continue
-    return None
+    return _inline_logo_cache.get()
 
 
 def _inline_logo_for_mail_html(html_body: str) -> tuple[str, list[tuple[str, bytes, str]]]:
@@ -143,6 +227,84 @@ def _inline_logo_for_mail_html(html_body: str) -> tuple[str, list[tuple[str, byt
     return html_out, []
 
 
+VERIFICATION_QR_FILENAME = 'verification-code.png'
+VERIFICATION_QR_CID = f'cid:{VERIFICATION_QR_FILENAME}'
+_BODY_CLOSE_RE = re.compile(r'</body\s*>', re.IGNORECASE)
+
+
+class _VerificationQRCache:
+    """
+    Thread-safe LRU of rendered verification QR images keyed by purchase.
+
+    Each entry remembers the code it was drawn for, so a purchase whose code
+    changed gets a new image; resends and retries reuse the cached PNG.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[int, tuple[str, tuple[str, bytes, str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, purchase_id: int, verification_code: str) -> tuple[str, bytes, str]:
+        with self._lock:
+            entry = self._entries.get(purchase_id)
+            if entry is not None and entry[0] == verification_code:
+                self._entries.move_to_end(purchase_id)
+                return entry[1]
+
+        attachment = (VERIFICATION_QR_FILENAME, qr.render_png(verification_code), 'image/png')
+        with self._lock:
+            self._entries[purchase_id] = (verification_code, attachment)
+            self._entries.move_to_end(purchase_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return attachment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_verification_qr_cache = _VerificationQRCache()
+
+
+def _verification_qr_block_html(qr_url: str, verification_code: str) -> str:
+    code = escape(verification_code)
+    return (
+        '<div style="text-align:center;margin:16px 0;">'
+        f'<img src="{qr_url}" alt="{code}" width="180" height="180" '
+        'style="width:180px;height:180px;image-rendering:pixelated;">'
+        f'<div style="font-family:monospace;font-size:16px;margin-top:4px;">{code}</div>'
+        '</div>'
+    )
+
+
+def _inject_verification_qr_into_html(html: str, verification_code: str) -> str:
+    """Add the QR image before ``</body>`` unless the template already places ``verification_qr_url``."""
+    if not verification_code or VERIFICATION_QR_CID in html:
+        return html
+    block = _verification_qr_block_html(VERIFICATION_QR_CID, verification_code)
+    body_close = _BODY_CLOSE_RE.search(html)
+    if body_close is not None:
+        return html[:body_close.start()] + block + html[body_close.start():]
+    return html + block
+
+
+def _verification_qr_inline_attachments(html_body: str, purchase: Purchase) -> list[tuple[str, bytes, str]]:
+    """The QR image to send inline, if the mail refers to it; a failure only drops the image."""
+    if VERIFICATION_QR_CID not in (html_body or '') or not purchase.verification_code:
+        return []
+    try:
+        return [_verification_qr_cache.get(purchase.pk, purchase.verification_code)]
+    except Exception as exc:
+        logger.warning('Could not render the verification QR code for purchase %s: %s', purchase.pk, exc)
+        return []
+
+
+def _verification_qr_data_uri(verification_code: str) -> str:
+    return 'data:image/png;base64,' + base64.b64encode(qr.render_png(verification_code)).decode('ascii')
+
+
 def render_email_html_preview(
     html_template: str,
     style_context: dict | None = None,
@@ -178,6 +340,8 @@ def render_email_html_preview(
         sample_context.update(_build_render_context(purchase))
     if style_context:
         sample_context.update(style_context)
+    # Browsers cannot resolve cid: references; show the image inline instead.
+    sample_context['verification_qr_url'] = _verification_qr_data_uri(sample_context['verification_code'])
 
     fallback_html = (
         '<html><body style="font-family:Arial,sans-serif;">'
@@ -213,6 +377,18 @@ def _ics_escape(value: str) -> str:
     )
 
 
+_ICS_CALENDAR_HEADER = (
+    'BEGIN:VCALENDAR',
+    'VERSION:2.0',
+    'PRODID:-//IFTF//DuoVerkoop//NL',
+    'CALSCALE:GREGORIAN',
+    'METHOD:PUBLISH',
+    'NAME:IFTF Duoverkoop tickets',
+    'X-WR-CALNAME:IFTF Duoverkoop tickets',
+    'X-WR-CALDESC:IFTF duo ticket purchase containing two performances',
+)
+
+
 def build_purchase_ics_bytes(purchase: Purchase) -> bytes:
     """Generate an ICS file containing both performances for this purchase."""
     tz = _display_timezone()
@@ -257,16 +433,7 @@ def build_purchase_ics_bytes(purchase: Purchase) -> bytes:
         if maps_url:
             events[-1].insert(-1, f'URL:{_ics_escape(maps_url)}')
 
-    lines = [
-        'BEGIN:VCALENDAR',
-        'VERSION:2.0',
-        'PRODID:-//IFTF//DuoVerkoop//NL',
-        'CALSCALE:GREGORIAN',
-        'METHOD:PUBLISH',
-        'NAME:IFTF Duoverkoop tickets',
-        'X-WR-CALNAME:IFTF Duoverkoop tickets',
-        'X-WR-CALDESC:IFTF duo ticket purchase containing two performances',
-    ]
+    lines = list(_ICS_CALENDAR_HEADER)
     for event in events:
         lines.extend(event)
     lines.append('END:VCALENDAR')
@@ -281,15 +448,60 @@ def _load_template_settings() -> EmailTemplateSettings | None:
         return None
 
 
+class _CompiledTemplateCache:
+    """
+    Small thread-safe LRU of compiled Django templates keyed by a hash of their source.
+
+    Parsing is the expensive part of rendering a ``Template``; campaign and
+    confirmation mails reuse the same handful of sources for every recipient.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, Template] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_string: str) -> Template:
+        key = hashlib.sha256(template_string.encode('utf-8')).hexdigest()
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+
+        # Compile outside the lock; a syntax error propagates and is not cached.
+        compiled = Template(template_string)
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_template_cache = _CompiledTemplateCache()
+
+
+@receiver(post_save, sender=EmailTemplateSettings)
+@receiver(post_save, sender=EmailCampaign)
+def _invalidate_template_cache(sender, **kwargs) -> None:
+    """Drop compiled templates once staff edit a template so stale entries do not linger."""
+    _template_cache.clear()
+
+
 def _safe_render(template_string: str, context: dict, fallback: str) -> str:
     try:
-        return Template(template_string).render(Context(context))
+        return _template_cache.get(template_string).render(Context(context))
     except TemplateSyntaxError as exc:
         logger.error('Invalid email template syntax, falling back to defaults: %s', exc)
-        return Template(fallback).render(Context(context))
+        return _template_cache.get(fallback).render(Context(context))
     except Exception as exc:
         logger.error('Unexpected email template render failure, falling back to defaults: %s', exc)
-        return Template(fallback).render(Context(context))
+        return _template_cache.get(fallback).render(Context(context))
 
 
 def _build_render_context(purchase: Purchase) -> dict:
@@ -309,12 +521,25 @@ def _build_render_context(purchase: Purchase) -> dict:
         'iftf_home_url': 'https://iftf.be',
         'iftf_contact_url': 'https://iftf.be/contact/',
         'iftf_logo_url': getattr(settings, 'IFTF_LOGO_URL', ''),
+        'verification_qr_url': VERIFICATION_QR_CID,
     }
 
 
-def _build_confirmation_parts(purchase: Purchase, subject: str | None, message: str | None) -> tuple[str, str, str]:
+def _build_confirmation_parts(
+    purchase: Purchase,
+    subject: str | None,
+    message: str | None,
+    tpl: EmailTemplateSettings | None = None,
+) -> tuple[str, str, str]:
+    """
+    Render subject, text and HTML for a confirmation mail.
+
+    Pass *tpl* when rendering several mails in a row so the template
+    settings row is loaded once per batch instead of once per mail.
+    """
     context = _build_render_context(purchase)
-    tpl = _load_template_settings()
+    if tpl is None:
+        tpl = _load_template_settings()
 
     fallback_subject = 'IFTF duo ticket confirmation - {{ verification_code }}'
     fallback_text = (
@@ -377,6 +602,7 @@ def _build_confirmation_parts(purchase: Purchase, subject: str | None, message:
     border_color = context.get('border_color', '#dbe3ec')
     text_out, html_out = _append_required_info(text_out, html_out, border_color)
     html_out = _inject_logo_into_html(html_out, context.get('iftf_logo_url', ''))
+    html_out = _inject_verification_qr_into_html(html_out, purchase.verification_code)
     subject_out = _ensure_subject_has_code(subject_out, purchase.verification_code)
     return subject_out.strip(), text_out.strip(), html_out
 
@@ -387,6 +613,7 @@ def _send_via_mailgun_raw(
     text_body: str,
     html_body: str,
     attachments: list[tuple[str, bytes, str]] | None = None,
+    inline_attachments: list[tuple[str, bytes, str]] | None = None,
 ) -> None:
     api_key = (getattr(settings, 'MAILGUN_API_KEY', '') or '').strip()
     domain = (getattr(settings, 'MAILGUN_DOMAIN', '') or '').strip()
@@ -405,9 +632,9 @@ def _send_via_mailgun_raw(
     for filename, payload, content_type in attachments or []:
         files_payload.append(('attachment', (filename, payload, content_type)))
 
-    html_payload, inline_attachments = _inline_logo_for_mail_html(html_body)
+    html_payload, logo_attachments = _inline_logo_for_mail_html(html_body)
 
-    for filename, payload, content_type in inline_attachments:
+    for filename, payload, content_type in logo_attachments + list(inline_attachments or []):
         files_payload.append(('inline', (filename, payload, content_type)))
 
     response = requests.post(
@@ -436,6 +663,7 @@ def _send_via_mailgun(recipient: str, subject: str, text_body: str, html_body: s
         text_body=text_body,
         html_body=html_body,
         attachments=[(ics_filename, ics_bytes, 'text/calendar')],
+        inline_attachments=_verification_qr_inline_attachments(html_body, purchase),
     )
 
 
@@ -508,57 +736,112 @@ def build_confirmation_message(purchase: Purchase) -> tuple[str, str]:
     return subject, message
 
 
-def _campaign_purchase_queryset(campaign: EmailCampaign):
-    qs = Purchase.objects.select_related(
-        'ticket1', 'ticket1__association',
-        'ticket2', 'ticket2__association',
-    ).order_by('-date')
+# Rows are streamed from the audience query and written in batches so large
+# campaigns never hold every purchase (or every recipient row) in memory.
+CAMPAIGN_RECIPIENT_BATCH_SIZE = 500
 
-    if campaign.audience_type == EmailCampaign.AUDIENCE_ASSOCIATIONS:
-        assoc_ids = list(campaign.audience_associations.values_list('pk', flat=True))
-        qs = qs.filter(ticket1__association__in=assoc_ids) | qs.filter(ticket2__association__in=assoc_ids)
-        qs = qs.distinct()
-    elif campaign.audience_type == EmailCampaign.AUDIENCE_PERFORMANCE and campaign.audience_performance_id:
-        perf = campaign.audience_performance
-        qs = qs.filter(ticket1=perf) | qs.filter(ticket2=perf)
-        qs = qs.distinct()
 
-    return qs
+def _campaign_audience_filter(audience_type: str, association_ids=None, performance_id=None) -> Q:
+    """Return the Purchase filter matching a campaign audience selection."""
+    if audience_type == EmailCampaign.AUDIENCE_ASSOCIATIONS:
+        assoc_ids = list(association_ids or [])
+        return Q(ticket1__association__in=assoc_ids) | Q(ticket2__association__in=assoc_ids)
+    if audience_type == EmailCampaign.AUDIENCE_PERFORMANCE and performance_id:
+        return Q(ticket1_id=performance_id) | Q(ticket2_id=performance_id)
+    return Q()
 
 
-def _build_campaign_recipient_rows(campaign: EmailCampaign) -> list[EmailCampaignRecipient]:
-    purchases = _campaign_purchase_queryset(campaign)
+def _campaign_purchase_queryset(audience_filter: Q):
+    """All purchases in the audience that carry a usable email address."""
+    return (
+        Purchase.objects.filter(audience_filter)
+        .annotate(email_key=Lower(Trim('email')))
+        .exclude(email_key='')
+    )
 
-    # Deduplicate by email to avoid sending duplicates for customers
-    # with multiple purchases.
-    by_email: dict[str, Purchase] = {}
-    for purchase in purchases:
-        email = (purchase.email or '').strip().lower()
-        if not email or email in by_email:
-            continue
-        by_email[email] = purchase
 
-    rows: list[EmailCampaignRecipient] = []
-    for email, purchase in by_email.items():
-        rows.append(
+def _campaign_audience_queryset(audience_filter: Q):
+    """
+    Return one row per distinct (lowercased) email: the newest matching purchase.
+
+    PostgreSQL resolves this with ``DISTINCT ON (lower(email))``; other
+    backends keep the purchase a correlated subquery picks for its email.
+    Both order by ``(-date, -id)``, so they choose the same purchase, and
+    deduplication happens in SQL instead of in Python.
+    """
+    qs = _campaign_purchase_queryset(audience_filter)
+    if connection.vendor == 'postgresql':
+        qs = qs.order_by('email_key', '-date', '-id').distinct('email_key')
+    else:
+        newest = (
+            _campaign_purchase_queryset(audience_filter)
+            .filter(email_key=OuterRef('email_key'))
+            .order_by('-date', '-id')
+            .values('pk')[:1]
+        )
+        qs = qs.annotate(newest_id=Subquery(newest)).filter(pk=F('newest_id')).order_by('email_key')
+    return qs.values(
+        'pk',
+        'email_key',
+        'name',
+        'ticket1_id',
+        'ticket1__association_id',
+        'ticket2_id',
+        'ticket2__association_id',
+    )
+
+
+def count_campaign_audience(audience_type: str, association_ids=None, performance_id=None) -> int:
+    """Return the number of distinct recipients a campaign audience would reach."""
+    audience_filter = _campaign_audience_filter(audience_type, association_ids, performance_id)
+    return _campaign_purchase_queryset(audience_filter).aggregate(
+        total=Count('email_key', distinct=True),
+    )['total']
+
+
+def _create_campaign_recipient_rows(campaign: EmailCampaign) -> int:
+    """(Re)create the recipient rows for *campaign* and return how many were written."""
+    audience_filter = _campaign_audience_filter(
+        campaign.audience_type,
+        [a.pk for a in campaign.audience_associations.all()],
+        campaign.audience_performance_id,
+    )
+    EmailCampaignRecipient.objects.filter(campaign=campaign).delete()
+
+    total = 0
+    batch: list[EmailCampaignRecipient] = []
+    for row in _campaign_audience_queryset(audience_filter).iterator(chunk_size=CAMPAIGN_RECIPIENT_BATCH_SIZE):
+        batch.append(
             EmailCampaignRecipient(
                 campaign=campaign,
-                purchase=purchase,
-                email=email,
-                customer_name=purchase.name,
+                purchase_id=row['pk'],
+                email=row['email_key'],
+                customer_name=row['name'],
                 status=EmailCampaignRecipient.STATUS_PENDING,
                 audience_context=(
-                    f'{purchase.ticket1.association.name}/{purchase.ticket1.key}; '
-                    f'{purchase.ticket2.association.name}/{purchase.ticket2.key}'
+                    f"{row['ticket1__association_id']}/{row['ticket1_id']}; "
+                    f"{row['ticket2__association_id']}/{row['ticket2_id']}"
                 ),
             )
         )
-    return rows
-
-
-def _render_campaign_parts(campaign: EmailCampaign, purchase: Purchase) -> tuple[str, str, str]:
+        if len(batch) >= CAMPAIGN_RECIPIENT_BATCH_SIZE:
+            EmailCampaignRecipient.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        EmailCampaignRecipient.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _render_campaign_parts(
+    campaign: EmailCampaign,
+    purchase: Purchase,
+    tpl: EmailTemplateSettings | None = None,
+) -> tuple[str, str, str]:
     context = _build_render_context(purchase)
-    tpl = _load_template_settings()
+    if tpl is None:
+        tpl = _load_template_settings()
     if tpl is not None:
         context.update({
             'primary_color': tpl.primary_color,
@@ -586,25 +869,30 @@ def _render_campaign_parts(campaign: EmailCampaign, purchase: Purchase) -> tuple
 def _send_campaign_and_update(campaign_id: int) -> None:
     try:
         campaign = EmailCampaign.objects.select_related('audience_performance').prefetch_related('audience_associations').get(pk=campaign_id)
-        campaign.status = EmailCampaign.STATUS_RUNNING
-        campaign.started_at = dj_timezone.now()
-        campaign.error_message = ''
-        campaign.save(update_fields=['status', 'started_at', 'error_message'])
-
-        recipients = _build_campaign_recipient_rows(campaign)
-        EmailCampaignRecipient.objects.filter(campaign=campaign).delete()
-        if recipients:
-            EmailCampaignRecipient.objects.bulk_create(recipients)
-
-        total = len(recipients)
-        sent = 0
-        failed = 0
-
-        for row in EmailCampaignRecipient.objects.select_related('purchase').filter(campaign=campaign):
+        # A worker that took over an expired lease continues with the
+        # recipients that are still PENDING instead of mailing everyone again.
+        resuming = campaign.status == EmailCampaign.STATUS_RUNNING and campaign.total_recipients > 0
+        if resuming:
+            total = campaign.total_recipients
+        else:
+            campaign.status = EmailCampaign.STATUS_RUNNING
+            campaign.started_at = dj_timezone.now()
+            campaign.error_message = ''
+            campaign.save(update_fields=['status', 'started_at', 'error_message'])
+            total = _create_campaign_recipient_rows(campaign)
+            campaign.total_recipients = total
+            campaign.save(update_fields=['total_recipients'])
+        tpl = _load_template_settings()
+
+        recipients = EmailCampaignRecipient.objects.select_related(
+            'purchase__ticket1__association',
+            'purchase__ticket2__association',
+        ).filter(campaign=campaign, status=EmailCampaignRecipient.STATUS_PENDING)
+        for row in recipients.iterator(chunk_size=CAMPAIGN_RECIPIENT_BATCH_SIZE):
             try:
                 if row.purchase is None:
                     raise ValueError('No linked purchase found for recipient.')
-                subject, text_body, html_body = _render_campaign_parts(campaign, row.purchase)
+                subject, text_body, html_body = _render_campaign_parts(campaign, row.purchase, tpl)
                 _send_via_mailgun_raw(
                     recipient=row.email,
                     subject=subject,
@@ -616,13 +904,20 @@ def _send_campaign_and_update(campaign_id: int) -> None:
                 row.sent_at = dj_timezone.now()
                 row.error_message = ''
                 row.save(update_fields=['status', 'sent_at', 'error_message'])
-                sent += 1
             except Exception as exc:
                 row.status = EmailCampaignRecipient.STATUS_FAILED
                 row.error_message = str(exc)[:2000]
                 row.save(update_fields=['status', 'error_message'])
-                failed += 1
 
+        outcomes = dict(
+            EmailCampaignRecipient.objects.filter(campaign=campaign)
+            .values('status')
+            .annotate(n=Count('pk'))
+            .order_by()
+            .values_list('status', 'n')
+        )
+        sent = outcomes.get(EmailCampaignRecipient.STATUS_SENT, 0)
+        failed = outcomes.get(EmailCampaignRecipient.STATUS_FAILED, 0)
         campaign.total_recipients = total
         campaign.sent_count = sent
         campaign.failed_count = failed
@@ -644,13 +939,153 @@ def _send_campaign_and_update(campaign_id: int) -> None:
 
 
 def send_email_campaign_async(campaign: EmailCampaign) -> None:
-    """Queue a follow-up campaign send in a background thread."""
-    t = threading.Thread(
-        target=_send_campaign_and_update,
-        args=(campaign.pk,),
-        daemon=True,
-        name=f'email-campaign-{campaign.pk}',
-    )
-    t.start()
+    """Queue a follow-up campaign send in a background thread (or for the run_jobs worker)."""
+    jobs.dispatch(_send_campaign_and_update, campaign.pk, f'email-campaign-{campaign.pk}')
+
+
+# Purchases are loaded in chunks of this size while a resend job runs, and
+# selected purchases are flagged PENDING in chunks of the same size.
+RESEND_BATCH_SIZE = 200
+
+
+def _failed_confirmation_filter(date_from=None, date_to=None, association_ids=None) -> Q:
+    audience = Q(email_status=Purchase.EMAIL_FAILED)
+    if date_from:
+        audience &= Q(date__date__gte=date_from)
+    if date_to:
+        audience &= Q(date__date__lte=date_to)
+    if association_ids:
+        audience &= Q(ticket1__association_id__in=association_ids) | Q(ticket2__association_id__in=association_ids)
+    return audience
+
+
+def count_failed_confirmations(date_from=None, date_to=None, association_ids=None) -> int:
+    """Return how many purchases a resend job with these filters would pick up."""
+    return Purchase.objects.filter(_failed_confirmation_filter(date_from, date_to, association_ids)).count()
+
+
+def create_confirmation_resend_job(user, date_from=None, date_to=None, association_ids=None) -> EmailResendJob:
+    """
+    Select every FAILED confirmation mail matching the filters and queue a resend job for it.
+
+    The purchases are selected in one query and flagged PENDING right away,
+    so a second job (or a manual resend) started meanwhile does not pick
+    them up again.
+    """
+    with transaction.atomic():
+        purchase_ids = list(
+            Purchase.objects.select_for_update(of=('self',))
+            .filter(_failed_confirmation_filter(date_from, date_to, association_ids))
+            .order_by('date', 'id')
+            .values_list('pk', flat=True)
+        )
+        for start in range(0, len(purchase_ids), RESEND_BATCH_SIZE):
+            Purchase.objects.filter(pk__in=purchase_ids[start:start + RESEND_BATCH_SIZE]).update(
+                email_status=Purchase.EMAIL_PENDING,
+            )
+        job = EmailResendJob.objects.create(
+            created_by=user,
+            date_from=date_from,
+            date_to=date_to,
+            purchase_ids=purchase_ids,
+            total_count=len(purchase_ids),
+        )
+        if association_ids:
+            job.associations.set(association_ids)
+    return job
 
 
+def _resend_confirmations_and_update(job_id: int) -> None:
+    """
+    Worker run in a daemon thread.  Resends the job's confirmation mails at
+    no more than EMAIL_RESEND_RATE_PER_SECOND and records progress after
+    every mail.  Never raises – all exceptions are caught and logged.
+    """
+    try:
+        job = EmailResendJob.objects.get(pk=job_id)
+        if job.status != EmailResendJob.STATUS_RUNNING:
+            job.status = EmailResendJob.STATUS_RUNNING
+            job.started_at = dj_timezone.now()
+            job.error_message = ''
+            job.save(update_fields=['status', 'started_at', 'error_message'])
+
+        rate = float(getattr(settings, 'EMAIL_RESEND_RATE_PER_SECOND', 5) or 0)
+        interval = 1.0 / rate if rate > 0 else 0.0
+        tpl = _load_template_settings()
+        # Progress is recorded after every mail, so a worker resuming this job
+        # after an expired lease skips the purchases that were already handled.
+        sent = job.sent_count
+        failed = job.failed_count
+        purchase_ids = list(job.purchase_ids or [])[sent + failed:]
+        next_send_at = time.monotonic()
+
+        for start in range(0, len(purchase_ids), RESEND_BATCH_SIZE):
+            chunk = purchase_ids[start:start + RESEND_BATCH_SIZE]
+            purchases = Purchase.objects.select_related(
+                'ticket1__association__address',
+                'ticket2__association__address',
+            ).in_bulk(chunk)
+            for purchase_id in chunk:
+                purchase = purchases.get(purchase_id)
+                if purchase is None:
+                    # Deleted since the job was created; nothing to send.
+                    failed += 1
+                    EmailResendJob.objects.filter(pk=job_id).update(failed_count=failed)
+                    continue
+
+                delay = next_send_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send_at = max(next_send_at, time.monotonic()) + interval
+
+                try:
+                    subject, message = build_confirmation_message(purchase)
+                    resolved_subject, text_body, html_body = _build_confirmation_parts(purchase, subject, message, tpl)
+                    _send_via_mailgun(
+                        recipient=purchase.email,
+                        subject=resolved_subject,
+                        text_body=text_body,
+                        html_body=html_body,
+                        purchase=purchase,
+                    )
+                    Purchase.objects.filter(pk=purchase_id).update(email_status=Purchase.EMAIL_SENT)
+                    sent += 1
+                except Exception as exc:
+                    Purchase.objects.filter(pk=purchase_id).update(email_status=Purchase.EMAIL_FAILED)
+                    failed += 1
+                    logger.error(
+                        'Resend job %s: failed to send confirmation email for purchase %s: %s',
+                        job_id, purchase_id, exc,
+                    )
+                EmailResendJob.objects.filter(pk=job_id).update(sent_count=sent, failed_count=failed)
+
+        job.sent_count = sent
+        job.failed_count = failed
+        job.finished_at = dj_timezone.now()
+        if failed and sent:
+            job.status = EmailResendJob.STATUS_PARTIAL_FAILED
+        elif failed and not sent:
+            job.status = EmailResendJob.STATUS_FAILED
+        else:
+            job.status = EmailResendJob.STATUS_SUCCEEDED
+        job.save(update_fields=['sent_count', 'failed_count', 'finished_at', 'status'])
+        logger.info('Resend job %s finished: %s sent, %s failed', job_id, sent, failed)
+    except Exception as exc:
+        EmailResendJob.objects.filter(pk=job_id).update(
+            status=EmailResendJob.STATUS_FAILED,
+            finished_at=dj_timezone.now(),
+            error_message=str(exc)[:2000],
+        )
+        # Do not leave purchases stuck at PENDING when the job itself dies.
+        job_ids = EmailResendJob.objects.filter(pk=job_id).values_list('purchase_ids', flat=True).first() or []
+        for start in range(0, len(job_ids), RESEND_BATCH_SIZE):
+            Purchase.objects.filter(
+                pk__in=job_ids[start:start + RESEND_BATCH_SIZE],
+                email_status=Purchase.EMAIL_PENDING,
+            ).update(email_status=Purchase.EMAIL_FAILED)
+        logger.error('Email resend job %s failed: %s', job_id, exc)
+
+
+def send_confirmation_resend_job_async(job: EmailResendJob) -> None:
+    """Run a resend job created by create_confirmation_resend_job in a background thread (or via run_jobs)."""
+    jobs.dispatch(_resend_confirmations_and_update, job.pk, f'email-resend-{job.pk}')
@@ -0,0 +1,55 @@
+"""
+core/file_lock.py – Advisory locks on a lock file, on POSIX and on Windows.
+
+POSIX uses ``flock()``, with shared and exclusive locks.  Windows (used for
+development) only has ``msvcrt.locking()``, which locks exclusively, so a
+shared lock is an exclusive one there.  A lock that is busy raises
+BlockingIOError when *blocking* is False, on both.
+"""
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_WINDOWS_RETRY_SECONDS = 0.05
+
+
+def _acquire(fh, shared: bool, blocking: bool) -> None:
+    if fcntl is not None:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        fcntl.flock(fh, flags if blocking else flags | fcntl.LOCK_NB)
+        return
+    while True:
+        fh.seek(0)
+        try:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if not blocking:
+                raise BlockingIOError(f'{fh.name} is locked by another process.') from None
+            time.sleep(_WINDOWS_RETRY_SECONDS)
+
+
+def _release(fh) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: Path, *, shared: bool = False, blocking: bool = True):
+    """Hold a lock on *path* (created if missing) for the duration of the block."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as fh:
+        _acquire(fh, shared, blocking)
+        try:
+            yield
+        finally:
+            _release(fh)
@@ -0,0 +1,238 @@
+"""
+The long-running worker behind ``python manage.py run_jobs``.
+
+Jobs run in threads, split over two lanes: database operations one at a time
+(a backup and a restore must never overlap), email jobs up to the configured
+concurrency.  Every finished job wakes the claim loop, so a restore waiting
+for its safety backup starts as soon as that backup is done; the poll
+interval only matters for jobs queued by the web process.
+
+Besides queued jobs the worker runs a few periodic tasks (audit log
+archival) in their own thread once they are due.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from iftf_duoverkoop.src.core import audit_archive, jobs
+from iftf_duoverkoop.src.core.backup_restore import run_backup_job, run_restore_job
+from iftf_duoverkoop.src.core.email import _resend_confirmations_and_update, _send_campaign_and_update
+from iftf_duoverkoop.src.core.models import DatabaseOperation, EmailCampaign, EmailResendJob
+
+logger = logging.getLogger(__name__)
+
+LANE_DATABASE = 'database'
+LANE_EMAIL = 'email'
+
+
+def _run_database_operation(job_id: int) -> None:
+    operation_type = DatabaseOperation.objects.filter(pk=job_id).values_list('operation_type', flat=True).first()
+    if operation_type == DatabaseOperation.TYPE_RESTORE:
+        run_restore_job(job_id)
+    elif operation_type == DatabaseOperation.TYPE_BACKUP:
+        run_backup_job(job_id)
+
+
+def _database_operation_filter() -> Q:
+    # A restore waits until its safety backup has finished, either way;
+    # run_restore_job itself refuses to continue if that backup failed.
+    return Q(depends_on__isnull=True) | Q(
+        depends_on__status__in=[DatabaseOperation.STATUS_SUCCEEDED, DatabaseOperation.STATUS_FAILED],
+    )
+
+
+def _database_lane_busy() -> bool:
+    # Another worker may already be running a backup or restore.
+    return DatabaseOperation.objects.filter(
+        status=DatabaseOperation.STATUS_RUNNING,
+        lease_expires_at__gte=timezone.now(),
+    ).exists()
+
+
+def _archive_audit_logs() -> None:
+    try:
+        audit_archive.archive()
+    except audit_archive.ArchiveError as exc:
+        logger.warning('Skipping scheduled audit log archival: %s', exc)
+
+
+@dataclass(frozen=True)
+class PeriodicTask:
+    label: str
+    interval_seconds: float
+    run: Callable[[], None]
+    enabled: Callable[[], bool]
+
+
+PERIODIC_TASKS = [
+    PeriodicTask('archive-audit-logs', 24 * 3600, _archive_audit_logs,
+                 enabled=lambda: audit_archive.archive_after_days() > 0),
+]
+
+
+@dataclass(frozen=True)
+class JobKind:
+    label: str
+    model: type
+    run: Callable[[int], None]
+    lane: str
+    claim_filter: Callable[[], Q] | None = None
+    lane_busy: Callable[[], bool] | None = None
+
+
+JOB_KINDS = [
+    JobKind('database-operation', DatabaseOperation, _run_database_operation, LANE_DATABASE,
+            claim_filter=_database_operation_filter, lane_busy=_database_lane_busy),
+    JobKind('email-campaign', EmailCampaign, _send_campaign_and_update, LANE_EMAIL),
+    JobKind('email-resend', EmailResendJob, _resend_confirmations_and_update, LANE_EMAIL),
+]
+
+
+class JobWorker:
+    """Claims queued jobs, runs them with bounded concurrency and keeps their leases alive."""
+
+    def __init__(self, *, concurrency: int = 2, poll_interval: float = 5.0, kinds=None):
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.poll_interval = poll_interval
+        self.kinds = list(kinds or JOB_KINDS)
+        self.lane_limits = {LANE_DATABASE: 1, LANE_EMAIL: max(concurrency, 1)}
+        self.completed = 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._heartbeat_stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running: dict[tuple[JobKind, int], threading.Thread] = {}
+        self.periodic_tasks = list(PERIODIC_TASKS)
+        # First run right after start-up; a task is not started again while it is running.
+        self._periodic_due = {task.label: 0.0 for task in self.periodic_tasks}
+        self._periodic_threads: dict[str, threading.Thread] = {}
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self, *, once: bool = False, shutdown_timeout: float = 30.0) -> None:
+        """Work until stop() is called, or with *once* until nothing is claimable or running."""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True, name='run-jobs-heartbeat')
+        heartbeat.start()
+        logger.info('Job worker %s started.', self.worker_id)
+        try:
+            while not self._stopping.is_set():
+                started = self._claim_available()
+                if not once:
+                    self._run_due_periodic_tasks()
+                if once and not started and not self._running_count():
+                    break
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            self._shutdown(shutdown_timeout)
+            connections.close_all()
+            logger.info('Job worker %s stopped after %s job(s).', self.worker_id, self.completed)
+
+    def _running_count(self, lane: str | None = None) -> int:
+        with self._lock:
+            return sum(1 for kind, _ in self._running if lane is None or kind.lane == lane)
+
+    def _claim_available(self) -> int:
+        started = 0
+        for kind in self.kinds:
+            while not self._stopping.is_set() and self._running_count(kind.lane) < self.lane_limits[kind.lane]:
+                if kind.lane_busy is not None and kind.lane_busy():
+                    break
+                claim_filter = kind.claim_filter() if kind.claim_filter is not None else None
+                job_id = jobs.claim_next(kind.model, self.worker_id, claim_filter)
+                if job_id is None:
+                    break
+                self._start(kind, job_id)
+                started += 1
+        return started
+
+    def _run_due_periodic_tasks(self) -> None:
+        now = time.monotonic()
+        for task in self.periodic_tasks:
+            thread = self._periodic_threads.get(task.label)
+            if now < self._periodic_due[task.label] or (thread is not None and thread.is_alive()):
+                continue
+            self._periodic_due[task.label] = now + task.interval_seconds
+            if not task.enabled():
+                continue
+            thread = threading.Thread(
+                target=self._run_periodic, args=(task,), daemon=True, name=f'periodic-{task.label}',
+            )
+            self._periodic_threads[task.label] = thread
+            thread.start()
+
+    def _run_periodic(self, task: PeriodicTask) -> None:
+        logger.info('Worker %s running periodic task %s.', self.worker_id, task.label)
+        try:
+            task.run()
+        except Exception:
+            logger.exception('Periodic task %s failed.', task.label)
+        finally:
+            connections.close_all()
+
+    def _start(self, kind: JobKind, job_id: int) -> None:
+        thread = threading.Thread(
+            target=self._run_job,
+            args=(kind, job_id),
+            daemon=True,
+            name=f'{kind.label}-{job_id}',
+        )
+        with self._lock:
+            self._running[(kind, job_id)] = thread
+        logger.info('Worker %s claimed %s #%s.', self.worker_id, kind.label, job_id)
+        thread.start()
+
+    def _run_job(self, kind: JobKind, job_id: int) -> None:
+        try:
+            kind.run(job_id)
+        except Exception:
+            # The job functions record their own failures; this only catches bugs.
+            logger.exception('%s #%s crashed the worker thread.', kind.label, job_id)
+        finally:
+            try:
+                jobs.release(kind.model, job_id, self.worker_id)
+            except Exception:
+                logger.exception('Could not release the lease on %s #%s.', kind.label, job_id)
+            connections.close_all()
+            with self._lock:
+                self._running.pop((kind, job_id), None)
+                self.completed += 1
+            self._wake.set()
+
+    def _heartbeat_loop(self) -> None:
+        interval = jobs.lease_seconds() / 3
+        while not self._heartbeat_stop.wait(interval):
+            with self._lock:
+                running = list(self._running)
+            for kind, job_id in running:
+                try:
+                    if not jobs.renew(kind.model, job_id, self.worker_id):
+                        logger.warning('Worker %s lost the lease on %s #%s.', self.worker_id, kind.label, job_id)
+                except Exception:
+                    logger.exception('Heartbeat for %s #%s failed.', kind.label, job_id)
+        connections.close_all()
+
+    def _shutdown(self, timeout: float) -> None:
+        with self._lock:
+            running = list(self._running.items())
+        deadline = time.monotonic() + timeout
+        for _, thread in running:
+            thread.join(max(deadline - time.monotonic(), 0))
+        with self._lock:
+            unfinished = list(self._running)
+        for kind, job_id in unfinished:
+            logger.warning('Worker %s stopping; %s #%s will be resumed by the next worker.',
+                           self.worker_id, kind.label, job_id)
+            jobs.release(kind.model, job_id, self.worker_id, unfinished=True)
+        self._heartbeat_stop.set()
@@ -0,0 +1,111 @@
+"""
+Dispatch and leasing for background jobs (database operations, email campaigns, resends).
+
+With JOB_RUNNER='thread' (the default) the web process runs a job in a daemon
+thread right after storing its row.  With JOB_RUNNER='worker' the web process
+only stores the row and ``python manage.py run_jobs`` picks it up.
+
+A worker owns a job through a lease: ``lease_owner`` plus ``lease_expires_at``.
+It renews the lease with heartbeats while the job runs and clears it when the
+job ends.  If the worker dies the lease runs out and the next worker that
+looks claims the job again.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RUNNER_THREAD = 'thread'
+RUNNER_WORKER = 'worker'
+DEFAULT_LEASE_SECONDS = 60
+# Claim candidates fetched per query; losing the race for one moves on to the next.
+CLAIM_CANDIDATES = 5
+
+
+def runs_in_worker() -> bool:
+    return getattr(settings, 'JOB_RUNNER', RUNNER_THREAD) == RUNNER_WORKER
+
+
+def lease_seconds() -> int:
+    return max(int(getattr(settings, 'JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS) or 0), 10)
+
+
+def dispatch(target, job_id: int, name: str) -> None:
+    """Run ``target(job_id)`` in a daemon thread, unless a run_jobs worker handles jobs."""
+    if runs_in_worker():
+        return
+    threading.Thread(target=target, args=(job_id,), daemon=True, name=name).start()
+
+
+def _claimable(model, now) -> Q:
+    # New jobs, plus jobs whose worker stopped renewing its lease.  RUNNING
+    # jobs without a lease belong to a web-process thread and are left alone.
+    return (
+        Q(status=model.STATUS_QUEUED, lease_expires_at__isnull=True)
+        | Q(status__in=[model.STATUS_QUEUED, model.STATUS_RUNNING], lease_expires_at__lt=now)
+    )
+
+
+def claim_next(model, owner: str, extra_filter: Q | None = None) -> int | None:
+    """
+    Take the lease on the oldest claimable job of *model* and return its pk.
+
+    The claim is a conditional UPDATE on the lease columns as they were read,
+    so of several workers racing for the same row exactly one wins.  This
+    works the same on PostgreSQL and SQLite.
+    """
+    now = timezone.now()
+    queryset = model.objects.filter(_claimable(model, now))
+    if extra_filter is not None:
+        queryset = queryset.filter(extra_filter)
+    candidates = list(
+        queryset.order_by('created_at', 'pk').values_list('pk', 'lease_owner', 'lease_expires_at')[:CLAIM_CANDIDATES]
+    )
+    for pk, previous_owner, previous_expiry in candidates:
+        claimed = model.objects.filter(
+            pk=pk,
+            lease_owner=previous_owner,
+            lease_expires_at=previous_expiry,
+        ).update(
+            lease_owner=owner,
+            lease_expires_at=now + timedelta(seconds=lease_seconds()),
+            heartbeat_at=now,
+        )
+        if claimed:
+            if previous_owner:
+                logger.warning(
+                    'Reclaimed %s #%s from %s after its lease expired.',
+                    model.__name__, pk, previous_owner,
+                )
+            return pk
+    return None
+
+
+def renew(model, pk: int, owner: str) -> bool:
+    """Extend the lease on a running job.  False means another worker took it over."""
+    now = timezone.now()
+    return bool(
+        model.objects.filter(pk=pk, lease_owner=owner).update(
+            lease_expires_at=now + timedelta(seconds=lease_seconds()),
+            heartbeat_at=now,
+        )
+    )
+
+
+def release(model, pk: int, owner: str, *, unfinished: bool = False) -> None:
+    """
+    Give up the lease on a job.
+
+    A finished job drops its lease entirely.  An unfinished one (the worker is
+    shutting down) keeps the owner but expires now, so the next worker resumes
+    it straight away instead of waiting for the lease to run out.
+    """
+    if unfinished:
+        model.objects.filter(pk=pk, lease_owner=owner).update(lease_expires_at=timezone.now())
+    else:
+        model.objects.filter(pk=pk, lease_owner=owner).update(lease_owner='', lease_expires_at=None)
@@ -0,0 +1,152 @@
+"""
+Maintenance flag that tells every process a database restore is queued or running.
+
+The flag is a small JSON file next to the backups, written when a restore is
+queued and removed when it ends.  Web workers and the run_jobs worker share
+that disk already, and checking the flag costs one stat() per write request;
+the file is only parsed again when its mtime changes.  No cache backend is
+configured and the default local-memory cache is per process, so it could not
+carry the flag between processes.
+
+The restore holds the flag with ``hold_maintenance()``, which renews it from
+a heartbeat thread every third of MAINTENANCE_FLAG_TTL_SECONDS and removes
+it when the restore ends.  An expired flag means that process stopped
+renewing it (it crashed or hangs), but the site stays locked: the restore
+may have been cut off halfway, and the DatabaseOperation table cannot tell,
+as the restore replaces it.  ``python manage.py clear_maintenance`` removes
+such a flag once someone has checked the database.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('iftf_duoverkoop.dbops')
+
+MAINTENANCE_FLAG_NAME = 'maintenance.json'
+MAINTENANCE_FLAG_TTL_SECONDS = 15 * 60
+
+_memo_lock = threading.Lock()
+# (st_mtime_ns, st_size) of the flag file -> the expiry it contained.
+_memo: dict[tuple[int, int], float] = {}
+# The flag file (st_mtime_ns, st_size) last reported as expired, to log it once.
+_reported_stale: tuple[int, int] | None = None
+
+
+def _flag_path() -> Path:
+    return Path(getattr(settings, 'DATABASE_BACKUP_DIR', Path(settings.MEDIA_ROOT) / 'backups')) / MAINTENANCE_FLAG_NAME
+
+
+def set_maintenance(job_id: int) -> None:
+    """Publish the flag for restore *job_id*; safe to call again to renew it."""
+    path = _flag_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps({
+        'job_id': job_id,
+        'expires_at': time.time() + MAINTENANCE_FLAG_TTL_SECONDS,
+    }).encode('utf-8')
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(payload)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def clear_maintenance() -> None:
+    _flag_path().unlink(missing_ok=True)
+
+
+@contextmanager
+def hold_maintenance(job_id: int, *, clear: bool = True):
+    """
+    Keep the flag for restore *job_id* fresh for the duration of the block,
+    then remove it (unless *clear* is False).  The heartbeat has stopped
+    before the flag is removed, so it cannot write the flag back.
+    """
+    set_maintenance(job_id)
+    stop = threading.Event()
+
+    def heartbeat() -> None:
+        while not stop.wait(MAINTENANCE_FLAG_TTL_SECONDS / 3):
+            try:
+                set_maintenance(job_id)
+            except OSError:
+                logger.exception('Could not renew the maintenance flag for restore job %s.', job_id)
+
+    thread = threading.Thread(target=heartbeat, daemon=True, name=f'maintenance-heartbeat-{job_id}')
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        if clear:
+            clear_maintenance()
+
+
+def _flag_expiry(path: Path, stat_result: os.stat_result) -> float:
+    key = (stat_result.st_mtime_ns, stat_result.st_size)
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+    try:
+        expires_at = float(json.loads(path.read_text(encoding='utf-8'))['expires_at'])
+    except FileNotFoundError:
+        raise
+    except (OSError, ValueError, KeyError, TypeError):
+        # Unreadable or half-written: treat it as a fresh flag.
+        expires_at = stat_result.st_mtime + MAINTENANCE_FLAG_TTL_SECONDS
+    with _memo_lock:
+        _memo.clear()
+        _memo[key] = expires_at
+    return expires_at
+
+
+def flag_state() -> dict | None:
+    """{job_id, expired} of the current flag, or None without one."""
+    path = _flag_path()
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+        return {'job_id': data.get('job_id'), 'expired': time.time() >= float(data['expires_at'])}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {'job_id': None, 'expired': True}
+
+
+def maintenance_active() -> bool:
+    """
+    True while a restore is queued or running, or a flag was left behind.
+
+    This never touches the database.  Any doubt once a flag exists (an
+    unreadable file, an expired flag) counts as active.
+    """
+    global _reported_stale
+    path = _flag_path()
+    try:
+        stat_result = path.stat()
+        expires_at = _flag_expiry(path, stat_result)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        logger.exception('Could not read the maintenance flag; treating the site as under maintenance.')
+        return True
+
+    key = (stat_result.st_mtime_ns, stat_result.st_size)
+    if time.time() >= expires_at and _reported_stale != key:
+        _reported_stale = key
+        logger.error(
+            'The maintenance flag %s expired without being renewed; writes stay blocked. '
+            'Once no restore is running, check the database and run `python manage.py clear_maintenance`.',
+            path,
+        )
+    return True
@@ -0,0 +1,89 @@
+"""
+core/media.py – Public media files (association logos) and their URLs.
+
+Only the directories in ``PUBLIC_DIRECTORIES`` under MEDIA_ROOT are served;
+backups, the maintenance flag and the permission version file live there as
+well and are never reachable over HTTP.
+
+``media_url()`` gives a logo a content-hashed URL,
+
+    associations/logo_wina.jpg  ->  /media/associations/logo_wina.3f2a9c0d51be.jpg
+
+which MediaFilesMiddleware serves with a ten-year immutable Cache-Control,
+like the hashed static files.  Logos can be uploaded (or replaced under the
+same name) from the dashboard while the site runs, so names are resolved
+per request instead of from a list built at startup: a hashed URL only
+matches while the file still has that content.  The digest is cached per
+(path, mtime, size), so a request costs one ``os.stat``.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+
+PUBLIC_DIRECTORIES = ('associations',)
+HASH_LENGTH = 12
+
+
+def public_path(name: str) -> Path | None:
+    """The file for *name* (relative to MEDIA_ROOT) if it is public media, else None."""
+    directory = name.split('/', 1)[0]
+    if directory not in PUBLIC_DIRECTORIES:
+        return None
+    root = (Path(settings.MEDIA_ROOT) / directory).resolve()
+    path = (Path(settings.MEDIA_ROOT) / name).resolve()
+    if root not in path.parents or not path.is_file():
+        return None
+    return path
+
+
+@lru_cache(maxsize=256)
+def _digest(path: str, mtime_ns: int, size: int) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:HASH_LENGTH]
+
+
+def file_hash(path: Path) -> str:
+    stat = os.stat(path)
+    return _digest(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def hashed_name(name: str) -> str:
+    """*name* with its content hash before the extension; unchanged when the file is missing."""
+    path = public_path(name)
+    if path is None:
+        return name
+    base, ext = os.path.splitext(name)
+    return f'{base}.{file_hash(path)}{ext}'
+
+
+def media_url(name: str | None) -> str:
+    """The content-hashed URL of the public media file *name*, or '' for no file."""
+    if not name:
+        return ''
+    return settings.MEDIA_URL + quote(hashed_name(name.replace('\\', '/')))
+
+
+def resolve(name: str) -> Path | None:
+    """
+    The file a request for *name* (relative to MEDIA_URL) is answered with:
+    the public file itself, or the file a hashed name was made from while
+    its content still matches the hash.
+    """
+    path = public_path(name)
+    if path is not None:
+        return path
+    base, ext = os.path.splitext(name)
+    base, dot, digest = base.rpartition('.')
+    if not dot or len(digest) != HASH_LENGTH:
+        return None
+    path = public_path(base + ext)
+    if path is None or file_hash(path) != digest:
+        return None
+    return path
@@ -1,46 +1,97 @@
-"""Middleware helpers for production diagnostics."""
+"""
+Middleware helpers for production diagnostics.
+
+Each middleware runs in both modes: under WSGI it is called synchronously,
+under ASGI (see README, "Running under ASGI") it is called as a coroutine,
+so async views are not pushed back onto a thread by the middleware chain.
+MediaFilesMiddleware is the exception: it extends WhiteNoise's middleware,
+which is sync only.
+"""
+import asyncio
 import logging
+import os
+import posixpath
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.http import HttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
 
-from iftf_duoverkoop.src.core.models import DatabaseOperation
+from iftf_duoverkoop.src.core import audit
+from iftf_duoverkoop.src.core import media
+from iftf_duoverkoop.src.core.auth import get_user_roles
+from iftf_duoverkoop.src.core.maintenance import maintenance_active
 
 logger = logging.getLogger("iftf_duoverkoop.request")
 
 
-class RequestExceptionLoggingMiddleware:
+class _SyncAndAsyncMiddleware:
     """
-    Log request context when an unhandled exception bubbles up.
-
-    Django still returns its normal 500 response; this only enriches logs so
-    Render shows enough context to debug quickly.
+    Base for the middleware below: ``__call__`` dispatches to ``__acall__``
+    when the rest of the chain is async, as Django's MiddlewareMixin does.
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Mark the instance as a coroutine function (see MiddlewareMixin._async_check).
+            self._is_coroutine = asyncio.coroutines._is_coroutine
 
     def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class RequestExceptionLoggingMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Log request context when an unhandled exception bubbles up.
+
+    Django still returns its normal 500 response; this only enriches logs so
+    Render shows enough context to debug quickly.
+    """
+
+    def handle(self, request):
         try:
             return self.get_response(request)
         except Exception:
-            user = getattr(request, "user", None)
-            user_repr = (
-                user.get_username() if getattr(user, "is_authenticated", False) else "anonymous"
-            )
-            xff = request.META.get("HTTP_X_FORWARDED_FOR", "")
-            ip = (xff.split(",")[0].strip() if xff else request.META.get("REMOTE_ADDR", "unknown"))
-            logger.exception(
-                "Unhandled exception. method=%s path=%s user=%s ip=%s",
-                request.method,
-                request.path,
-                user_repr,
-                ip,
-            )
+            self._log(request)
             raise
 
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        except Exception:
+            self._log(request)
+            raise
 
-class RestoreMaintenanceLockMiddleware:
-    """Block write requests while a restore is running to avoid inconsistent state."""
+    @staticmethod
+    def _log(request):
+        user = getattr(request, "user", None)
+        user_repr = (
+            user.get_username() if getattr(user, "is_authenticated", False) else "anonymous"
+        )
+        xff = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        ip = (xff.split(",")[0].strip() if xff else request.META.get("REMOTE_ADDR", "unknown"))
+        logger.exception(
+            "Unhandled exception. method=%s path=%s user=%s ip=%s",
+            request.method,
+            request.path,
+            user_repr,
+            ip,
+        )
+
+
+class RestoreMaintenanceLockMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Block write requests while a restore is queued or running to avoid inconsistent state.
+
+    The state comes from the maintenance flag file (see src/core/maintenance.py),
+    so the check does not touch the database.
+    """
 
     SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
     ALLOWED_PREFIXES = (
@@ -52,31 +103,131 @@ class RestoreMaintenanceLockMiddleware:
         '/logout/',
     )
 
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
+    def _blocked(self, request) -> bool:
         if request.method in self.SAFE_METHODS:
-            return self.get_response(request)
+            return False
         if request.path.startswith(self.ALLOWED_PREFIXES):
+            return False
+        # A file check, not a query: sales do not pay for the lock.
+        return maintenance_active()
+
+    @staticmethod
+    def _maintenance_response() -> HttpResponse:
+        return HttpResponse(
+            'Database maintenance is in progress. Please retry shortly.',
+            status=503,
+            content_type='text/plain; charset=utf-8',
+        )
+
+    def handle(self, request):
+        if self._blocked(request):
+            return self._maintenance_response()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self._blocked(request):
+            return self._maintenance_response()
+        return await self.get_response(request)
+
+
+class RoleCacheMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Attach the session's cached roles and permissions to ``request.user``.
+
+    Runs after AuthenticationMiddleware so that group checks and
+    ``has_perm()`` in views and decorators are answered from the session
+    instead of group and permission queries on every request.
+
+    Under ASGI this is also what lets async views check ``request.user``
+    without a query: the user and their roles are loaded here, in one hop
+    to the sync thread.
+    """
+
+    @staticmethod
+    def _load_roles(request) -> None:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            get_user_roles(request)
+
+    def handle(self, request):
+        self._load_roles(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        await sync_to_async(self._load_roles)(request)
+        return await self.get_response(request)
+
+
+class AuditBufferMiddleware(_SyncAndAsyncMiddleware):
+    """
+    Collect the audit log entries of one request and write them in one go.
+
+    Entries join the buffer once their transaction commits; the buffer is
+    flushed with a bulk insert after the view has run, also when it raised.
+    """
+
+    def handle(self, request):
+        token = audit.begin_request()
+        try:
             return self.get_response(request)
+        finally:
+            audit.end_request(token)
 
+    async def __acall__(self, request):
+        token = audit.begin_request()
         try:
-            restore_running = DatabaseOperation.objects.filter(
-                operation_type=DatabaseOperation.TYPE_RESTORE,
-                status__in=[DatabaseOperation.STATUS_QUEUED, DatabaseOperation.STATUS_RUNNING],
-            ).exists()
-        except Exception:
-            # Do not block traffic if the lock check itself fails.
-            restore_running = False
+            return await self.get_response(request)
+        finally:
+            await audit.aend_request(token)
 
-        if restore_running:
-            return HttpResponse(
-                'Database maintenance is in progress. Please retry shortly.',
-                status=503,
-                content_type='text/plain; charset=utf-8',
-            )
 
-        return self.get_response(request)
+class MediaFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise for the static files plus the public media (see core/media.py).
+
+    Media responses get what WhiteNoise gives static files: ETag and
+    Last-Modified with 304 answers, Range requests, and the file handed to
+    the server's ``wsgi.file_wrapper`` (sendfile under gunicorn).  Hashed
+    logo URLs are cached forever, plain ones for WHITENOISE_MAX_AGE.
+    Everything else under MEDIA_URL falls through to a 404.
+    """
 
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.media_prefix = settings.MEDIA_URL
+        # url -> ((mtime_ns, size), StaticFile); rebuilt when the file changes.
+        self._media_files = {}
 
+    def __call__(self, request):
+        if request.path_info.startswith(self.media_prefix):
+            static_file = self.find_media_file(request.path_info)
+            if static_file is not None:
+                return self.serve(static_file, request)
+        return super().__call__(request)
+
+    def find_media_file(self, url: str):
+        if not self.url_is_canonical(url):
+            return None
+        path = media.resolve(url[len(self.media_prefix):])
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._media_files.get(url)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            static_file = self.get_static_file(str(path), url, stat_cache={str(path): stat})
+        except MissingFileError:
+            return None
+        self._media_files[url] = (signature, static_file)
+        return static_file
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.media_prefix):
+            # A hashed URL names the file differently from the file on disk.
+            return posixpath.basename(url) != os.path.basename(path)
+        return super().immutable_file_test(path, url)
@@ -6,9 +6,12 @@ from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from django.utils.formats import date_format
 
+from iftf_duoverkoop.src.core.media import media_url
+
 
 class Association(models.Model):
     name = models.CharField(max_length=100, unique=True, primary_key=True)
@@ -18,6 +21,10 @@ class Association(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def logo_url(self) -> str:
+        # Content-hashed, so browsers can cache the logo for good.
+        return media_url(self.image)
+
 
 class Performance(models.Model):
     key = models.CharField("Key", max_length=128, unique=True, primary_key=True)
@@ -34,6 +41,9 @@ class Performance(models.Model):
     max_tickets = models.IntegerField("Maximum Tickets")
 
     def tickets_sold(self) -> int:
+        # Performances loaded through db.with_tickets_sold() already carry the count.
+        if hasattr(self, 'sold_count'):
+            return self.sold_count
         return (
             Purchase.objects.filter(ticket1__key=self.key).count()
             + Purchase.objects.filter(ticket2__key=self.key).count()
@@ -316,6 +326,10 @@ class EmailCampaign(models.Model):
     sent_count = models.PositiveIntegerField(default=0)
     failed_count = models.PositiveIntegerField(default=0)
     error_message = models.TextField(blank=True, default='')
+    # Set while a `run_jobs` worker owns the job (see src/core/jobs.py).
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self) -> str:
         return f'Campaign {self.id}: {self.name}'
@@ -356,6 +370,52 @@ class EmailCampaignRecipient(models.Model):
         return f'{self.campaign_id} -> {self.email} ({self.status})'
 
 
+class EmailResendJob(models.Model):
+    """Bulk resend of confirmation emails that failed, e.g. after a Mailgun outage."""
+    STATUS_QUEUED = 'QUEUED'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_SUCCEEDED = 'SUCCEEDED'
+    STATUS_PARTIAL_FAILED = 'PARTIAL_FAILED'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_PARTIAL_FAILED, 'Partially failed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='email_resend_jobs_created')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    date_from = models.DateField(null=True, blank=True, help_text='Only purchases made on or after this date.')
+    date_to = models.DateField(null=True, blank=True, help_text='Only purchases made on or before this date.')
+    associations = models.ManyToManyField('Association', blank=True)
+    purchase_ids = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Purchases selected when the job was created; the job only resends these.',
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    total_count = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+    # Set while a `run_jobs` worker owns the job (see src/core/jobs.py).
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f'Email resend job {self.id} ({self.status})'
+
+    class Meta:
+        ordering = ['-created_at']
+
+
 class AssociationRepProfile(models.Model):
     """
     Links an Association Representative user to the association they represent.
@@ -384,6 +444,36 @@ class AssociationRepProfile(models.Model):
         verbose_name_plural = "Association Rep Profiles"
 
 
+class Admission(models.Model):
+    """
+    A ticket scanned at the door: one row per purchase and performance.
+
+    The unique constraint is what detects double entry.  A second scan of the
+    same code for the same performance cannot add a row, and the check-in API
+    reports the first admission instead (see src/core/checkin.py).
+    """
+    purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name='admissions')
+    performance = models.ForeignKey(Performance, on_delete=models.PROTECT, related_name='admissions')
+    admitted_at = models.DateTimeField(default=timezone.now, editable=False)
+    admitted_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='admissions')
+    scan_id = models.CharField(
+        max_length=32,
+        help_text="Identifies the check-in request that inserted this row",
+    )
+
+    def __str__(self) -> str:
+        return f"Purchase #{self.purchase_id} admitted to {self.performance_id} at {self.admitted_at}"
+
+    class Meta:
+        ordering = ['-admitted_at']
+        constraints = [
+            models.UniqueConstraint(fields=['purchase', 'performance'], name='unique_admission'),
+        ]
+        indexes = [
+            models.Index(fields=['performance', '-admitted_at']),
+        ]
+
+
 class PurchaseAuditLog(models.Model):
     """
     Append-only audit log for all purchase operations.
@@ -418,7 +508,8 @@ class PurchaseAuditLog(models.Model):
         help_text="Numeric purchase ID captured at log time; survives purchase deletion",
     )
     action = models.CharField(max_length=10, choices=ACTION_CHOICES, help_text="Type of action performed")
-    timestamp = models.DateTimeField(auto_now_add=True, help_text="When the action occurred")
+    # Set when the entry is recorded, not when the buffered insert runs (see src/core/audit.py).
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, help_text="When the action occurred")
     user = models.ForeignKey(User, on_delete=models.PROTECT, help_text="User who performed the action")
     changes = models.JSONField(
         null=True, blank=True,
@@ -436,13 +527,51 @@ class PurchaseAuditLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        # (timestamp, id) is the keyset the dashboard pages by.
         indexes = [
-            models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
             models.Index(fields=['purchase_id_snapshot', '-timestamp']),
             models.Index(fields=['user', '-timestamp']),
         ]
 
 
+class PurchaseAuditLookup(models.Model):
+    """
+    Searchable values extracted from ``PurchaseAuditLog.changes``.
+
+    One row per email address, verification code and ticket (performance
+    key) that appears in an entry's snapshots, stored normalised (stripped,
+    lower case).  Finding every entry that touched an address is then an
+    index lookup instead of a scan over all JSON payloads, on SQLite and
+    PostgreSQL alike.  Rows are written together with their entry (see
+    src/core/audit.py); ``backfill_audit_lookups`` fills them in for entries
+    written before this table existed.
+    """
+    KIND_EMAIL = 'email'
+    KIND_CODE = 'code'
+    KIND_TICKET = 'ticket'
+    KIND_CHOICES = [
+        (KIND_EMAIL, 'Email'),
+        (KIND_CODE, 'Verification code'),
+        (KIND_TICKET, 'Ticket'),
+    ]
+
+    entry = models.ForeignKey(PurchaseAuditLog, on_delete=models.CASCADE, related_name='lookups')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=254)
+
+    def __str__(self) -> str:
+        return f"{self.kind}={self.value} (audit entry #{self.entry_id})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entry', 'kind', 'value'], name='unique_audit_lookup'),
+        ]
+        indexes = [
+            models.Index(fields=['value', 'kind']),
+        ]
+
+
 class LoginAuditLog(models.Model):
     """Records every login, logout, and failed login attempt for security monitoring."""
     EVENT_LOGIN = 'LOGIN'
@@ -459,7 +588,7 @@ class LoginAuditLog(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name='login_logs',
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
     def __str__(self) -> str:
@@ -467,8 +596,10 @@ class LoginAuditLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        # Migration 0023 also adds a case-insensitive prefix index on username,
+        # which Meta.indexes cannot express portably.
         indexes = [
-            models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
             models.Index(fields=['user', '-timestamp']),
         ]
 
@@ -517,9 +648,30 @@ class DatabaseOperation(models.Model):
         default=False,
         help_text='True for automatic safety backup created before a restore job.',
     )
+    parallel_jobs = models.PositiveSmallIntegerField(
+        default=1,
+        help_text='pg_dump/pg_restore worker count; backups with more than one job use the directory format.',
+    )
+    timings = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Seconds spent per phase, e.g. {"dump": 12.3, "pack": 0.8} or {"restore": 30.1}.',
+    )
     notes = models.TextField(blank=True, default='')
     output_log = models.TextField(blank=True, default='')
     error_message = models.TextField(blank=True, default='')
+    depends_on = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='dependents',
+        help_text='Operation that has to finish first, e.g. the safety backup taken before a restore.',
+    )
+    # Set while a `run_jobs` worker owns the job (see src/core/jobs.py).
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -547,31 +699,33 @@ def _get_ip(request):
 
 @receiver(user_logged_in)
 def on_user_logged_in(sender, request, user, **kwargs):
-    LoginAuditLog.objects.create(
+    from iftf_duoverkoop.src.core import audit  # local import avoids circularity
+    audit.record(LoginAuditLog(
         event=LoginAuditLog.EVENT_LOGIN,
         username=user.username,
         user=user,
         ip_address=_get_ip(request),
-    )
+    ))
 
 
 @receiver(user_logged_out)
 def on_user_logged_out(sender, request, user, **kwargs):
+    from iftf_duoverkoop.src.core import audit  # local import avoids circularity
     if user:
-        LoginAuditLog.objects.create(
+        audit.record(LoginAuditLog(
             event=LoginAuditLog.EVENT_LOGOUT,
             username=user.username,
             user=user,
             ip_address=_get_ip(request),
-        )
+        ))
 
 
 @receiver(user_login_failed)
 def on_user_login_failed(sender, credentials, request, **kwargs):
-    LoginAuditLog.objects.create(
+    from iftf_duoverkoop.src.core import audit  # local import avoids circularity
+    audit.record(LoginAuditLog(
         event=LoginAuditLog.EVENT_FAILED,
         username=credentials.get('username', ''),
         user=None,
         ip_address=_get_ip(request),
-    )
-
+    ))
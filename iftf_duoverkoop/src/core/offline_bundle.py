@@ -0,0 +1,217 @@
+"""
+Offline verification bundles for association representatives at the door.
+
+A bundle holds what the verify page needs to check codes for one
+association without the server:
+
+    entries    [hash, [performance index, ...], customer name], sorted by hash,
+               for every purchase with a ticket for one of its performances
+    performances  key, display name and date of the association's performances
+
+Nothing about other associations' purchases is included: a code that is not
+in the bundle is reported as not found offline, to be checked again online.
+
+Codes are not shipped in clear text: each is replaced by the first 8 bytes of
+HMAC-SHA256(salt, code), and the page hashes what is typed the same way.  The
+salt ships with the bundle and there are only 48³ codes, so anyone holding
+the bundle can recover its codes in well under a second; the hashing only
+keeps them off the screen.  What protects the codes is that a bundle holds
+nothing but the codes its representative may check anyway, and that the
+page drops it on logout.
+
+``version`` is the id of the newest purchase audit entry, since every sale,
+edit and deletion writes one.  ``token`` signs association, version, a
+digest of the performance list and a digest of the content; the page sends it
+back to ask for a delta with only the purchases whose audit entries are newer.
+Entries refer to performances by index, and adding, removing or moving a
+performance shifts those indices without writing an audit entry, so a delta
+is only given while the performance list is unchanged; otherwise the answer
+is a full bundle.
+"""
+import hashlib
+import hmac
+import json
+
+from django.core import signing
+from django.db.models import Max, Q
+from django.utils.crypto import salted_hmac
+from django.utils.formats import date_format
+
+from iftf_duoverkoop.src.core import audit_archive
+from iftf_duoverkoop.src.core.models import Performance, Purchase, PurchaseAuditLog
+
+BUNDLE_FORMAT = 2
+HASH_BYTES = 8
+SIGNING_SALT = 'iftf_duoverkoop.offline_bundle'
+# Audit entries are committed in batches, so an id just below the version
+# may become visible after the version was handed out.  Deltas re-send this
+# many ids before it; applying an entry twice is harmless.
+DELTA_OVERLAP = 200
+# Above this many changed purchases a full bundle is smaller than the delta.
+MAX_DELTA_PURCHASES = 500
+
+
+def bundle_salt(association_name: str) -> str:
+    """Per-association hashing salt; stable across bundles, so deltas can be merged."""
+    return salted_hmac(SIGNING_SALT, association_name).hexdigest()[:32]
+
+
+def hash_code(salt: str, code: str) -> str:
+    return hmac.new(salt.encode('ascii'), code.encode('utf-8'), hashlib.sha256).hexdigest()[:HASH_BYTES * 2]
+
+
+def current_version() -> int:
+    return PurchaseAuditLog.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def _performances(association_name: str) -> list[Performance]:
+    return list(Performance.objects.filter(association_id=association_name).order_by('date', 'key'))
+
+
+def _performance_payload(performances: list[Performance]) -> list[dict]:
+    return [
+        {'key': p.key, 'name': p.name, 'date': date_format(p.date, 'D d M Y H:i')}
+        for p in performances
+    ]
+
+
+def _classify(salt: str, purchase_rows, performance_index: dict) -> tuple[list, list]:
+    """(entries of this association's purchases, hashes of the other purchases' codes)."""
+    entries = []
+    others = []
+    for code, name, ticket1_id, ticket2_id in purchase_rows:
+        if not code:
+            continue
+        own = sorted({performance_index[t] for t in (ticket1_id, ticket2_id) if t in performance_index})
+        if own:
+            entries.append([hash_code(salt, code), own, name])
+        else:
+            others.append(hash_code(salt, code))
+    entries.sort()
+    return entries, others
+
+
+def _digest(content) -> str:
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _performances_digest(performance_payload: list[dict]) -> str:
+    return _digest(performance_payload)[:16]
+
+
+def _sign(association_name: str, version: int, content: dict) -> str:
+    performances = _performances_digest(content['performances'])
+    return signing.Signer(salt=SIGNING_SALT).sign(f'{association_name}:{version}:{performances}:{_digest(content)}')
+
+
+def _token_state(association_name: str, token: str | None) -> tuple[int, str] | None:
+    """
+    The version and performance list digest a token was issued for, or None
+    if it is missing, forged, for another association or from an older format.
+    """
+    if not token:
+        return None
+    try:
+        name, version, performances, _digest = signing.Signer(salt=SIGNING_SALT).unsign(token).rsplit(':', 3)
+        return (int(version), performances) if name == association_name else None
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _deleted_code(changes) -> str | None:
+    final_state = changes.get('final_state') if isinstance(changes, dict) else None
+    return final_state.get('verification_code') if isinstance(final_state, dict) else None
+
+
+def build_bundle(association_name: str) -> dict:
+    """The full bundle for an association: one pass over Purchase plus its performances."""
+    version = current_version()
+    salt = bundle_salt(association_name)
+    performances = _performances(association_name)
+    performance_index = {p.key: index for index, p in enumerate(performances)}
+    rows = Purchase.objects.filter(
+        Q(ticket1__association_id=association_name) | Q(ticket2__association_id=association_name),
+    ).values_list('verification_code', 'name', 'ticket1_id', 'ticket2_id')
+    entries, _others = _classify(salt, rows.iterator(chunk_size=2000), performance_index)
+    content = {
+        'performances': _performance_payload(performances),
+        'entries': entries,
+    }
+    return {
+        'format': BUNDLE_FORMAT,
+        'kind': 'full',
+        'association': association_name,
+        'version': version,
+        'salt': salt,
+        **content,
+        'token': _sign(association_name, version, content),
+    }
+
+
+def _oldest_delta_version() -> int:
+    # Audit entries moved to the archive can no longer be replayed.
+    archived = [p['max_id'] for p in audit_archive.partitions(PurchaseAuditLog)]
+    return max(archived, default=0)
+
+
+def build_delta(association_name: str, token: str | None) -> dict:
+    """
+    Changes since the bundle *token* was issued for, or a full bundle when
+    the token is unusable, the association's performances changed (entries
+    index into that list) or the delta would be larger than a new bundle.
+
+    ``upsert`` entries replace or add codes of this association, ``remove``
+    drops the hashes of deleted purchases and of purchases that no longer
+    have a ticket for one of its performances.
+    """
+    state = _token_state(association_name, token)
+    if state is None:
+        return build_bundle(association_name)
+    since, performances_digest = state
+    if since < _oldest_delta_version():
+        return build_bundle(association_name)
+    performances = _performances(association_name)
+    performance_payload = _performance_payload(performances)
+    if _performances_digest(performance_payload) != performances_digest:
+        return build_bundle(association_name)
+
+    version = current_version()
+    salt = bundle_salt(association_name)
+    changed = list(
+        PurchaseAuditLog.objects.filter(pk__gt=max(since - DELTA_OVERLAP, 0))
+        .values_list('purchase_id_snapshot', 'action', 'changes')
+    )
+    purchase_ids = {purchase_id for purchase_id, _, _ in changed if purchase_id is not None}
+    if len(purchase_ids) > MAX_DELTA_PURCHASES:
+        return build_bundle(association_name)
+
+    performance_index = {p.key: index for index, p in enumerate(performances)}
+    rows = list(
+        Purchase.objects.filter(pk__in=purchase_ids)
+        .values_list('pk', 'verification_code', 'name', 'ticket1_id', 'ticket2_id')
+    )
+    upsert, others = _classify(salt, [row[1:] for row in rows], performance_index)
+
+    # Deleted purchases are only known through the code in their DELETE entry.
+    existing = {row[0] for row in rows}
+    removed = sorted(set(others) | {
+        hash_code(salt, code)
+        for purchase_id, action, changes in changed
+        if action == 'DELETE' and purchase_id not in existing and (code := _deleted_code(changes))
+    })
+    content = {
+        'performances': performance_payload,
+        'upsert': upsert,
+        'remove': removed,
+    }
+    return {
+        'format': BUNDLE_FORMAT,
+        'kind': 'delta',
+        'association': association_name,
+        'since': since,
+        'version': version,
+        'salt': salt,
+        **content,
+        'token': _sign(association_name, version, content),
+    }
+
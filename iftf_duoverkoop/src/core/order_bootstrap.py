@@ -0,0 +1,80 @@
+"""
+Everything the order page's scripts need, in one payload.
+
+    catalog        associations (name, logo) and their performances (name,
+                   date, label, capacity), in display order
+    prices         {key: {price, discounted_price}} for every performance
+    availability   {key: {tickets_left, max_tickets}} for every performance
+    last_customer  {name, email} of this session's last order, or null
+
+Catalog and prices only change when staff edit performances, so they share
+a ``catalog_version`` (a digest of their content).  A client that sends the
+version it already has gets ``catalog`` and ``prices`` as null while it is
+unchanged; availability and the last customer are always included.  The
+order page also keys its cached tile fragment on the version.  Logos are
+listed by their content-hashed URL, so replacing a logo file moves the
+version too.
+
+The payload is built from one list of performances loaded with
+``db.get_all_performances()``, i.e. a single query with the sales counts.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def _catalog(performances_by_association: dict) -> dict:
+    return {
+        'associations': [
+            {'name': association.name, 'logo': association.logo_url(), 'performances': [p.key for p in performances]}
+            for association, performances in performances_by_association.items()
+        ],
+        'performances': {
+            p.key: {
+                'name': p.name,
+                'association': p.association_id,
+                'date': p.date.isoformat(),
+                'label': p.selection(),
+                'max_tickets': p.max_tickets,
+            }
+            for performances in performances_by_association.values()
+            for p in performances
+        },
+    }
+
+
+def prices(performances) -> dict:
+    return {
+        p.key: {
+            'price': float(p.price),
+            'discounted_price': float(p.discounted_price) if p.discounted_price is not None else None,
+        }
+        for p in performances
+    }
+
+
+def availability(performances) -> dict:
+    return {p.key: {'tickets_left': p.tickets_left(), 'max_tickets': p.max_tickets} for p in performances}
+
+
+def catalog_version(catalog: dict, prices: dict) -> str:
+    content = json.dumps([catalog, prices], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def build_bootstrap(performances_by_association: dict, last_customer: dict | None,
+                    known_catalog_version: str | None = None) -> dict:
+    """The bootstrap payload; *performances_by_association* as from db.get_performances_by_association()."""
+    performances = [p for group in performances_by_association.values() for p in group]
+    catalog = _catalog(performances_by_association)
+    performance_prices = prices(performances)
+    version = catalog_version(catalog, performance_prices)
+    unchanged = known_catalog_version == version
+    return {
+        'catalog_version': version,
+        'catalog': None if unchanged else catalog,
+        'prices': None if unchanged else performance_prices,
+        'availability': availability(performances),
+        'last_customer': last_customer or None,
+    }
@@ -0,0 +1,311 @@
+"""
+core/qr.py – Minimal QR code encoder for verification codes.
+
+Codes are at most a few dozen lowercase ASCII characters, so this only
+implements what they need from ISO/IEC 18004: byte mode, error correction
+level M (15 % of the symbol may be damaged or smudged) and versions 1–10
+(up to 213 bytes).  The matrix is rendered to PNG with Pillow.
+"""
+import io
+from functools import lru_cache
+
+from PIL import Image
+
+# Per version: (EC codewords per block, [(block count, data codewords per block), ...]) at level M.
+_EC_BLOCKS_M = {
+    1: (10, [(1, 16)]),
+    2: (16, [(1, 28)]),
+    3: (26, [(1, 44)]),
+    4: (18, [(2, 32)]),
+    5: (24, [(2, 43)]),
+    6: (16, [(4, 27)]),
+    7: (18, [(4, 31)]),
+    8: (22, [(2, 38), (2, 39)]),
+    9: (22, [(3, 36), (2, 37)]),
+    10: (26, [(4, 43), (1, 44)]),
+}
+_ALIGNMENT_POSITIONS = {
+    1: [], 2: [6, 18], 3: [6, 22], 4: [6, 26], 5: [6, 30], 6: [6, 34],
+    7: [6, 22, 38], 8: [6, 24, 42], 9: [6, 26, 46], 10: [6, 28, 50],
+}
+_FORMAT_BITS_M = 0b00
+_MODE_BYTE = 0b0100
+
+QUIET_ZONE = 4
+
+
+class QRCodeError(ValueError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Reed–Solomon over GF(256), primitive polynomial 0x11D
+# ---------------------------------------------------------------------------
+
+def _gf_multiply(x: int, y: int) -> int:
+    z = 0
+    for i in reversed(range(8)):
+        z = (z << 1) ^ ((z >> 7) * 0x11D)
+        z ^= ((y >> i) & 1) * x
+    return z
+
+
+@lru_cache(maxsize=None)
+def _rs_divisor(degree: int) -> tuple:
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_multiply(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_multiply(root, 0x02)
+    return tuple(result)
+
+
+def _rs_remainder(data, divisor) -> list[int]:
+    result = [0] * len(divisor)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for i, coefficient in enumerate(divisor):
+            result[i] ^= _gf_multiply(coefficient, factor)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Codewords
+# ---------------------------------------------------------------------------
+
+def _data_capacity(version: int) -> int:
+    return sum(count * size for count, size in _EC_BLOCKS_M[version][1])
+
+
+def _count_bits(version: int) -> int:
+    return 8 if version <= 9 else 16
+
+
+def _choose_version(length: int) -> int:
+    for version in _EC_BLOCKS_M:
+        if 4 + _count_bits(version) + 8 * length <= _data_capacity(version) * 8:
+            return version
+    raise QRCodeError(f'{length} bytes do not fit in a version {max(_EC_BLOCKS_M)} QR code.')
+
+
+def _data_codewords(payload: bytes, version: int) -> list[int]:
+    bits = []
+
+    def append(value: int, length: int) -> None:
+        bits.extend((value >> i) & 1 for i in reversed(range(length)))
+
+    append(_MODE_BYTE, 4)
+    append(len(payload), _count_bits(version))
+    for byte in payload:
+        append(byte, 8)
+
+    capacity = _data_capacity(version) * 8
+    append(0, min(4, capacity - len(bits)))
+    append(0, -len(bits) % 8)
+    codewords = [int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(codewords) < capacity // 8:
+        codewords.append(pad)
+        pad ^= 0xEC ^ 0x11
+    return codewords
+
+
+def _interleave(data: list[int], version: int) -> list[int]:
+    ec_length, groups = _EC_BLOCKS_M[version]
+    divisor = _rs_divisor(ec_length)
+    blocks = []
+    offset = 0
+    for count, size in groups:
+        for _ in range(count):
+            block = data[offset:offset + size]
+            offset += size
+            blocks.append((block, _rs_remainder(block, divisor)))
+
+    result = []
+    for i in range(max(len(block) for block, _ in blocks)):
+        result.extend(block[i] for block, _ in blocks if i < len(block))
+    for i in range(ec_length):
+        result.extend(ec[i] for _, ec in blocks)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Matrix
+# ---------------------------------------------------------------------------
+
+class _Matrix:
+    def __init__(self, version: int):
+        self.version = version
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+        self._draw_function_patterns()
+
+    def _set_function(self, x: int, y: int, dark: bool) -> None:
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def _draw_function_patterns(self) -> None:
+        size = self.size
+        for i in range(size):
+            self._set_function(6, i, i % 2 == 0)
+            self._set_function(i, 6, i % 2 == 0)
+
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self._set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+
+        positions = _ALIGNMENT_POSITIONS[self.version]
+        last = len(positions) - 1
+        for i, cx in enumerate(positions):
+            for j, cy in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue  # overlaps a finder pattern
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self._set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+
+        # Reserve the format areas now; the real bits are drawn once the mask is known.
+        self.draw_format_bits(0)
+        self._draw_version()
+
+    def draw_format_bits(self, mask: int) -> None:
+        data = _FORMAT_BITS_M << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+
+        def bit(i: int) -> bool:
+            return (bits >> i) & 1 != 0
+
+        size = self.size
+        for i in range(6):
+            self._set_function(8, i, bit(i))
+        self._set_function(8, 7, bit(6))
+        self._set_function(8, 8, bit(7))
+        self._set_function(7, 8, bit(8))
+        for i in range(9, 15):
+            self._set_function(14 - i, 8, bit(i))
+        for i in range(8):
+            self._set_function(size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self._set_function(8, size - 15 + i, bit(i))
+        self._set_function(8, size - 8, True)  # the dark module
+
+    def _draw_version(self) -> None:
+        if self.version < 7:
+            return
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        bits = self.version << 12 | remainder
+        for i in range(18):
+            dark = (bits >> i) & 1 != 0
+            a, b = self.size - 11 + i % 3, i // 3
+            self._set_function(a, b, dark)
+            self._set_function(b, a, dark)
+
+    def draw_codewords(self, codewords: list[int]) -> None:
+        total_bits = len(codewords) * 8
+        i = 0
+        right = self.size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5  # skip the vertical timing pattern
+            upward = (right + 1) & 2 == 0
+            for vertical in range(self.size):
+                y = self.size - 1 - vertical if upward else vertical
+                for x in (right, right - 1):
+                    if not self.function[y][x] and i < total_bits:
+                        self.modules[y][x] = (codewords[i >> 3] >> (7 - (i & 7))) & 1 != 0
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask: int) -> None:
+        condition = _MASKS[mask]
+        for y in range(self.size):
+            for x in range(self.size):
+                if not self.function[y][x] and condition(x, y):
+                    self.modules[y][x] = not self.modules[y][x]
+
+    def penalty(self) -> int:
+        size = self.size
+        rows = self.modules
+        columns = [[rows[y][x] for y in range(size)] for x in range(size)]
+        score = 0
+        finder_like = ('10111010000', '00001011101')
+        for line in rows + columns:
+            run_colour, run_length = None, 0
+            for dark in line:
+                if dark == run_colour:
+                    run_length += 1
+                else:
+                    if run_length >= 5:
+                        score += run_length - 2
+                    run_colour, run_length = dark, 1
+            if run_length >= 5:
+                score += run_length - 2
+            # The quiet zone counts as light modules around the finder-like patterns.
+            text = '0000' + ''.join('1' if dark else '0' for dark in line) + '0000'
+            score += 40 * sum(text.count(pattern) for pattern in finder_like)
+        for y in range(size - 1):
+            for x in range(size - 1):
+                if rows[y][x] == rows[y][x + 1] == rows[y + 1][x] == rows[y + 1][x + 1]:
+                    score += 3
+        dark = sum(map(sum, rows))
+        score += 10 * (abs(dark * 100 // (size * size) - 50) // 5)
+        return score
+
+
+_MASKS = [
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+]
+
+
+def encode(text: str) -> list[list[bool]]:
+    """The module matrix (True = dark) for *text*, with the lowest-penalty mask."""
+    payload = text.encode('utf-8')
+    version = _choose_version(len(payload))
+    codewords = _interleave(_data_codewords(payload, version), version)
+
+    best = None
+    for mask in range(len(_MASKS)):
+        matrix = _Matrix(version)
+        matrix.draw_codewords(codewords)
+        matrix.apply_mask(mask)
+        matrix.draw_format_bits(mask)
+        score = matrix.penalty()
+        if best is None or score < best[0]:
+            best = (score, matrix)
+    return best[1].modules
+
+
+def render_png(text: str, module_size: int = 8) -> bytes:
+    """*text* as a black-on-white PNG QR code, with the standard quiet zone around it."""
+    modules = encode(text)
+    size = len(modules) + 2 * QUIET_ZONE
+    image = Image.new('1', (size, size), 1)
+    pixels = image.load()
+    for y, row in enumerate(modules):
+        for x, dark in enumerate(row):
+            if dark:
+                pixels[x + QUIET_ZONE, y + QUIET_ZONE] = 0
+    image = image.resize((size * module_size, size * module_size), Image.NEAREST)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
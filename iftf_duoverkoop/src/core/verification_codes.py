@@ -3,9 +3,16 @@ core/verification_codes.py – Three-word code generator for purchase verificati
 
 Generates unique, memorable three-word codes for purchase identification.
 Uses a curated word list to create codes like 'apple-tree-button'.
+
+Codes read aloud at the door get misheard, so ``suggest_codes`` snaps each
+word of a code that was not found to its nearest list words and proposes the
+existing codes among those combinations.
 """
 import random
-from typing import List, Set
+import re
+from functools import lru_cache
+from itertools import product
+from typing import Dict, List, Set, Tuple
 
 
 ADJECTIVES: List[str] = [
@@ -70,6 +77,127 @@ def normalize_code(code: str) -> str:
     return code.lower().strip()
 
 
+# ---------------------------------------------------------------------------
+# Typo-tolerant lookup
+# ---------------------------------------------------------------------------
+
+# Words further than this from every list word are not guessed at.
+MAX_WORD_DISTANCE = 2
+# Nearest list words tried per position: at most 3 × 3 × 3 candidate codes.
+WORDS_PER_POSITION = 3
+MAX_SUGGESTIONS = 5
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between *a* and *b*."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """
+    Burkhard–Keller tree over a word list.
+
+    Children are keyed by their edit distance to the parent, so a search
+    within *max_distance* of a word only descends into children whose key is
+    within *max_distance* of the word's distance to the parent (triangle
+    inequality); most of the list is never compared.
+    """
+
+    def __init__(self, words):
+        self._root = None
+        for word in dict.fromkeys(words):
+            self._add(word)
+
+    def _add(self, word: str) -> None:
+        if self._root is None:
+            self._root = (word, {})
+            return
+        node = self._root
+        while True:
+            distance = edit_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """(distance, word) pairs within *max_distance* of *word*, nearest first."""
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node_word, children = stack.pop()
+            distance = edit_distance(word, node_word)
+            if distance <= max_distance:
+                found.append((distance, node_word))
+            stack.extend(
+                child for key, child in children.items()
+                if distance - max_distance <= key <= distance + max_distance
+            )
+        return sorted(found)
+
+
+@lru_cache(maxsize=None)
+def _word_trees() -> Tuple[BKTree, BKTree, BKTree]:
+    return BKTree(ADJECTIVES), BKTree(NOUNS), BKTree(OBJECTS)
+
+
+def candidate_codes(code: str) -> Dict[str, int]:
+    """
+    Codes built from the list words nearest to each word of *code*, mapped
+    to their total edit distance.  Empty unless *code* has three words;
+    spaces, dots and other separators are accepted between them.
+    """
+    words = re.findall(r'[a-z]+', (code or '').lower())
+    if len(words) != 3:
+        return {}
+    options = [
+        tree.search(word, MAX_WORD_DISTANCE)[:WORDS_PER_POSITION]
+        for tree, word in zip(_word_trees(), words)
+    ]
+    return {
+        f'{adjective}-{noun}-{obj}': d1 + d2 + d3
+        for (d1, adjective), (d2, noun), (d3, obj) in product(*options)
+    }
+
+
+def suggest_codes(codes, queryset=None, limit: int = MAX_SUGGESTIONS) -> Dict[str, List[str]]:
+    """
+    Existing codes close to each of *codes*, nearest first, looked up with a
+    single ``verification_code IN (...)`` query for the whole batch.
+
+    *queryset* (Purchase objects by default) limits which purchases may be
+    suggested, e.g. to the tickets of one association.
+    """
+    if queryset is None:
+        from iftf_duoverkoop.src.core.models import Purchase  # avoid circular import at module level
+        queryset = Purchase.objects.all()
+
+    candidates = {code: candidate_codes(code) for code in codes}
+    wanted = set().union(*candidates.values()) if candidates else set()
+    existing = set()
+    if wanted:
+        existing = set(queryset.filter(verification_code__in=wanted).values_list('verification_code', flat=True))
+    return {
+        code: sorted(existing.intersection(distances), key=lambda c: (distances[c], c))[:limit]
+        for code, distances in candidates.items()
+    }
+
+
 def get_code_statistics() -> dict:
     """Return total possible combinations and current usage statistics."""
     from iftf_duoverkoop.src.core.models import Purchase  # avoid circular import at module level
@@ -10,6 +10,10 @@ from django.utils.translation import gettext_lazy as _
 
 from iftf_duoverkoop.src.core.models import Association, EmailCampaign, EmailTemplateSettings, Performance
 from iftf_duoverkoop.src.core.auth import GROUP_POS_STAFF, GROUP_SUPPORT_STAFF, GROUP_ASSOCIATION_REP
+from iftf_duoverkoop.src.core.backup_restore import MAX_AUTO_PARALLEL_JOBS, PARALLEL_JOBS_AUTO
+
+# Highest worker count an operation may ask for from the dashboard.
+MAX_PARALLEL_JOBS_INPUT = 16
 
 
 def _logo_choices():
@@ -283,11 +287,52 @@ class LogoUploadForm(forms.Form):
     )
 
 
+class ParallelJobsField(forms.CharField):
+    """Empty for the default, a number of jobs, or 'auto' for one job per CPU."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('label', 'Parallel jobs')
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('widget', forms.TextInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': f'1-{MAX_PARALLEL_JOBS_INPUT} or {PARALLEL_JOBS_AUTO}',
+        }))
+        kwargs.setdefault(
+            'help_text',
+            f"Leave empty for the default (DATABASE_BACKUP_JOBS, normally 1). "
+            f"'{PARALLEL_JOBS_AUTO}' uses one job per CPU, up to {MAX_AUTO_PARALLEL_JOBS}. "
+            f"More than 1 backs up in parallel directory format (.tar).",
+        )
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        value = super().to_python(value).strip().lower()
+        if not value:
+            return None
+        if value == PARALLEL_JOBS_AUTO:
+            return PARALLEL_JOBS_AUTO
+        try:
+            jobs = int(value)
+        except ValueError:
+            raise ValidationError(f"Enter a number or '{PARALLEL_JOBS_AUTO}'.") from None
+        if not 1 <= jobs <= MAX_PARALLEL_JOBS_INPUT:
+            raise ValidationError(f'Parallel jobs must be between 1 and {MAX_PARALLEL_JOBS_INPUT}.')
+        return jobs
+
+
+class BackupDatabaseForm(forms.Form):
+    parallel_jobs = ParallelJobsField()
+
+
 class RestoreDatabaseForm(forms.Form):
     backup_file = forms.FileField(
-        label='Backup file (.dump)',
-        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.dump,application/octet-stream'}),
+        label='Backup file (.dump, .tar or .sqlite3.gz)',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.dump,.tar,.gz,application/octet-stream,application/x-tar,application/gzip',
+        }),
     )
+    parallel_jobs = ParallelJobsField()
     confirmation = forms.CharField(
         label='Type RESTORE to confirm',
         max_length=32,
@@ -0,0 +1,118 @@
+"""
+Keyset pagination for the large, append-only audit log tables.
+
+Django's Paginator counts the whole filtered table and skips rows with
+OFFSET on every page view; both get slower with every entry logged.  Pages
+here are addressed by a cursor holding the (timestamp, id) of the row at the
+page edge, so each page is one indexed range scan of ``per_page + 1`` rows,
+however deep it is.  The total shown next to the pages is an estimate: the
+planner's row estimate on PostgreSQL, a count capped at COUNT_CAP elsewhere.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+
+COUNT_CAP = 10_000
+
+
+@dataclass
+class KeysetPage:
+    object_list: list = field(default_factory=list)
+    has_next: bool = False
+    has_previous: bool = False
+    next_cursor: str = ''
+    previous_cursor: str = ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+
+@dataclass(frozen=True)
+class CountEstimate:
+    count: int
+    # True when counting stopped at COUNT_CAP: there are at least this many.
+    lower_bound: bool = False
+
+
+def encode_cursor(entry) -> str:
+    raw = json.dumps([entry.timestamp.isoformat(), entry.pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value: str | None) -> tuple[datetime, int] | None:
+    """The (timestamp, id) in *value*, or None for a missing or mangled cursor."""
+    if not value:
+        return None
+    try:
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, *, after: str | None = None, before: str | None = None, per_page: int = 50) -> KeysetPage:
+    """
+    One page of *queryset*, newest first.
+
+    *after* is the cursor of the last row of the previous page (older
+    entries follow), *before* the cursor of the first row of the next page
+    (going back to newer entries).  Without either the newest page is
+    returned.
+    """
+    older_than = decode_cursor(after)
+    newer_than = None if older_than else decode_cursor(before)
+
+    if newer_than is not None:
+        timestamp, pk = newer_than
+        rows = list(
+            queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk))
+            .order_by('timestamp', 'pk')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        page_queryset = queryset
+        if older_than is not None:
+            timestamp, pk = older_than
+            page_queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+        rows = list(page_queryset.order_by('-timestamp', '-pk')[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = older_than is not None
+
+    if not rows:
+        # Paged past either end (rows were archived in between): start over.
+        return KeysetPage() if older_than is None and newer_than is None else keyset_page(queryset, per_page=per_page)
+    return KeysetPage(
+        object_list=rows,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=encode_cursor(rows[-1]) if has_next else '',
+        previous_cursor=encode_cursor(rows[0]) if has_previous else '',
+    )
+
+
+def estimated_count(queryset) -> CountEstimate:
+    """Roughly how many rows *queryset* matches, without counting a large table."""
+    queryset = queryset.order_by().values('pk')
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return CountEstimate(int(plan[0]['Plan']['Plan Rows']))
+    count = queryset[:COUNT_CAP + 1].count()
+    return CountEstimate(min(count, COUNT_CAP), lower_bound=count > COUNT_CAP)
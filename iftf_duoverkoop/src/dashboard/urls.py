@@ -38,6 +38,7 @@ urlpatterns = [
     # Email center
     path('email/', v.dashboard_email, name='dashboard_email'),
     path('email/campaigns/create/', v.dashboard_email_campaign_create, name='dashboard_email_campaign_create'),
+    path('email/campaigns/audience-preview/', v.dashboard_email_campaign_audience_preview, name='dashboard_email_campaign_audience_preview'),
     path('email/template/save/', v.dashboard_email_template_save, name='dashboard_email_template_save'),
     path('email/template/preview/', v.dashboard_email_template_preview, name='dashboard_email_template_preview'),
 
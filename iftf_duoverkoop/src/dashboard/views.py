@@ -12,15 +12,17 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Group
-from django.core.paginator import Paginator
 from django.db import transaction
-from django.http import FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.translation import gettext as _
 from django.utils import timezone
 from django.views.decorators.http import require_POST, require_http_methods
 
+from iftf_duoverkoop.src.core import audit, audit_archive, backup_store
 from iftf_duoverkoop.src.core.backup_restore import (
+    default_parallel_jobs,
     enqueue_backup_job,
     enqueue_restore_job,
     has_running_database_operation,
@@ -38,13 +40,19 @@ from iftf_duoverkoop.src.core.models import (
     Performance,
     Purchase,
     PurchaseAuditLog,
+    PurchaseAuditLookup,
+)
+from iftf_duoverkoop.src.core.auth import bump_permission_version, setup_permission_groups, GROUP_ASSOCIATION_REP
+from iftf_duoverkoop.src.core.email import (
+    count_campaign_audience,
+    render_email_html_preview,
+    send_email_campaign_async,
 )
-from iftf_duoverkoop.src.core.auth import setup_permission_groups, GROUP_ASSOCIATION_REP
-from iftf_duoverkoop.src.core.email import render_email_html_preview, send_email_campaign_async
 from iftf_duoverkoop.src.dashboard.forms import (
     AssociationForm, PerformanceForm, BulkSetPriceForm, CreateUserForm, EditUserForm, LogoUploadForm,
-    RestoreDatabaseForm, EmailTemplateSettingsForm, EmailCampaignForm,
+    BackupDatabaseForm, RestoreDatabaseForm, EmailTemplateSettingsForm, EmailCampaignForm,
 )
+from iftf_duoverkoop.src.dashboard.pagination import estimated_count, keyset_page
 
 
 # ---------------------------------------------------------------------------
@@ -528,6 +536,8 @@ def dashboard_user_edit(request: HttpRequest, user_id: int) -> HttpResponse:
             else:
                 # Remove profile if the group is no longer Association Representative
                 AssociationRepProfile.objects.filter(user=target).delete()
+            # Drop the roles cached in the edited user's sessions.
+            bump_permission_version()
             messages.success(request, _('dashboard.users.updated') % {'username': target.username})
             return redirect('dashboard:dashboard_users')
     else:
@@ -570,45 +580,97 @@ def dashboard_user_delete(request: HttpRequest, user_id: int) -> HttpResponse:
 
 @staff_required
 def dashboard_audit(request: HttpRequest) -> HttpResponse:
-    qs = PurchaseAuditLog.objects.select_related('user', 'purchase').order_by('-timestamp')
+    # Both logs are paged by (timestamp, id) cursors and username filters are
+    # prefix matches, so every page is an index range scan (see pagination.py).
+    tab = request.GET.get('tab') or 'purchases'
+    qs = PurchaseAuditLog.objects.select_related('user', 'purchase')
     action_filter = request.GET.get('action', '')
     user_filter = request.GET.get('user', '')
     purchase_filter = request.GET.get('purchase', '')
     if action_filter:
         qs = qs.filter(action=action_filter)
     if user_filter:
-        qs = qs.filter(user__username__icontains=user_filter)
-    if purchase_filter:
+        # auth_user is small; the matching ids then use the (user, timestamp) index.
+        qs = qs.filter(user_id__in=User.objects.filter(username__istartswith=user_filter).values('pk'))
+    if purchase_filter.isdigit():
         # Filter on purchase_id_snapshot so deleted purchases remain findable
         qs = qs.filter(purchase_id_snapshot=purchase_filter)
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        # Emails, codes and tickets are looked up in the side index, not in the JSON.
+        # A verification code also finds later edits of that purchase, which do
+        # not repeat the code in their payload.
+        matches = PurchaseAuditLookup.objects.filter(value=audit.normalize_lookup(search_query))
+        qs = qs.filter(
+            Q(pk__in=matches.values('entry_id'))
+            | Q(purchase_id_snapshot__in=matches.filter(kind=PurchaseAuditLookup.KIND_CODE)
+                .values('entry__purchase_id_snapshot'))
+        )
 
-    page = Paginator(qs, 50).get_page(request.GET.get('page'))
-
-    lqs = LoginAuditLog.objects.select_related('user').order_by('-timestamp')
+    page = total = None
+    if tab == 'purchases':
+        page = keyset_page(qs, after=request.GET.get('after'), before=request.GET.get('before'))
+        total = estimated_count(qs)
+
+    # Entries moved to cold storage by archive_audit_logs are only searched on request.
+    include_archive = request.GET.get('archive') == '1'
+    archived_entries = []
+    if include_archive and tab == 'purchases':
+        archive_filters = {}
+        if action_filter:
+            archive_filters['action'] = action_filter
+        if user_filter:
+            archive_filters['username__istartswith'] = user_filter
+        if purchase_filter.isdigit():
+            archive_filters['purchase_id_snapshot'] = int(purchase_filter)
+        if search_query:
+            archive_filters['lookup'] = audit.normalize_lookup(search_query)
+        archived_entries = audit_archive.search(PurchaseAuditLog, **archive_filters)
+
+    lqs = LoginAuditLog.objects.select_related('user')
     login_event_filter = request.GET.get('login_event', '')
     login_user_filter = request.GET.get('login_user', '')
     if login_event_filter:
         lqs = lqs.filter(event=login_event_filter)
     if login_user_filter:
-        lqs = lqs.filter(username__icontains=login_user_filter)
+        lqs = lqs.filter(username__istartswith=login_user_filter)
 
-    login_page = Paginator(lqs, 50).get_page(request.GET.get('login_page'))
+    login_page = login_total = None
+    if tab == 'logins':
+        login_page = keyset_page(lqs, after=request.GET.get('login_after'), before=request.GET.get('login_before'))
+        login_total = estimated_count(lqs)
+
+    if include_archive and tab == 'logins':
+        archive_filters = {}
+        if login_event_filter:
+            archive_filters['event'] = login_event_filter
+        if login_user_filter:
+            archive_filters['username__istartswith'] = login_user_filter
+        archived_entries = audit_archive.search(LoginAuditLog, **archive_filters)
 
     return render(request, 'dashboard/audit.html', {
         'page': page,
+        'total': total,
         'login_page': login_page,
+        'login_total': login_total,
         'users': User.objects.order_by('username'),
         'action_filter': action_filter,
         'user_filter': user_filter,
         'purchase_filter': purchase_filter,
+        'search_query': search_query,
         'login_event_filter': login_event_filter,
         'login_user_filter': login_user_filter,
+        'include_archive': include_archive,
+        'archived_entries': archived_entries,
+        'archive_search_limit': audit_archive.SEARCH_LIMIT,
     })
 
 
 @staff_required
 def dashboard_audit_detail(request: HttpRequest, log_id: int) -> HttpResponse:
-    entry = get_object_or_404(PurchaseAuditLog, pk=log_id)
+    entry = PurchaseAuditLog.objects.filter(pk=log_id).first() or audit_archive.find(PurchaseAuditLog, log_id)
+    if entry is None:
+        raise Http404
     return render(request, 'dashboard/audit_detail.html', {
         'entry': entry,
         'changes_pretty': json.dumps(entry.changes, indent=2) if entry.changes else None,
@@ -629,7 +691,11 @@ def dashboard_audit_detail(request: HttpRequest, log_id: int) -> HttpResponse:
 def dashboard_system(request: HttpRequest) -> HttpResponse:
     from django.db import connection
 
-    operations = DatabaseOperation.objects.select_related('created_by').all()[:25]
+    operations = list(DatabaseOperation.objects.select_related('created_by').all()[:25])
+    for op in operations:
+        op.backup_available = bool(op.backup_filename) and (
+            backup_store.exists(op.backup_filename) or _backup_file_path(op.backup_filename).is_file()
+        )
     can_manage_db = _can_manage_database_ops(request)
     can_manage_email = _can_manage_email_templates(request)
     try:
@@ -646,6 +712,7 @@ def dashboard_system(request: HttpRequest) -> HttpResponse:
             'Purchases': Purchase.objects.count(),
             'Audit log entries': PurchaseAuditLog.objects.count(),
             'Login events': LoginAuditLog.objects.count(),
+            'Archived audit entries': sum(p['rows'] for p in audit_archive.partitions()),
             'Users': User.objects.count(),
         },
         'send_emails': getattr(settings, 'SEND_EMAILS', False),
@@ -653,7 +720,12 @@ def dashboard_system(request: HttpRequest) -> HttpResponse:
         'can_manage_db': can_manage_db,
         'can_manage_email': can_manage_email,
         'db_operations': operations,
+        'backup_form': BackupDatabaseForm(),
         'restore_form': RestoreDatabaseForm(),
+        'default_parallel_jobs': default_parallel_jobs(),
+        'backup_store_usage': backup_store.usage() if can_manage_db else None,
+        'backup_keep_last': getattr(settings, 'DATABASE_BACKUP_KEEP_LAST', 7),
+        'backup_keep_daily_days': getattr(settings, 'DATABASE_BACKUP_KEEP_DAILY_DAYS', 14),
         'email_template_form': email_template_form,
         'mailgun_domain': getattr(settings, 'MAILGUN_DOMAIN', ''),
         'mailgun_base_url': getattr(settings, 'MAILGUN_API_BASE_URL', ''),
@@ -734,6 +806,25 @@ def dashboard_email_campaign_create(request: HttpRequest) -> HttpResponse:
     return redirect('dashboard:dashboard_email')
 
 
+@staff_required
+@require_http_methods(['GET'])
+def dashboard_email_campaign_audience_preview(request: HttpRequest) -> JsonResponse:
+    """Return the number of distinct recipients for the audience currently selected in the form."""
+    if not _can_manage_email_campaigns(request):
+        return JsonResponse({'success': False, 'error': _('dashboard.email.no_campaign_permission')}, status=403)
+
+    audience_type = request.GET.get('audience_type', EmailCampaign.AUDIENCE_ALL)
+    if audience_type not in dict(EmailCampaign.AUDIENCE_CHOICES):
+        return JsonResponse({'success': False, 'error': _('dashboard.email.campaign_create_invalid')}, status=400)
+
+    count = count_campaign_audience(
+        audience_type,
+        association_ids=request.GET.getlist('associations'),
+        performance_id=request.GET.get('performance') or None,
+    )
+    return JsonResponse({'success': True, 'count': count})
+
+
 @staff_required
 @require_POST
 def dashboard_email_template_save(request: HttpRequest) -> HttpResponse:
@@ -831,9 +922,15 @@ def dashboard_backup_create(request: HttpRequest) -> HttpResponse:
         messages.warning(request, 'Another database operation is already running.')
         return redirect('dashboard:dashboard_system')
 
+    form = BackupDatabaseForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, "Backup request is invalid. Parallel jobs must be between 1 and 16, or 'auto'.")
+        return redirect('dashboard:dashboard_system')
+
     job = enqueue_backup_job(
         created_by=request.user,
         notes='Manual backup requested from dashboard.',
+        parallel_jobs=form.cleaned_data['parallel_jobs'],
     )
     messages.success(request, f'Backup job #{job.pk} started in the background.')
     return redirect('dashboard:dashboard_system')
@@ -854,6 +951,17 @@ def dashboard_backup_download(request: HttpRequest, operation_id: int) -> HttpRe
     if not operation.backup_filename:
         raise Http404
 
+    if backup_store.exists(operation.backup_filename):
+        manifest = backup_store.load_manifest(operation.backup_filename)
+        response = StreamingHttpResponse(
+            backup_store.iter_backup(operation.backup_filename),
+            content_type='application/octet-stream',
+        )
+        response['Content-Length'] = str(manifest['size'])
+        response['Content-Disposition'] = f'attachment; filename="{operation.backup_filename}"'
+        return response
+
+    # Standalone dump written before backups moved into the chunk store.
     file_path = _backup_file_path(operation.backup_filename)
     if not file_path.exists() or not file_path.is_file():
         raise Http404
@@ -879,19 +987,24 @@ def dashboard_restore_upload(request: HttpRequest) -> HttpResponse:
 
     form = RestoreDatabaseForm(request.POST, request.FILES)
     if not form.is_valid():
-        messages.error(request, 'Restore request is invalid. Please confirm and upload a .dump file.')
+        messages.error(request, 'Restore request is invalid. Please confirm and upload a backup file.')
         return redirect('dashboard:dashboard_system')
 
     uploaded_file = form.cleaned_data['backup_file']
-    if not uploaded_file.name.lower().endswith('.dump'):
-        messages.error(request, 'Only .dump files are supported for restore.')
+    if not uploaded_file.name.lower().endswith(('.dump', '.tar', '.sqlite3.gz')):
+        messages.error(request, 'Only .dump, .tar and .sqlite3.gz backup files are supported for restore.')
         return redirect('dashboard:dashboard_system')
 
-    job = enqueue_restore_job(
-        created_by=request.user,
-        uploaded_file=uploaded_file,
-        notes='Restore requested from dashboard upload.',
-    )
+    try:
+        job = enqueue_restore_job(
+            created_by=request.user,
+            uploaded_file=uploaded_file,
+            notes='Restore requested from dashboard upload.',
+            parallel_jobs=form.cleaned_data['parallel_jobs'],
+        )
+    except RuntimeError as exc:
+        messages.error(request, str(exc))
+        return redirect('dashboard:dashboard_system')
     messages.success(
         request,
         f'Restore job #{job.pk} started in the background. A safety backup is created automatically first.',
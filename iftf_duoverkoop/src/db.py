@@ -1,6 +1,8 @@
 from datetime import datetime
 
 from django.core.exceptions import ValidationError
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from iftf_duoverkoop.src.core.models import Performance, Purchase, Association
 
@@ -21,8 +23,29 @@ def get_performance(key: str) -> Performance:
     return Performance.objects.get(key=key)
 
 
+def _sold_in(slot: str) -> Coalesce:
+    sold = (
+        Purchase.objects.filter(**{slot: OuterRef('pk')})
+        .order_by()
+        .values(slot)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(sold), 0)
+
+
+def with_tickets_sold(queryset):
+    """
+    Annotate performances with ``sold_count`` (see Performance.tickets_sold).
+
+    The counts are correlated subqueries on the ticket1/ticket2 indexes, so a
+    whole list of performances costs one query instead of two per performance.
+    """
+    return queryset.annotate(sold_count=_sold_in('ticket1') + _sold_in('ticket2'))
+
+
 def get_all_performances() -> list:
-    return Performance.objects.all()
+    return with_tickets_sold(Performance.objects.select_related('association'))
 
 
 def get_keyed_performances() -> list:
@@ -34,11 +57,9 @@ def get_readable_keyed_performances() -> list:
             performance.tickets_left() > 0]
 
 
-def get_performances_by_association() -> dict:
-    # Get associations sorted alphabetically (they already are from get_all_associations)
-    associations = get_all_associations()
+def _group_by_association(associations: list, performances) -> dict:
     result = {association: [] for association in associations}
-    for performance in get_all_performances():
+    for performance in performances:
         if performance.association in result:
             result[performance.association].append(performance)
     # Sort performances within each association by date
@@ -47,6 +68,11 @@ def get_performances_by_association() -> dict:
     return result
 
 
+def get_performances_by_association() -> dict:
+    # Get associations sorted alphabetically (they already are from get_all_associations)
+    return _group_by_association(get_all_associations(), get_all_performances())
+
+
 def create_association(name: str, image: str = None) -> Association:
     association, _ = Association.objects.get_or_create(name=name, defaults={
         'name': name,
@@ -151,3 +177,25 @@ def data_ready():
         if not association.image:
             is_ready = False
     return is_ready
+
+
+# ---------------------------------------------------------------------------
+# Async variants for the async JSON views (Django's async ORM interface)
+# ---------------------------------------------------------------------------
+
+async def aget_all_performances() -> list:
+    return [performance async for performance in get_all_performances()]
+
+
+async def aget_all_associations() -> list:
+    associations = [a async for a in Association.objects.all()]
+    associations.sort(key=lambda a: a.name.lower())
+    return associations
+
+
+async def aget_association(name: str) -> Association:
+    return await Association.objects.aget(name=name)
+
+
+async def aget_performances_by_association() -> dict:
+    return _group_by_association(await aget_all_associations(), await aget_all_performances())
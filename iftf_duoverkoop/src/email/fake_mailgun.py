@@ -0,0 +1,237 @@
+"""Local stand-in for the Mailgun ``/v3/<domain>/messages`` API.
+
+Used to exercise and benchmark the email pipeline without a Mailgun account.
+Start it with ``python manage.py fake_mailgun`` (or embed ``FakeMailgunServer``
+in a script) and point ``MAILGUN_API_BASE_URL`` at it.
+
+Supported behaviour:
+- HTTP basic auth with user ``api`` (any key unless one is configured)
+- form-encoded and multipart bodies, including attachments/inline files
+- batch sends: several ``to`` values or comma-separated recipients, with
+  optional ``recipient-variables`` JSON (max 1000 recipients per call)
+- configurable latency/jitter and error injection (429, 500, timeouts)
+- ``GET /stats`` returns counters as JSON, ``POST /stats/reset`` clears them
+"""
+import base64
+import email
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+MESSAGES_PATH_RE = re.compile(r'^/v3/(?P<domain>[^/]+)/messages/?$')
+MAX_BATCH_RECIPIENTS = 1000
+
+
+@dataclass
+class FakeMailgunConfig:
+    api_key: str = ''
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_limit_rate: float = 0.0
+    server_error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 30.0
+    seed: int | None = None
+
+
+class FakeMailgunStats:
+    """Thread-safe counters shared by all request handler threads."""
+
+    COUNTERS = (
+        'requests', 'accepted', 'recipients', 'attachments',
+        'rate_limited', 'server_errors', 'timeouts', 'rejected',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self._counts[name] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+def _parse_form(content_type: str, body: bytes) -> tuple[dict[str, list[str]], int]:
+    """Return (fields, file_count) for a form-encoded or multipart request body."""
+    if content_type.startswith('multipart/form-data'):
+        message = email.message_from_bytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + body
+        )
+        fields: dict[str, list[str]] = {}
+        files = 0
+        for part in message.get_payload() or []:
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                files += 1
+                continue
+            if name:
+                payload = part.get_payload(decode=True) or b''
+                fields.setdefault(name, []).append(payload.decode(part.get_content_charset() or 'utf-8', 'replace'))
+        return fields, files
+    return parse_qs(body.decode('utf-8', 'replace'), keep_blank_values=True), 0
+
+
+def _make_handler(config: FakeMailgunConfig, stats: FakeMailgunStats, rng: random.Random):
+    rng_lock = threading.Lock()
+
+    def roll() -> float:
+        with rng_lock:
+            return rng.random()
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'FakeMailgun/1.0'
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+            return
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            header = self.headers.get('Authorization', '')
+            if not header.startswith('Basic '):
+                return False
+            try:
+                user, _, key = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+            except Exception:
+                return False
+            return user == 'api' and (not config.api_key or key == config.api_key)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                self._send_json(200, stats.snapshot())
+                return
+            self._send_json(404, {'message': 'Not found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+
+            if self.path.rstrip('/') == '/stats/reset':
+                stats.reset()
+                self._send_json(200, {'message': 'Stats reset'})
+                return
+
+            match = MESSAGES_PATH_RE.match(self.path)
+            if match is None:
+                self._send_json(404, {'message': 'Not found'})
+                return
+            stats.add(requests=1)
+
+            if not self._authorized():
+                stats.add(rejected=1)
+                self._send_json(401, {'message': 'Forbidden'})
+                return
+
+            delay = config.latency_ms + (roll() * config.jitter_ms if config.jitter_ms else 0)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+            outcome = roll()
+            if outcome < config.timeout_rate:
+                stats.add(timeouts=1)
+                time.sleep(config.timeout_seconds)
+                self.close_connection = True
+                return
+            outcome -= config.timeout_rate
+            if outcome < config.rate_limit_rate:
+                stats.add(rate_limited=1)
+                self._send_json(429, {'message': 'Too many requests'})
+                return
+            outcome -= config.rate_limit_rate
+            if outcome < config.server_error_rate:
+                stats.add(server_errors=1)
+                self._send_json(500, {'message': 'Internal server error'})
+                return
+
+            fields, files = _parse_form(self.headers.get('Content-Type', ''), body)
+            recipients = [
+                address.strip()
+                for value in fields.get('to', [])
+                for address in value.split(',')
+                if address.strip()
+            ]
+            missing = [name for name in ('from', 'subject') if not fields.get(name)]
+            if not recipients:
+                missing.append('to')
+            if not fields.get('text') and not fields.get('html'):
+                missing.append('text/html')
+            if missing:
+                stats.add(rejected=1)
+                self._send_json(400, {'message': f"Missing parameter(s): {', '.join(missing)}"})
+                return
+            if len(recipients) > MAX_BATCH_RECIPIENTS:
+                stats.add(rejected=1)
+                self._send_json(400, {'message': f'Too many recipients (max {MAX_BATCH_RECIPIENTS})'})
+                return
+            if fields.get('recipient-variables'):
+                try:
+                    json.loads(fields['recipient-variables'][0])
+                except ValueError:
+                    stats.add(rejected=1)
+                    self._send_json(400, {'message': "'recipient-variables' parameter is not a valid JSON"})
+                    return
+
+            stats.add(accepted=1, recipients=len(recipients), attachments=files)
+            self._send_json(200, {
+                'id': f"<{uuid.uuid4().hex}@{match.group('domain')}>",
+                'message': 'Queued. Thank you.',
+            })
+
+    return Handler
+
+
+class FakeMailgunServer:
+    """Threaded fake Mailgun HTTP server; use as a context manager in scripts."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, config: FakeMailgunConfig | None = None):
+        self.config = config or FakeMailgunConfig()
+        self.stats = FakeMailgunStats()
+        rng = random.Random(self.config.seed)
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self.config, self.stats, rng))
+        self.httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeMailgunServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name='fake-mailgun')
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FakeMailgunServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
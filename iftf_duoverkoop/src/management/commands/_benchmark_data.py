@@ -0,0 +1,42 @@
+"""In-memory fixtures shared by the email benchmark commands (never saved to the database)."""
+from django.utils import timezone
+
+from iftf_duoverkoop.src.core.models import Association, EmailCampaign, Performance, Purchase
+
+
+def build_benchmark_purchases(count: int) -> list[Purchase]:
+    now = timezone.now()
+    wina = Association(name='Wina')
+    politika = Association(name='Politika')
+    perf1 = Performance(key='Wina1104', date=now, association=wina, name='Comedy Night', price=9, max_tickets=100)
+    perf2 = Performance(key='Politika0104', date=now, association=politika, name='Mystery Play', price=9, max_tickets=100)
+    return [
+        Purchase(
+            pk=index,
+            date=now,
+            name=f'Customer {index}',
+            email=f'customer{index}@example.com',
+            ticket1=perf1,
+            ticket2=perf2,
+            verification_code=f'happy-tree-button{index}',
+            has_culture_card=bool(index % 3 == 0),
+            student_id='r0123456' if index % 3 == 0 else '',
+        )
+        for index in range(1, count + 1)
+    ]
+
+
+def build_benchmark_campaign() -> EmailCampaign:
+    return EmailCampaign(
+        name='Benchmark',
+        audience_type=EmailCampaign.AUDIENCE_ALL,
+        subject_template='IFTF follow-up for {{ name }} - {{ verification_code }}',
+        text_template='Hi {{ name }},\n\nYou are coming to {{ performance1 }} and {{ performance2 }}.\n',
+        html_template=(
+            '<html><body style="background:{{ background_color }};">'
+            '<p>Hi <strong>{{ name }}</strong>,</p>'
+            '<p>{{ performance1 }}<br>{{ performance2 }}</p>'
+            '{% if culture_card_line %}<p>{{ culture_card_line }}</p>{% endif %}'
+            '</body></html>'
+        ),
+    )
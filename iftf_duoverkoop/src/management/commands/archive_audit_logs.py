@@ -0,0 +1,55 @@
+"""
+Management command to move old audit log entries into compressed, date-partitioned archive files.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from iftf_duoverkoop.src.core import audit_archive
+
+
+class Command(BaseCommand):
+    help = 'Archive purchase and login audit log entries older than a given age to gzip JSONL partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help=f'Archive entries older than this many days (default: AUDIT_ARCHIVE_AFTER_DAYS={settings.AUDIT_ARCHIVE_AFTER_DAYS}).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=audit_archive.DEFAULT_BATCH_SIZE,
+            help=f'Rows read and deleted per query (default: {audit_archive.DEFAULT_BATCH_SIZE}).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived.')
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Check every archived partition against the manifest instead of archiving.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            problems = audit_archive.verify()
+            for problem in problems:
+                self.stderr.write(f'  {problem}')
+            if problems:
+                raise CommandError(f'{len(problems)} archive partition(s) failed verification.')
+            count = len(audit_archive.partitions())
+            self.stdout.write(self.style.SUCCESS(f'✓ {count} archive partition(s) verified.'))
+            return
+
+        try:
+            result = audit_archive.archive(
+                older_than_days=options['older_than_days'],
+                batch_size=max(options['batch_size'], 1),
+                dry_run=options['dry_run'],
+            )
+        except audit_archive.ArchiveError as exc:
+            raise CommandError(str(exc)) from exc
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        for partition in result['partitions']:
+            location = f" -> {partition['path']} ({filesizeformat(partition['bytes'])})" if 'path' in partition else ''
+            self.stdout.write(f"  {verb} {partition['rows']} {partition['model']} entries of {partition['date']}{location}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {verb} {result['rows']} audit log entries in {len(result['partitions'])} partition(s)."
+        ))
@@ -0,0 +1,37 @@
+"""
+Management command to build the search lookups of purchase audit log entries written before they existed.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from iftf_duoverkoop.src.core.audit import build_lookups
+from iftf_duoverkoop.src.core.models import PurchaseAuditLog, PurchaseAuditLookup
+
+
+class Command(BaseCommand):
+    help = 'Extract emails, verification codes and tickets from purchase audit log payloads into the lookup index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Audit log entries processed per transaction (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        queryset = PurchaseAuditLog.objects.only('pk', 'changes').order_by('pk')
+        before = PurchaseAuditLookup.objects.count()
+        last_id = 0
+        entries = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                # Safe to rerun: rows that already exist are skipped.
+                PurchaseAuditLookup.objects.bulk_create(build_lookups(batch), ignore_conflicts=True)
+            entries += len(batch)
+            last_id = batch[-1].pk
+
+        created = PurchaseAuditLookup.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {entries} audit log entries; {created} new lookup value(s).'))
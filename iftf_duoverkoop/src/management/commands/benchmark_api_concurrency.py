@@ -0,0 +1,205 @@
+"""
+Management command to compare how many order-page pollers one worker carries
+under WSGI (a gunicorn sync worker) and under ASGI (a uvicorn worker).
+
+Both modes call Django's own handlers in-process, without HTTP parsing:
+
+    sync   WSGIHandler behind a lock, so one request runs at a time, as in
+           a sync worker; the other pollers wait in its queue
+    async  ASGIHandler on one event loop with every poller in flight at once
+
+Each poller requests the endpoint again as soon as its previous answer
+arrives.  The database is the configured one, read-only; ``--db-latency-ms``
+adds a delay to every query to stand in for the network round trip to a
+hosted PostgreSQL, which is what an async worker overlaps.  The capacity
+column is the measured rate times ``--poll-interval``: how many pollers at
+the order page's 20 s interval one worker keeps up with.
+"""
+import asyncio
+import io
+import statistics
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+HOST = 'benchmark.local'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent pollers per worker for the JSON API under WSGI (sync) and ASGI (async)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pollers', default='10,50,200', help='Comma-separated concurrent poller counts (default: 10,50,200).')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run (default: 5).')
+        parser.add_argument('--path', default='/api/availability/', help='Endpoint to poll (default: /api/availability/).')
+        parser.add_argument('--db-latency-ms', type=float, default=5.0, help='Simulated database round trip per query (default: 5).')
+        parser.add_argument('--poll-interval', type=float, default=20.0, help='Client poll interval for the capacity column (default: 20).')
+        parser.add_argument('--username', help='User to poll as (default: the first active superuser).')
+        parser.add_argument(
+            '--mode', choices=['all', 'sync', 'async'], default='all',
+            help='Which worker model to measure (default: all).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            poller_counts = [max(1, int(n)) for n in options['pollers'].split(',')]
+        except ValueError:
+            raise CommandError('--pollers must be comma-separated integers.')
+        users = User.objects.filter(is_active=True)
+        user = (
+            users.filter(username=options['username']) if options['username'] else users.filter(is_superuser=True)
+        ).order_by('pk').first()
+        if user is None:
+            raise CommandError('No such active user; pass --username.')
+
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+        latency = options['db_latency_ms'] / 1000
+
+        def slow_database(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_database)
+
+        connection_created.connect(add_latency, weak=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=[HOST]):
+                self.stdout.write(
+                    f"Polling {options['path']} as {user.get_username()} for {options['duration']:.0f} s per run "
+                    f"(database latency {options['db_latency_ms']:.0f} ms, capacity at a "
+                    f"{options['poll_interval']:.0f} s poll interval)"
+                )
+                for pollers in poller_counts:
+                    if options['mode'] in ('all', 'sync'):
+                        self._report('sync (WSGI)', pollers, options, self._run_sync(options['path'], cookie, pollers, options['duration']))
+                    if options['mode'] in ('all', 'async'):
+                        self._report('async (ASGI)', pollers, options, self._run_async(options['path'], cookie, pollers, options['duration']))
+        finally:
+            connection_created.disconnect(add_latency)
+            connections.close_all()
+            session.delete()
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
+
+    def _report(self, label: str, pollers: int, options: dict, run: tuple[float, list, int]) -> None:
+        elapsed, latencies, failed = run
+        rate = len(latencies) / elapsed if elapsed else 0
+        if latencies:
+            p50 = statistics.median(latencies) * 1000
+            p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else p50
+        else:
+            p50 = p95 = 0.0
+        self.stdout.write(
+            f'  {label:<13} {pollers:>5} pollers {rate:8.1f} req/s   p50: {p50:7.1f} ms   p95: {p95:7.1f} ms   '
+            f'failed: {failed}   capacity: ~{rate * options["poll_interval"]:.0f} pollers/worker'
+        )
+
+    @staticmethod
+    def _run_sync(path: str, cookie: str, pollers: int, duration: float) -> tuple[float, list, int]:
+        handler = WSGIHandler()
+        worker = threading.Lock()
+        latencies = []
+        failures = []
+        deadline = time.perf_counter() + duration
+
+        def request() -> bool:
+            status = []
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': '',
+                'SERVER_NAME': HOST,
+                'SERVER_PORT': '443',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'REMOTE_ADDR': '127.0.0.1',
+                'HTTP_HOST': HOST,
+                'HTTP_COOKIE': cookie,
+                'wsgi.url_scheme': 'https',
+                'wsgi.input': io.BytesIO(b''),
+                'wsgi.errors': sys.stderr,
+            }
+            response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return status[0].startswith('200')
+
+        def poller() -> None:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                with worker:
+                    ok = request()
+                (latencies if ok else failures).append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=poller) for _ in range(pollers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, latencies, len(failures)
+
+    @staticmethod
+    def _run_async(path: str, cookie: str, pollers: int, duration: float) -> tuple[float, list, int]:
+        latencies = []
+        failures = []
+
+        async def request(handler: ASGIHandler) -> bool:
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'https',
+                'path': path,
+                'raw_path': path.encode('ascii'),
+                'query_string': b'',
+                'headers': [(b'host', HOST.encode('ascii')), (b'cookie', cookie.encode('ascii'))],
+                'client': ('127.0.0.1', 0),
+                'server': (HOST, 443),
+            }
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            await handler(scope, receive, send)
+            return status == [200]
+
+        async def poller(handler: ASGIHandler, deadline: float) -> None:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                ok = await request(handler)
+                (latencies if ok else failures).append(time.perf_counter() - start)
+
+        async def main() -> float:
+            handler = ASGIHandler()
+            start = time.perf_counter()
+            await asyncio.gather(*(poller(handler, start + duration) for _ in range(pollers)))
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(main())
+        return elapsed, latencies, len(failures)
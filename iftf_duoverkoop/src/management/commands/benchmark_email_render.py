@@ -0,0 +1,65 @@
+"""
+Management command to measure per-email render cost for confirmation and campaign mails.
+
+Builds in-memory purchases (nothing is written except the template settings
+row, which is created on first use) and renders every mail twice: once the
+way it worked before the compiled-template cache (settings query + template
+parse per mail) and once with the cache and settings loaded once per batch.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from iftf_duoverkoop.src.core import email as email_core
+from iftf_duoverkoop.src.management.commands._benchmark_data import (
+    build_benchmark_campaign,
+    build_benchmark_purchases,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-email render cost with and without the compiled email template cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=5000, help='Number of mails to render per run (default: 5000).')
+
+    def handle(self, *args, **options):
+        recipients = max(1, options['recipients'])
+        purchases = build_benchmark_purchases(recipients)
+        campaign = build_benchmark_campaign()
+
+        self.stdout.write(f'Rendering {recipients} mails per run...')
+
+        def uncached_campaign(purchase):
+            email_core._template_cache.clear()
+            email_core._render_campaign_parts(campaign, purchase)
+
+        def uncached_confirmation(purchase):
+            email_core._template_cache.clear()
+            email_core._build_confirmation_parts(purchase, None, None)
+
+        tpl = email_core._load_template_settings()
+        email_core._template_cache.clear()
+
+        results = [
+            ('campaign', self._run(purchases, uncached_campaign),
+             self._run(purchases, lambda p: email_core._render_campaign_parts(campaign, p, tpl))),
+            ('confirmation', self._run(purchases, uncached_confirmation),
+             self._run(purchases, lambda p: email_core._build_confirmation_parts(p, None, None, tpl))),
+        ]
+
+        for label, before, after in results:
+            speedup = before / after if after else 0
+            self.stdout.write(
+                f'  {label:<13} before: {before / recipients * 1000:.3f} ms/mail '
+                f'({before:.2f} s total)   after: {after / recipients * 1000:.3f} ms/mail '
+                f'({after:.2f} s total)   speedup: {speedup:.1f}x'
+            )
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
+
+    @staticmethod
+    def _run(purchases, render_one) -> float:
+        start = time.perf_counter()
+        for purchase in purchases:
+            render_one(purchase)
+        return time.perf_counter() - start
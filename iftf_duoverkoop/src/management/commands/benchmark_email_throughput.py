@@ -0,0 +1,115 @@
+"""
+Management command to measure end-to-end email throughput against the fake Mailgun server.
+
+Renders and posts confirmation mails (with ICS attachment and inline logo)
+and campaign mails to an in-process FakeMailgunServer, then reports emails
+per second.  Nothing is written to the database except the template settings
+row, which is created on first use.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from iftf_duoverkoop.src.core import email as email_core
+from iftf_duoverkoop.src.email.fake_mailgun import FakeMailgunConfig, FakeMailgunServer
+from iftf_duoverkoop.src.management.commands._benchmark_data import (
+    build_benchmark_campaign,
+    build_benchmark_purchases,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark emails/second for confirmation mails and campaigns using a local fake Mailgun server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=500, help='Mails to send per scenario (default: 500).')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel confirmation senders, like concurrent sales (default: 8).')
+        parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated Mailgun latency per call (default: 20).')
+        parser.add_argument('--jitter-ms', type=float, default=10.0, help='Random extra latency per call (default: 10).')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of calls answered with HTTP 429.')
+        parser.add_argument('--server-error-rate', type=float, default=0.0, help='Fraction of calls answered with HTTP 500.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the fake server (default: 1).')
+        parser.add_argument(
+            '--scenario', choices=['all', 'confirmation', 'campaign'], default='all',
+            help='Which pipeline to measure (default: all).',
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options['emails'])
+        concurrency = max(1, options['concurrency'])
+        purchases = build_benchmark_purchases(count)
+        campaign = build_benchmark_campaign()
+        tpl = email_core._load_template_settings()
+
+        config = FakeMailgunConfig(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            rate_limit_rate=options['rate_limit_rate'],
+            server_error_rate=options['server_error_rate'],
+            seed=options['seed'],
+        )
+
+        with FakeMailgunServer(config=config) as server, override_settings(
+            MAILGUN_API_BASE_URL=server.base_url,
+            MAILGUN_API_KEY='fake-key',
+            MAILGUN_DOMAIN='benchmark.local',
+            MAILGUN_FROM_EMAIL='no-reply@benchmark.local',
+        ):
+            self.stdout.write(
+                f'Fake Mailgun at {server.base_url} '
+                f"(latency {config.latency_ms:.0f}±{config.jitter_ms:.0f} ms, "
+                f'429 rate {config.rate_limit_rate:.0%}, 500 rate {config.server_error_rate:.0%})'
+            )
+
+            if options['scenario'] in ('all', 'confirmation'):
+                def send_confirmation(purchase):
+                    subject, text_body, html_body = email_core._build_confirmation_parts(purchase, None, None, tpl)
+                    email_core._send_via_mailgun(purchase.email, subject, text_body, html_body, purchase)
+
+                self._report(
+                    f'confirmation (x{concurrency} parallel)', server,
+                    lambda: self._run(purchases, send_confirmation, concurrency),
+                )
+
+            if options['scenario'] in ('all', 'campaign'):
+                def send_campaign_mail(purchase):
+                    subject, text_body, html_body = email_core._render_campaign_parts(campaign, purchase, tpl)
+                    email_core._send_via_mailgun_raw(purchase.email, subject, text_body, html_body, attachments=None)
+
+                self._report(
+                    'campaign (sequential)', server,
+                    lambda: self._run(purchases, send_campaign_mail, 1),
+                )
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
+
+    def _report(self, label: str, server: FakeMailgunServer, run) -> None:
+        server.stats.reset()
+        elapsed, sent, failed = run()
+        stats = server.stats.snapshot()
+        rate = sent / elapsed if elapsed else 0
+        self.stdout.write(
+            f'  {label:<28} {rate:8.1f} emails/s   sent: {sent}   failed: {failed}   '
+            f'elapsed: {elapsed:.2f} s   server: {stats}'
+        )
+
+    @staticmethod
+    def _run(purchases, send_one, concurrency: int) -> tuple[float, int, int]:
+        def attempt(purchase) -> bool:
+            try:
+                send_one(purchase)
+                return True
+            except Exception:
+                return False
+
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(attempt, purchases))
+        else:
+            outcomes = [attempt(purchase) for purchase in purchases]
+        elapsed = time.perf_counter() - start
+        sent = sum(outcomes)
+        return elapsed, sent, len(outcomes) - sent
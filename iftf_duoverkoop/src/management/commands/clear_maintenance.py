@@ -0,0 +1,33 @@
+"""
+Management command to remove a maintenance flag that its restore left behind.
+
+A restore renews the flag while it runs and removes it when it ends.  A flag
+that expired means the restoring process died or hangs; writes stay blocked
+until someone has checked the database and runs this command.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from iftf_duoverkoop.src.core import maintenance
+
+
+class Command(BaseCommand):
+    help = 'Remove the database maintenance flag so write requests are accepted again'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Also remove a flag that has not expired yet, i.e. while a restore may still be running.',
+        )
+
+    def handle(self, *args, **options):
+        state = maintenance.flag_state()
+        if state is None:
+            self.stdout.write('No maintenance flag is set.')
+            return
+        if not state['expired'] and not options['force']:
+            raise CommandError(
+                f"Restore job #{state['job_id']} still renews the maintenance flag; "
+                'wait for it to finish, or pass --force.'
+            )
+        maintenance.clear_maintenance()
+        self.stdout.write(self.style.SUCCESS(f"✓ Removed the maintenance flag of restore job #{state['job_id']}"))
@@ -0,0 +1,47 @@
+"""
+Management command to run a local fake Mailgun API for offline email testing.
+
+Point the app at it with MAILGUN_API_BASE_URL=http://127.0.0.1:<port>.
+"""
+from django.core.management.base import BaseCommand
+
+from iftf_duoverkoop.src.email.fake_mailgun import FakeMailgunConfig, FakeMailgunServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Mailgun /v3/<domain>/messages API (latency and error injection supported)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: 127.0.0.1).')
+        parser.add_argument('--port', type=int, default=8025, help='Port to listen on (default: 8025).')
+        parser.add_argument('--api-key', default='', help='Only accept this API key (default: accept any key).')
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Fixed delay added to every message call.')
+        parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra delay (0..jitter) per call.')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of calls answered with HTTP 429.')
+        parser.add_argument('--server-error-rate', type=float, default=0.0, help='Fraction of calls answered with HTTP 500.')
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help='Fraction of calls that hang until the client times out.')
+        parser.add_argument('--timeout-seconds', type=float, default=30.0, help='How long a "timeout" call hangs (default: 30).')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible error injection.')
+
+    def handle(self, *args, **options):
+        config = FakeMailgunConfig(
+            api_key=options['api_key'],
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            rate_limit_rate=options['rate_limit_rate'],
+            server_error_rate=options['server_error_rate'],
+            timeout_rate=options['timeout_rate'],
+            timeout_seconds=options['timeout_seconds'],
+            seed=options['seed'],
+        )
+        server = FakeMailgunServer(host=options['host'], port=options['port'], config=config)
+        self.stdout.write(self.style.SUCCESS(f'✓ Fake Mailgun listening on {server.base_url}'))
+        self.stdout.write(f'  Set MAILGUN_API_BASE_URL={server.base_url} and any MAILGUN_API_KEY to use it.')
+        self.stdout.write(f'  Counters: GET {server.base_url}/stats   Reset: POST {server.base_url}/stats/reset')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('')
+        finally:
+            server.httpd.server_close()
+            self.stdout.write(f'Final counters: {server.stats.snapshot()}')
@@ -0,0 +1,40 @@
+"""
+Management command to apply the backup retention policy to the backup store.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from iftf_duoverkoop.src.core import backup_store
+
+
+class Command(BaseCommand):
+    help = 'Prune database backups outside the retention policy and delete chunks no backup uses any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-last', type=int, default=None,
+            help=f'Always keep this many newest backups (default: DATABASE_BACKUP_KEEP_LAST={settings.DATABASE_BACKUP_KEEP_LAST}).',
+        )
+        parser.add_argument(
+            '--keep-daily-days', type=int, default=None,
+            help=f'Keep one backup per day for this many days (default: DATABASE_BACKUP_KEEP_DAILY_DAYS={settings.DATABASE_BACKUP_KEEP_DAILY_DAYS}).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed.')
+
+    def handle(self, *args, **options):
+        result = backup_store.apply_retention(
+            keep_last=options['keep_last'],
+            keep_daily_days=options['keep_daily_days'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would prune' if options['dry_run'] else 'Pruned'
+        for filename in result['pruned']:
+            self.stdout.write(f'  {verb} {filename}')
+
+        usage = backup_store.usage()
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {verb} {len(result['pruned'])} backup(s); {result['chunks_removed']} chunk(s), "
+            f"{filesizeformat(result['bytes_freed'])} freed. "
+            f"{usage['backups']} backup(s) remain, {filesizeformat(usage['stored_bytes'])} on disk."
+        ))
@@ -0,0 +1,49 @@
+"""
+Management command that runs queued background jobs outside the web process.
+
+Set JOB_RUNNER=worker on the web service so it only queues backups,
+restores, email campaigns and resends, and run this command next to it.
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from iftf_duoverkoop.src.core import jobs
+from iftf_duoverkoop.src.core.job_worker import JobWorker
+
+
+class Command(BaseCommand):
+    help = 'Claim and run queued database operations, email campaigns and email resend jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=2,
+            help='Email jobs running at the same time (default: 2). Database operations always run one at a time.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds between checks for newly queued jobs while idle (default: 5).',
+        )
+        parser.add_argument(
+            '--shutdown-timeout', type=float, default=30.0,
+            help='Seconds to let running jobs finish on SIGTERM before handing them back (default: 30).',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run everything that is queued, wait for it to finish and exit.',
+        )
+
+    def handle(self, *args, **options):
+        if not jobs.runs_in_worker():
+            self.stdout.write(self.style.WARNING(
+                'JOB_RUNNER is not "worker": the web process also starts jobs in threads. '
+                'Set JOB_RUNNER=worker on the web service.'
+            ))
+
+        worker = JobWorker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(f'Job worker {worker.worker_id} running (lease {jobs.lease_seconds()}s).')
+        worker.run(once=options['once'], shutdown_timeout=options['shutdown_timeout'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Job worker stopped after {worker.completed} job(s).'))
@@ -1,26 +1,35 @@
 """
 views/api.py – Internal JSON API endpoints consumed by the front-end JS.
+
+The endpoints are read-only and polled, so they are async views using the
+async ORM: under ASGI a waiting request does not hold a worker (see README,
+"Running under ASGI").  Under WSGI Django runs them to completion per request
+as before.  Their decorators come from core/async_views.py.
 """
-from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, JsonResponse
-from django.views.decorators.http import require_GET
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponseNotModified, JsonResponse
+from django.utils.cache import quote_etag
 
 from iftf_duoverkoop.src import db
+from iftf_duoverkoop.src.core import order_bootstrap
+from iftf_duoverkoop.src.core.async_views import login_required, require_GET
 
 
 @login_required
-def db_info(request: HttpRequest) -> JsonResponse:
+async def db_info(request: HttpRequest) -> JsonResponse:
     """Return the database engine type (SQLite, PostgreSQL, …)."""
     from django.db import connection
     return JsonResponse({"database_type": connection.vendor})
 
 
 @login_required
-def get_performances_by_association(request: HttpRequest, association_name: str) -> JsonResponse:
+async def get_performances_by_association(request: HttpRequest, association_name: str) -> JsonResponse:
     """Return all performances for a given association (used by filter dropdowns)."""
     try:
-        association = db.get_association(association_name)
-        performances = db.get_performances_by_association()[association]
+        association = await db.aget_association(association_name)
+        performances = (await db.aget_performances_by_association())[association]
         return JsonResponse({'performances': [
             {'key': p.key, 'name': p.selection()} for p in performances
         ]})
@@ -29,7 +38,7 @@ def get_performances_by_association(request: HttpRequest, association_name: str)
 
 
 @login_required
-def get_performance_prices(request: HttpRequest) -> JsonResponse:
+async def get_performance_prices(request: HttpRequest) -> JsonResponse:
     """
     Return a {key: {price, discounted_price}} map for all performances.
 
@@ -42,7 +51,7 @@ def get_performance_prices(request: HttpRequest) -> JsonResponse:
                 'price': float(p.price),
                 'discounted_price': float(p.discounted_price) if p.discounted_price is not None else None,
             }
-            for p in db.get_all_performances()
+            for p in await db.aget_all_performances()
             if p.tickets_left() > 0
         }})
     except Exception as e:
@@ -51,7 +60,7 @@ def get_performance_prices(request: HttpRequest) -> JsonResponse:
 
 @login_required
 @require_GET
-def get_availability(request: HttpRequest) -> JsonResponse:
+async def get_availability(request: HttpRequest) -> JsonResponse:
     """
     Return current ticket availability for every performance.
 
@@ -72,14 +81,45 @@ def get_availability(request: HttpRequest) -> JsonResponse:
         }
     """
     try:
-        performances = {
-            p.key: {
-                'tickets_left': p.tickets_left(),
-                'max_tickets': p.max_tickets,
-            }
-            for p in db.get_all_performances()
+        return JsonResponse({'performances': order_bootstrap.availability(await db.aget_all_performances())})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@require_GET
+async def get_order_bootstrap(request: HttpRequest) -> JsonResponse:
+    """
+    Return everything the order page's scripts need in one response.
+
+    ``?catalog=<version>`` leaves out catalog and prices while they are
+    unchanged.  The response carries an ETag, so a poll that finds nothing
+    new is answered with an empty 304.
+
+    Response shape (see core/order_bootstrap.py):
+        {
+            "catalog_version": "<digest>",
+            "catalog":         {"associations": [...], "performances": {...}} | null,
+            "prices":          {"<key>": {"price", "discounted_price"}} | null,
+            "availability":    {"<key>": {"tickets_left", "max_tickets"}},
+            "last_customer":   {"name", "email"} | null
         }
-        return JsonResponse({'performances': performances})
+    """
+    try:
+        payload = order_bootstrap.build_bootstrap(
+            await db.aget_performances_by_association(),
+            # The session backend is sync; usually it is loaded already by RoleCacheMiddleware.
+            await sync_to_async(request.session.get)('last_customer'),
+            known_catalog_version=request.GET.get('catalog') or None,
+        )
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+    response = JsonResponse(payload)
+    etag = quote_etag(hashlib.sha256(response.content).hexdigest()[:32])
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    response['ETag'] = etag
+    # Availability and the session's last customer change between requests: revalidate every time.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -48,5 +48,8 @@ def logout_view(request: HttpRequest) -> HttpResponse:
     username = request.user.username
     auth_logout(request)
     messages.info(request, _('login.logout_success') % {'username': username})
-    return redirect('login')
+    response = redirect('login')
+    # Drops the offline verify bundle (localStorage) and the offline page's service worker.
+    response['Clear-Site-Data'] = '"storage"'
+    return response
 
@@ -7,18 +7,42 @@ from datetime import datetime
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required, permission_required
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404
+from django.utils.dateparse import parse_date
 from django.utils.translation import gettext as _
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 
-from iftf_duoverkoop.src.core.models import Purchase
+from iftf_duoverkoop.src.core.models import Association, EmailResendJob, Purchase
 from iftf_duoverkoop.src.core.auth import get_client_ip, log_purchase_action, can_edit_purchases
-from iftf_duoverkoop.src.core.email import send_confirmation_email_async, build_confirmation_message
+from iftf_duoverkoop.src.core.email import (
+    build_confirmation_message,
+    create_confirmation_resend_job,
+    send_confirmation_email_async,
+    send_confirmation_resend_job_async,
+)
 from iftf_duoverkoop.src import db
+from iftf_duoverkoop.src.core import order_bootstrap
 
 STUDENT_ID_RE = re.compile(r'^r\d{7}$', re.IGNORECASE)
 
+# Translated strings used by static/js/purchase_history.js, by their JS name.
+_PAGE_STRINGS = (
+    ('extraChargeRequired', 'purchase_historypage.extra_charge_required'),
+    ('refundDue', 'purchase_historypage.refund_due'),
+    ('noPriceChange', 'purchase_historypage.no_price_change'),
+    ('errorOccurred', 'error.generic_error'),
+    ('resendConfirmAlreadySent', 'purchase_historypage.resend_email_confirm_already_sent'),
+    ('resendSuccess', 'purchase_historypage.resend_email_success'),
+    ('resendFailed', 'purchase_historypage.resend_email_failed'),
+    ('discountApplied', 'purchase_historypage.discount_applied'),
+    ('resendFailedProgress', 'purchase_historypage.resend_failed_progress'),
+    ('resendFailedNone', 'purchase_historypage.resend_failed_none'),
+    ('filterAllPerformances', 'purchase_historypage.filter_all_performances'),
+    ('deleteConfirm', 'purchase_historypage.delete_confirm'),
+)
+
 
 @login_required
 @permission_required('iftf_duoverkoop.view_purchase', raise_exception=True)
@@ -29,13 +53,24 @@ def purchase_history(request: HttpRequest) -> HttpResponse:
     All users with view_purchase can see the list.
     Edit/delete controls are only shown when the user also has change_purchase.
     """
+    user_can_edit = can_edit_purchases(request.user)
+    # Sold-out performances cannot be picked when editing, as on the order page.
+    available = [p for p in db.get_all_performances() if p.tickets_left() > 0]
     return render(request, 'purchase_history/purchase_history.html', {
         'purchases': Purchase.objects.all().order_by('-date'),
-        'available_performances': db.get_readable_keyed_performances(),
+        'available_performances': [(p.key, p.selection()) for p in available],
         'associations': db.get_all_associations(),
-        'user_can_edit': can_edit_purchases(request.user),
+        'user_can_edit': user_can_edit,
         'send_emails_enabled': settings.SEND_EMAILS,
         'email_status_choices': Purchase.EMAIL_STATUS_CHOICES,
+        'failed_email_count': Purchase.objects.filter(email_status=Purchase.EMAIL_FAILED).count(),
+        # Serialised with json_script for static/js/purchase_history.js.
+        'page_config': {
+            'userCanEdit': user_can_edit,
+            'sendEmailsEnabled': settings.SEND_EMAILS,
+            'prices': order_bootstrap.prices(available),
+            'strings': {name: _(msgid) for name, msgid in _PAGE_STRINGS},
+        },
     })
 
 
@@ -127,10 +162,6 @@ def edit_purchase(request: HttpRequest, purchase_id: int) -> JsonResponse:
         purchase.student_id = student_id if has_culture_card else ''
         purchase.modified_by = request.user
         purchase.modified_date = datetime.now()
-        purchase.save()
-
-        # Compute new price using updated purchase state
-        new_price = purchase.total_price()
 
         after_state = {
             'name': purchase.name,
@@ -141,15 +172,21 @@ def edit_purchase(request: HttpRequest, purchase_id: int) -> JsonResponse:
             'student_id': purchase.student_id,
         }
 
-        log_purchase_action(
-            purchase=purchase, action='UPDATE',
-            user=request.user, ip_address=get_client_ip(request),
-            changes={
-                'before': before_state,
-                'after': after_state,
-                'diff': diff,
-            },
-        )
+        # The audit entry is only written if the update commits.
+        with transaction.atomic():
+            purchase.save()
+            log_purchase_action(
+                purchase=purchase, action='UPDATE',
+                user=request.user, ip_address=get_client_ip(request),
+                changes={
+                    'before': before_state,
+                    'after': after_state,
+                    'diff': diff,
+                },
+            )
+
+        # Compute new price using updated purchase state
+        new_price = purchase.total_price()
 
         price_difference = new_price - original_price
         return JsonResponse({
@@ -175,12 +212,14 @@ def delete_purchase(request: HttpRequest, purchase_id: int) -> JsonResponse:
     """
     try:
         purchase = get_object_or_404(Purchase, id=purchase_id)
-        # log_purchase_action auto-builds {'final_state': <snapshot>} for DELETE
-        log_purchase_action(
-            purchase=purchase, action='DELETE',
-            user=request.user, ip_address=get_client_ip(request),
-        )
-        purchase.delete()
+        # The audit entry is dropped again if the delete fails.
+        with transaction.atomic():
+            # log_purchase_action auto-builds {'final_state': <snapshot>} for DELETE
+            log_purchase_action(
+                purchase=purchase, action='DELETE',
+                user=request.user, ip_address=get_client_ip(request),
+            )
+            purchase.delete()
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -215,3 +254,75 @@ def resend_email(request: HttpRequest, purchase_id: int) -> JsonResponse:
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+
+def _resend_job_payload(job: EmailResendJob) -> dict:
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'total': job.total_count,
+        'sent': job.sent_count,
+        'failed': job.failed_count,
+        'done': job.status not in (EmailResendJob.STATUS_QUEUED, EmailResendJob.STATUS_RUNNING),
+        'error': job.error_message,
+    }
+
+
+@require_POST
+@login_required
+@permission_required('iftf_duoverkoop.change_purchase', raise_exception=True)
+def resend_failed_emails(request: HttpRequest) -> JsonResponse:
+    """
+    Resend every FAILED confirmation email, optionally limited by date range and association.
+
+    Expects JSON: { "date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD", "associations": [<name>, …] }
+    (all keys optional).  The mails are sent by a background job at
+    EMAIL_RESEND_RATE_PER_SECOND; poll resend_job_status for progress.
+
+    Returns JSON:
+        { "success": true, "job_id": <id|null>, "total": <n>, … }   on dispatch
+        { "success": false, "error": "…" }                          on error
+    """
+    if not settings.SEND_EMAILS:
+        return JsonResponse(
+            {'success': False, 'error': _('purchase_history.resend_email_disabled')},
+            status=400,
+        )
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not isinstance(data.get('associations') or [], list):
+        return JsonResponse({'success': False, 'error': _('error.generic_error')}, status=400)
+    try:
+        date_from = parse_date(data.get('date_from') or '')
+        date_to = parse_date(data.get('date_to') or '')
+        association_ids = [str(a) for a in data.get('associations') or []]
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': _('error.generic_error')}, status=400)
+    if Association.objects.filter(pk__in=association_ids).count() != len(set(association_ids)):
+        return JsonResponse({'success': False, 'error': _('error.generic_error')}, status=400)
+
+    try:
+        job = create_confirmation_resend_job(
+            request.user,
+            date_from=date_from,
+            date_to=date_to,
+            association_ids=association_ids,
+        )
+        if job.total_count:
+            send_confirmation_resend_job_async(job)
+        else:
+            EmailResendJob.objects.filter(pk=job.pk).update(status=EmailResendJob.STATUS_SUCCEEDED)
+            job.status = EmailResendJob.STATUS_SUCCEEDED
+        return JsonResponse({'success': True, **_resend_job_payload(job)})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_GET
+@login_required
+@permission_required('iftf_duoverkoop.change_purchase', raise_exception=True)
+def resend_job_status(request: HttpRequest, job_id: int) -> JsonResponse:
+    """Return progress of a bulk resend job started with resend_failed_emails."""
+    job = get_object_or_404(EmailResendJob, id=job_id)
+    return JsonResponse({'success': True, **_resend_job_payload(job)})
@@ -7,6 +7,7 @@ from typing import Optional
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import HttpResponseServerError, HttpResponse, JsonResponse, HttpRequest
 from django.shortcuts import render, redirect
 from django.urls import reverse
@@ -15,6 +16,7 @@ from django.views.decorators.http import require_http_methods
 
 from iftf_duoverkoop.src.forms.order import OrderForm
 from iftf_duoverkoop.src import db
+from iftf_duoverkoop.src.core import order_bootstrap
 from iftf_duoverkoop.src.core.auth import get_client_ip, log_purchase_action, is_association_rep
 from iftf_duoverkoop.src.core.email import send_confirmation_email_async, build_confirmation_message
 
@@ -35,37 +37,51 @@ def order(request: HttpRequest) -> HttpResponse:
         )
 
     form = _process_order_form(request, None, None)
+    # One query: the performances come with their sales counts (db.with_tickets_sold).
     performances_by_association = db.get_performances_by_association()
 
-    # Build the initial availability snapshot that seeds the JS polling cache.
-    # We collect it here (alongside the template data) so we only call
-    # tickets_left() once per performance rather than twice.
-    # Passed as a plain dict; the template's json_script tag handles safe
-    # serialisation and HTML-escaping.
-    availability_seed: dict[str, dict] = {}
-
     for association, performances in performances_by_association.items():
-        for performance in performances:
-            left = performance.tickets_left()
-            performance.availability_percentage = (
-                left / performance.max_tickets * 100
-            ) if performance.max_tickets > 0 else 0
-            availability_seed[performance.key] = {
-                'tickets_left': left,
-                'max_tickets': performance.max_tickets,
-            }
         unique_names = sorted({p.name for p in performances})
         association.unique_performance_names = unique_names
 
+    # Prices, availability and the last customer are embedded in the page, so
+    # the scripts start without extra requests; the poll loop then refreshes
+    # them from /api/order-bootstrap/.  The tiles are rendered here, so the
+    # catalog itself is left out.
+    bootstrap = order_bootstrap.build_bootstrap(performances_by_association, request.session.get('last_customer'))
+    bootstrap['catalog'] = None
+
     return render(request, 'order/order.html', {
         'form': form,
         'performances': performances_by_association,
-        # The json_script template tag serialises this dict into a safe
-        # <script type="application/json"> block on the page.
-        'availability_seed': availability_seed,
+        # Key of the cached tile fragment in order/overview.html.
+        'catalog_version': bootstrap['catalog_version'],
+        # The json_script template tag serialises these dicts into safe
+        # <script type="application/json"> blocks for static/js/order.js.
+        'bootstrap': bootstrap,
+        'page_config': _page_config(form),
     })
 
 
+def _page_config(form: OrderForm) -> dict:
+    """URLs, form field ids and translated strings for static/js/order.js."""
+    return {
+        'bootstrapUrl': reverse('get_order_bootstrap'),
+        'fields': {
+            'performance1': form['performance1'].id_for_label,
+            'performance2': form['performance2'].id_for_label,
+            'hasCultureCard': form['has_culture_card'].id_for_label,
+            'studentId': form['student_id'].id_for_label,
+            'name': form['name'].id_for_label,
+            'email': form['email'].id_for_label,
+        },
+        'strings': {
+            'soldOut': _('orderpage.sold_out'),
+            'soldOutDeselected': _('orderpage.availability.soldout_deselected'),
+        },
+    }
+
+
 def _process_order_form(
     request: HttpRequest,
     performance_1: Optional[str],
@@ -80,23 +96,25 @@ def _process_order_form(
         form = OrderForm(request.POST)
         if form.is_valid():
             clean = form.cleaned_data
-            purchase = db.handle_purchase(
-                clean['name'],
-                clean['email'],
-                clean['performance1'],
-                clean['performance2'],
-                created_by=request.user,
-                has_culture_card=clean.get('has_culture_card', False),
-                student_id=clean.get('student_id', ''),
-            )
-
-            log_purchase_action(
-                purchase=purchase,
-                action='CREATE',
-                user=request.user,
-                ip_address=get_client_ip(request),
-                # changes=None → helper auto-builds {'state': <full snapshot>}
-            )
+            # The audit entry is only written if the purchase commits.
+            with transaction.atomic():
+                purchase = db.handle_purchase(
+                    clean['name'],
+                    clean['email'],
+                    clean['performance1'],
+                    clean['performance2'],
+                    created_by=request.user,
+                    has_culture_card=clean.get('has_culture_card', False),
+                    student_id=clean.get('student_id', ''),
+                )
+
+                log_purchase_action(
+                    purchase=purchase,
+                    action='CREATE',
+                    user=request.user,
+                    ip_address=get_client_ip(request),
+                    # changes=None → helper auto-builds {'state': <full snapshot>}
+                )
 
             subject, message = build_confirmation_message(purchase)
 
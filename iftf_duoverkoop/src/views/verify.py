@@ -1,15 +1,19 @@
 """
-views/verify.py – Verification code lookup page.
+views/verify.py – Verification code lookup page, its offline counterpart and
+the check-in API for door scanners.
 """
+import json
+
 from django.contrib.auth.decorators import login_required, permission_required
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import render
 from django.utils.translation import gettext as _
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_GET, require_http_methods
 
-from iftf_duoverkoop.src.core.models import Purchase, Performance
-from iftf_duoverkoop.src.core.auth import is_association_rep
-from iftf_duoverkoop.src.core.verification_codes import validate_code_format, normalize_code
+from iftf_duoverkoop.src.core import async_views, checkin, offline_bundle
+from iftf_duoverkoop.src.core.models import Association, Performance, Purchase
+from iftf_duoverkoop.src.core.auth import get_user_roles
+from iftf_duoverkoop.src.core.verification_codes import validate_code_format, normalize_code, suggest_codes
 
 
 @login_required
@@ -31,27 +35,25 @@ def verify_code(request: HttpRequest) -> HttpResponse:
     error_message = None
     error_type = None   # 'wrong_performance' | 'wrong_association' | 'not_found'
     wrong_performances = []  # filled for case 2
+    suggestions = []  # near-miss codes for an unknown or malformed code
     code = None
-    is_rep = is_association_rep(request.user)
+    roles = get_user_roles(request)
+    is_rep = roles.is_association_rep
 
-    # Fetch the rep's association and performances (empty for non-reps)
+    # The rep's association and performances come from the session role
+    # cache (empty for non-reps; no profile → behaves like support staff).
     rep_association = None
     rep_performances = []
-    if is_rep:
-        try:
-            profile = request.user.association_rep_profile
-            rep_association = profile.association
-            rep_performances = list(
-                Performance.objects.filter(association=rep_association).order_by('date')
-            )
-        except Exception:
-            pass  # no profile set → behaves like a support-staff member
+    if is_rep and roles.rep_association_id:
+        rep_association = roles.association()
+        rep_performances = roles.performances()
 
     selected_performance_key = None
     ticket_display = []
 
     if request.method == 'POST':
-        code = request.POST.get('verification_code', '').strip()
+        # A "did you mean" button submits its code as ``suggestion``.
+        code = (request.POST.get('suggestion') or request.POST.get('verification_code', '')).strip()
         selected_performance_key = request.POST.get('performance_key', '').strip() or None
 
         if not code:
@@ -67,18 +69,17 @@ def verify_code(request: HttpRequest) -> HttpResponse:
 
                 if is_rep and rep_association:
                     # Determine which (if any) tickets belong to this association
-                    assoc_tickets = [
-                        t for t in (found_purchase.ticket1, found_purchase.ticket2)
-                        if t.association == rep_association
-                    ]
+                    tickets = (found_purchase.ticket1, found_purchase.ticket2)
+                    outcome, own_keys = checkin.classify(
+                        [(t.key, t.association_id) for t in tickets], selected_performance_key, rep_association.pk,
+                    )
+                    assoc_tickets = [t for t in tickets if t.key in own_keys]
 
-                    if not assoc_tickets:
+                    if outcome == checkin.OUTCOME_WRONG_ASSOCIATION:
                         # The code exists but is not for this association at all
                         error_type = 'wrong_association'
                         error_message = _('verify.error_wrong_association')
-                    elif selected_performance_key and any(
-                        t.key == selected_performance_key for t in assoc_tickets
-                    ):
+                    elif outcome == checkin.OUTCOME_VALID:
                         # Code is valid for the selected performance ✓
                         purchase = found_purchase
                         # Build per-ticket display classification:
@@ -110,12 +111,18 @@ def verify_code(request: HttpRequest) -> HttpResponse:
                 error_type = 'not_found'
                 error_message = _('verify.error_not_found')
 
+        if error_type == 'not_found' or (code and not validate_code_format(code)):
+            # Reps only get codes with a ticket for their own association.
+            scope = checkin.association_purchases(rep_association.pk) if is_rep and rep_association else None
+            suggestions = suggest_codes([code], scope)[code]
+
     return render(request, 'verification/verify_code.html', {
         'purchase': purchase,
         'ticket_display': ticket_display,
         'error_message': error_message,
         'error_type': error_type,
         'wrong_performances': wrong_performances,
+        'suggestions': suggestions,
         'code': code,
         'is_rep': is_rep,
         'rep_association': rep_association,
@@ -123,3 +130,131 @@ def verify_code(request: HttpRequest) -> HttpResponse:
         'selected_performance_key': selected_performance_key,
     })
 
+
+
+# ---------------------------------------------------------------------------
+# Offline verification (see core/offline_bundle.py)
+# ---------------------------------------------------------------------------
+
+def _offline_association(request: HttpRequest) -> str | None:
+    """Reps always verify for their own association; support staff choose one."""
+    roles = get_user_roles(request)
+    if roles.is_association_rep and roles.rep_association_id:
+        return roles.rep_association_id
+    requested = request.GET.get('association', '').strip()
+    if requested and Association.objects.filter(pk=requested).exists():
+        return requested
+    return None
+
+
+@login_required
+@permission_required('iftf_duoverkoop.verify_purchase', raise_exception=True)
+@require_GET
+def offline_verify(request: HttpRequest) -> HttpResponse:
+    """
+    Verify page that keeps working without a connection.
+
+    The page downloads its association's bundle, keeps it in localStorage and
+    checks codes against it in the browser; a service worker serves the page
+    itself when the venue network is down.
+    """
+    roles = get_user_roles(request)
+    is_rep = roles.is_association_rep and roles.rep_association_id
+    return render(request, 'verification/offline_verify.html', {
+        'association_name': roles.rep_association_id if is_rep else None,
+        'associations': [] if is_rep else list(Association.objects.order_by('name').values_list('name', flat=True)),
+    })
+
+
+@login_required
+@permission_required('iftf_duoverkoop.verify_purchase', raise_exception=True)
+@require_GET
+def offline_verify_bundle(request: HttpRequest) -> JsonResponse:
+    """Full bundle, or a delta when ``?token=`` carries the token of the bundle the page already has."""
+    association_name = _offline_association(request)
+    if association_name is None:
+        return JsonResponse({'error': 'Unknown association.'}, status=400)
+    token = request.GET.get('token')
+    bundle = offline_bundle.build_delta(association_name, token) if token else offline_bundle.build_bundle(association_name)
+    response = JsonResponse(bundle)
+    # Customer names: never cache this in shared or disk caches.
+    response['Cache-Control'] = 'no-store, private'
+    return response
+
+
+@require_GET
+def offline_verify_service_worker(request: HttpRequest) -> HttpResponse:
+    # Served from /verify/offline/ so its scope covers the offline page.
+    response = render(request, 'verification/offline_verify_sw.js', content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Check-in API (see core/checkin.py)
+# ---------------------------------------------------------------------------
+
+@async_views.login_required
+@async_views.permission_required('iftf_duoverkoop.verify_purchase')
+@async_views.require_POST
+async def check_in(request: HttpRequest) -> JsonResponse:
+    """
+    Verify a batch of scanned codes for one performance and admit the valid ones.
+
+    An async view (see core/async_views.py): scanners at several doors wait
+    on the database without holding a worker each under ASGI.
+
+    Request body (JSON, with the CSRF token in the ``X-CSRFToken`` header):
+        {"performance": "<key>", "codes": ["word-word-word", ...], "admit": true}
+
+    ``code`` may replace ``codes`` for a single scan; ``admit: false`` only
+    verifies.  Reps check in for their own performances; support staff for
+    any performance, against the association that performance belongs to.
+
+    Response shape:
+        {
+            "performance": "<key>",
+            "results": [
+                {"code": "...", "outcome": "valid", "name": "...",
+                 "admission": "admitted" | "already_admitted" | null,
+                 "admitted_at": "<iso>", "admitted_by": "<username>"},
+                {"code": "...", "outcome": "wrong_performance", "performances": ["<key>", ...]},
+                {"code": "...", "outcome": "wrong_association"},
+                {"code": "...", "outcome": "not_found" | "invalid_format", "suggestions": ["<code>", ...]},
+                ...
+            ]
+        }
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON.'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+
+    codes = payload.get('codes', [payload['code']] if 'code' in payload else [])
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        return JsonResponse({'error': '"codes" must be a list of strings.'}, status=400)
+    if len(codes) > checkin.MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'At most {checkin.MAX_BATCH_SIZE} codes per request.'}, status=400)
+    performance_key = str(payload.get('performance', '')).strip()
+
+    roles = get_user_roles(request)
+    if roles.is_association_rep and roles.rep_association_id:
+        # The session role cache already knows the rep's performances.
+        if performance_key not in {key for key, _name, _date in roles.rep_performances}:
+            return JsonResponse({'error': 'Unknown performance.'}, status=400)
+        association_id = roles.rep_association_id
+    else:
+        association_id = await (
+            Performance.objects.filter(pk=performance_key).values_list('association_id', flat=True).afirst()
+        )
+        if association_id is None:
+            return JsonResponse({'error': 'Unknown performance.'}, status=400)
+
+    results = await checkin.acheck_in(
+        codes, performance_key, association_id, request.user, admit=payload.get('admit', True) is not False,
+    )
+    response = JsonResponse({'performance': performance_key, 'results': results})
+    response['Cache-Control'] = 'no-store, private'
+    return response
@@ -0,0 +1,402 @@
+/*
+ * Order page: tile selection, price total and live availability.
+ *
+ * Served as a hashed static file (CompressedManifestStaticFilesStorage), so
+ * browsers cache it for good; everything page-specific comes from the
+ * json_script blocks rendered by views/order.py.
+ */
+(function () {
+    'use strict';
+
+    // -----------------------------------------------------------------------
+    // Page data, embedded by the server with json_script:
+    //   order-page-config  URLs, form field ids and translated strings
+    //   order-bootstrap    prices, availability and last customer (see
+    //                      core/order_bootstrap.py), refreshed by the poll
+    //                      loop from /api/order-bootstrap/
+    // -----------------------------------------------------------------------
+    function readJson(id) {
+        try {
+            const el = document.getElementById(id);
+            return JSON.parse(el ? el.textContent : '{}');
+        } catch (e) {
+            console.warn('Could not parse ' + id + ':', e);
+            return {};
+        }
+    }
+
+    const config = readJson('order-page-config');
+    const fields = config.fields || {};
+    const strings = config.strings || {};
+    const bootstrap = readJson('order-bootstrap');
+
+    // Sent back on every poll; prices are only re-sent when it changed.
+    let catalogVersion = bootstrap.catalog_version || '';
+
+    // Performance prices (used for the total-price display in the form)
+    let performancePrices = bootstrap.prices || {};
+
+    // Availability state, filled from the bootstrap payload on DOM ready
+    // Shape: { "<key>": { tickets_left: <int>, max_tickets: <int> } }
+    const availabilityCache = {};
+
+    // -----------------------------------------------------------------------
+    // Helpers: classify a performance tile based on availability
+    // -----------------------------------------------------------------------
+    const AVAIL_CLASSES = [
+        'performance-high-availability',
+        'performance-medium-availability',
+        'performance-low-availability',
+    ];
+
+    function availabilityClass(ticketsLeft, maxTickets) {
+        if (maxTickets <= 0) return 'performance-high-availability';
+        const pct = ticketsLeft / maxTickets * 100;
+        if (pct > 50)  return 'performance-high-availability';
+        if (pct > 25)  return 'performance-medium-availability';
+        return 'performance-low-availability';
+    }
+
+    // -----------------------------------------------------------------------
+    // Flash animation helper
+    // Applies a CSS animation class, then removes it after it finishes so it
+    // can be replayed on subsequent updates.
+    // -----------------------------------------------------------------------
+    function flashTile(el, soldOutSelected) {
+        const cls = soldOutSelected ? 'availability-soldout-selected' : 'availability-changed';
+        // Remove first in case a previous animation hasn't cleaned up yet
+        el.classList.remove('availability-changed', 'availability-soldout-selected');
+        // Force a reflow so the browser re-triggers the animation
+        void el.offsetWidth;
+        el.classList.add(cls);
+        el.addEventListener('animationend', () => el.classList.remove(cls), { once: true });
+    }
+
+    // -----------------------------------------------------------------------
+    // Show sold-out warning banner
+    // -----------------------------------------------------------------------
+    function showSoldOutWarning(performanceName) {
+        const banner = document.getElementById('soldOutWarning');
+        const text   = document.getElementById('soldOutWarningText');
+        if (!banner || !text) return;
+        text.textContent = ' "' + performanceName + '" ' + strings.soldOutDeselected;
+        banner.classList.remove('d-none');
+    }
+
+    // -----------------------------------------------------------------------
+    // Convert a live button tile into a sold-out span (mirrors the server-
+    // rendered markup from overview.html so a page refresh looks identical)
+    // -----------------------------------------------------------------------
+    function convertTileToSoldOut(btn) {
+        const span = document.createElement('span');
+        span.className = 'performance-badge performance-sold-out-sm';
+        span.dataset.performanceKey = btn.dataset.performanceKey;
+        span.title = strings.soldOut;
+        // Preserve the label (date etc.) but append the sold-out label
+        const label = document.createElement('small');
+        label.textContent = btn.querySelector('small').textContent;
+        const soldOut = document.createElement('span');
+        soldOut.className = 'd-block text-secondary fw-bold small';
+        soldOut.textContent = strings.soldOut;
+        span.append(label, soldOut);
+        btn.replaceWith(span);
+        return span;
+    }
+
+    // -----------------------------------------------------------------------
+    // Remove a performance key from both <select> dropdowns.
+    // Returns true if it was actually selected in either slot.
+    // -----------------------------------------------------------------------
+    function removeFromSelects(key) {
+        const sel1 = document.getElementById(fields.performance1);
+        const sel2 = document.getElementById(fields.performance2);
+        let wasSelected = false;
+        [sel1, sel2].forEach(sel => {
+            if (!sel) return;
+            if (sel.value === key) {
+                sel.value = '';
+                wasSelected = true;
+            }
+            // Remove the <option> so it can't be re-selected via the dropdown
+            const opt = sel.querySelector('option[value="' + CSS.escape(key) + '"]');
+            if (opt) opt.remove();
+        });
+        return wasSelected;
+    }
+
+    // -----------------------------------------------------------------------
+    // Core diff function – called after each poll response
+    // Compares fresh data against the local cache and updates only changed tiles.
+    // The tiles are rendered (and cached) without availability, so the first
+    // call with ``initial`` fills in every tile, without animations.
+    // -----------------------------------------------------------------------
+    function applyAvailabilityUpdate(freshData, initial) {
+        Object.entries(freshData).forEach(([key, fresh]) => {
+            const cached = availabilityCache[key];
+
+            // Nothing changed – skip
+            if (cached &&
+                cached.tickets_left === fresh.tickets_left &&
+                cached.max_tickets  === fresh.max_tickets) {
+                return;
+            }
+
+            // Update cache immediately
+            availabilityCache[key] = fresh;
+
+            const isSoldOut = fresh.tickets_left <= 0;
+
+            // Find the tile in the DOM (either a button or an existing sold-out span)
+            const tile = document.querySelector('[data-performance-key="' + CSS.escape(key) + '"]');
+            if (!tile) return;
+
+            if (isSoldOut) {
+                // ── Transition to sold out ──────────────────────────────────
+                const wasSelected = removeFromSelects(key);
+
+                if (initial) {
+                    if (tile.tagName === 'BUTTON') convertTileToSoldOut(tile);
+                    return;
+                }
+
+                // Animate before converting (tile may be replaced)
+                if (tile.tagName === 'BUTTON') {
+                    const displayName = tile.querySelector('small')
+                        ? tile.querySelector('small').textContent.trim()
+                        : key;
+
+                    flashTile(tile, wasSelected);
+
+                    // Short delay so the flash is visible before DOM replacement
+                    setTimeout(() => {
+                        // Re-query because the element is still in the DOM at this point
+                        const current = document.querySelector('[data-performance-key="' + CSS.escape(key) + '"]');
+                        if (current && current.tagName === 'BUTTON') {
+                            convertTileToSoldOut(current);
+                        }
+                    }, 300);
+
+                    if (wasSelected) {
+                        showSoldOutWarning(displayName);
+                        updatePriceDisplay(); // recalculate total without this ticket
+                    }
+                }
+            } else {
+                // ── Availability count changed (but not sold out) ───────────
+                // Update the badge counter text
+                const badge = tile.querySelector('.badge');
+                if (badge) {
+                    badge.textContent = fresh.tickets_left + '/' + fresh.max_tickets;
+                }
+
+                // Re-colour the tile
+                AVAIL_CLASSES.forEach(c => tile.classList.remove(c));
+                tile.classList.add(availabilityClass(fresh.tickets_left, fresh.max_tickets));
+
+                if (!initial) flashTile(tile, false);
+            }
+        });
+    }
+
+    // -----------------------------------------------------------------------
+    // Polling loop – fetches /api/order-bootstrap/ every 20 seconds
+    // The browser revalidates with the ETag, so an unchanged poll is a 304.
+    // Failures are swallowed silently (network blip during festival = OK)
+    // -----------------------------------------------------------------------
+    const POLL_INTERVAL_MS = 20_000;
+
+    function pollAvailability() {
+        const url = config.bootstrapUrl + '?catalog=' + encodeURIComponent(catalogVersion);
+        fetch(url, { credentials: 'same-origin' })
+            .then(r => {
+                if (!r.ok) throw new Error('HTTP ' + r.status);
+                return r.json();
+            })
+            .then(data => {
+                if (!data) return;
+                if (data.prices) {
+                    performancePrices = data.prices;
+                    updatePriceDisplay();
+                }
+                catalogVersion = data.catalog_version || catalogVersion;
+                if (data.availability) {
+                    applyAvailabilityUpdate(data.availability);
+                }
+            })
+            .catch(() => {
+                // Silent – a missed poll is harmless; the server validates on submit
+            });
+    }
+
+    // -----------------------------------------------------------------------
+    // Price display
+    // -----------------------------------------------------------------------
+    function updatePriceDisplay() {
+        const perf1Select = document.getElementById(fields.performance1);
+        const perf2Select = document.getElementById(fields.performance2);
+        const priceDisplay = document.getElementById('priceDisplay');
+        const totalPriceEl = document.getElementById('totalPrice');
+        const hasCultureCard = document.getElementById(fields.hasCultureCard)?.checked;
+
+        const perf1Key = perf1Select ? perf1Select.value : '';
+        const perf2Key = perf2Select ? perf2Select.value : '';
+
+        function getEffectivePrice(key) {
+            const info = performancePrices[key];
+            if (!info) return 0;
+            if (hasCultureCard && info.discounted_price !== null) return info.discounted_price;
+            return info.price;
+        }
+
+        let total = 0;
+        let hasDiscount = false;
+        if (perf1Key && performancePrices[perf1Key]) {
+            const p = getEffectivePrice(perf1Key);
+            total += p;
+            if (hasCultureCard && performancePrices[perf1Key].discounted_price !== null) hasDiscount = true;
+        }
+        if (perf2Key && performancePrices[perf2Key]) {
+            const p = getEffectivePrice(perf2Key);
+            total += p;
+            if (hasCultureCard && performancePrices[perf2Key].discounted_price !== null) hasDiscount = true;
+        }
+
+        if (priceDisplay && totalPriceEl) {
+            if (total > 0 || perf1Key || perf2Key) {
+                totalPriceEl.textContent = '€' + total.toFixed(2);
+                if (hasDiscount) {
+                    totalPriceEl.classList.add('text-info');
+                } else {
+                    totalPriceEl.classList.remove('text-info');
+                }
+                priceDisplay.style.display = 'block';
+            } else {
+                priceDisplay.style.display = 'none';
+            }
+        }
+
+        updateTileStates();
+    }
+
+    // -----------------------------------------------------------------------
+    // Tile selected-state highlight
+    // -----------------------------------------------------------------------
+    function updateTileStates() {
+        const perf1Key = document.getElementById(fields.performance1)?.value || '';
+        const perf2Key = document.getElementById(fields.performance2)?.value || '';
+
+        document.querySelectorAll('.performance-btn').forEach(btn => {
+            const key = btn.dataset.performanceKey;
+            if (key === perf1Key || key === perf2Key) {
+                btn.classList.add('performance-selected');
+            } else {
+                btn.classList.remove('performance-selected');
+            }
+        });
+    }
+
+    // -----------------------------------------------------------------------
+    // Slot-cycling selection logic
+    // -----------------------------------------------------------------------
+    let lastUpdatedSlot = null;
+
+    function selectPerformance(performanceKey) {
+        const perf1Select = document.getElementById(fields.performance1);
+        const perf2Select = document.getElementById(fields.performance2);
+
+        // Deselect if already selected
+        if (perf1Select.value === performanceKey) {
+            perf1Select.value = '';
+            lastUpdatedSlot = null;
+            updatePriceDisplay();
+            return;
+        }
+        if (perf2Select.value === performanceKey) {
+            perf2Select.value = '';
+            lastUpdatedSlot = null;
+            updatePriceDisplay();
+            return;
+        }
+
+        if (!perf1Select.value) {
+            perf1Select.value = performanceKey;
+            lastUpdatedSlot = 1;
+        } else if (!perf2Select.value) {
+            perf2Select.value = performanceKey;
+            lastUpdatedSlot = 2;
+        } else if (lastUpdatedSlot === 1) {
+            perf2Select.value = performanceKey;
+            lastUpdatedSlot = 2;
+        } else {
+            perf1Select.value = performanceKey;
+            lastUpdatedSlot = 1;
+        }
+
+        updatePriceDisplay();
+    }
+
+    // -----------------------------------------------------------------------
+    // DOM ready
+    // -----------------------------------------------------------------------
+    document.addEventListener('DOMContentLoaded', function () {
+        // Bootstrap form-control classes
+        document.querySelectorAll('input[type="text"], input[type="email"]')
+            .forEach(el => el.classList.add('form-control'));
+
+        // Student ID field styling
+        const studentIdInput = document.getElementById(fields.studentId);
+        if (studentIdInput) studentIdInput.classList.add('form-control');
+
+        document.querySelectorAll('select').forEach(sel => {
+            sel.classList.add('form-select');
+            sel.addEventListener('change', function () {
+                lastUpdatedSlot = (sel.id === fields.performance1) ? 1 : 2;
+                updatePriceDisplay();
+            });
+        });
+
+        // Culture card toggle
+        const cultureCardCheckbox = document.getElementById(fields.hasCultureCard);
+        const studentIdContainer = document.getElementById('studentIdContainer');
+
+        function toggleStudentId() {
+            if (cultureCardCheckbox && studentIdContainer) {
+                studentIdContainer.style.display = cultureCardCheckbox.checked ? 'block' : 'none';
+            }
+            updatePriceDisplay();
+        }
+
+        if (cultureCardCheckbox) {
+            cultureCardCheckbox.addEventListener('change', toggleStudentId);
+            // Show on page load if already checked (re-render after validation error)
+            toggleStudentId();
+        }
+
+        applyAvailabilityUpdate(bootstrap.availability || {}, true);
+
+        // Tile click handlers
+        document.querySelectorAll('.performance-btn').forEach(btn => {
+            btn.addEventListener('click', function () {
+                selectPerformance(this.dataset.performanceKey);
+            });
+        });
+
+        updatePriceDisplay();
+
+        // Prefill button
+        const lastCustomer = bootstrap.last_customer;
+        if (lastCustomer) {
+            document.getElementById('prefillContainer').style.display = 'block';
+            document.getElementById('prefillBtn').addEventListener('click', function () {
+                document.getElementById(fields.name).value  = lastCustomer.name;
+                document.getElementById(fields.email).value = lastCustomer.email;
+            });
+        }
+
+        // Start polling after the first interval (page just loaded = data is fresh)
+        setTimeout(function tick() {
+            pollAvailability();
+            setTimeout(tick, POLL_INTERVAL_MS);
+        }, POLL_INTERVAL_MS);
+    });
+})();
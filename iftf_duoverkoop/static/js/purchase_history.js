@@ -0,0 +1,397 @@
+/*
+ * Purchase history page: search and filters, edit and delete, and resending
+ * confirmation mails.
+ *
+ * Served as a hashed static file (CompressedManifestStaticFilesStorage), so
+ * browsers cache it for good; everything page-specific comes from the
+ * purchase-history-config json_script block rendered by views/history.py.
+ */
+
+// Page data from views/history.py: permissions, prices and translated strings.
+const config = JSON.parse(document.getElementById('purchase-history-config').textContent);
+const translations = config.strings;
+
+document.addEventListener('DOMContentLoaded', function() {
+    const searchInput = document.getElementById('searchInput');
+    const purchaseItems = document.querySelectorAll('.purchase-item');
+    const filterButtons = document.querySelectorAll('[data-filter]');
+    const associationFilter = document.getElementById('associationFilter');
+    const performanceFilter = document.getElementById('performanceFilter');
+    const emailStatusFilter = document.getElementById('emailStatusFilter');
+    let currentFilter = 'all';
+    // Embedded by the view, format {key: {price, discounted_price}}
+    const performancePrices = config.prices;
+
+    function getEffectivePrice(key, hasCultureCard) {
+        const info = performancePrices[key];
+        if (!info) return 0;
+        if (hasCultureCard && info.discounted_price !== null) return info.discounted_price;
+        return info.price;
+    }
+
+    function allPerformancesOption() {
+        const option = document.createElement('option');
+        option.value = '';
+        option.textContent = translations.filterAllPerformances;
+        return option;
+    }
+
+    // Populate performance filter based on associations
+    associationFilter.addEventListener('change', function() {
+        const selectedAssociation = this.value;
+
+        if (selectedAssociation) {
+            performanceFilter.disabled = false;
+            fetch(`/api/performances-by-association/${selectedAssociation}/`)
+                .then(response => response.json())
+                .then(data => {
+                    performanceFilter.innerHTML = '';
+                    performanceFilter.appendChild(allPerformancesOption());
+                    data.performances.forEach(performance => {
+                        const option = document.createElement('option');
+                        option.value = performance.key;
+                        option.textContent = performance.name;
+                        performanceFilter.appendChild(option);
+                    });
+                });
+        } else {
+            performanceFilter.disabled = true;
+            performanceFilter.innerHTML = '';
+            performanceFilter.appendChild(allPerformancesOption());
+        }
+
+        filterPurchases(searchInput.value.toLowerCase(), currentFilter);
+    });
+
+    searchInput.addEventListener('input', function() {
+        filterPurchases(this.value.toLowerCase(), currentFilter);
+    });
+
+    filterButtons.forEach(button => {
+        button.addEventListener('click', function() {
+            filterButtons.forEach(btn => btn.classList.remove('active'));
+            this.classList.add('active');
+            currentFilter = this.dataset.filter;
+            filterPurchases(searchInput.value.toLowerCase(), currentFilter);
+        });
+    });
+
+    performanceFilter.addEventListener('change', function() {
+        filterPurchases(searchInput.value.toLowerCase(), currentFilter);
+    });
+
+    emailStatusFilter.addEventListener('change', function() {
+        filterPurchases(searchInput.value.toLowerCase(), currentFilter);
+    });
+
+    function filterPurchases(searchTerm, filter) {
+        const today = new Date();
+        const weekAgo = new Date(today.getTime() - 7 * 24 * 60 * 60 * 1000);
+
+        purchaseItems.forEach(item => {
+            const searchText = item.dataset.searchText;
+            const dateStr = item.dataset.date;
+            const itemDate = new Date(dateStr);
+
+            let matchesSearch = searchTerm === '' || searchText.includes(searchTerm);
+            let matchesFilter = true;
+
+            if (filter === 'today') {
+                matchesFilter = dateStr === today.toISOString().split('T')[0];
+            } else if (filter === 'week') {
+                matchesFilter = itemDate >= weekAgo;
+            }
+
+            const associationMatch = associationFilter.value === '' || item.dataset.association1 === associationFilter.value || item.dataset.association2 === associationFilter.value;
+            const performanceMatch = performanceFilter.value === '' || item.dataset.ticket1Key === performanceFilter.value || item.dataset.ticket2Key === performanceFilter.value;
+            const emailStatusMatch = emailStatusFilter.value === '' || item.dataset.emailStatus === emailStatusFilter.value;
+
+            item.style.display = matchesSearch && matchesFilter && associationMatch && performanceMatch && emailStatusMatch ? '' : 'none';
+        });
+    }
+
+    // Resend email functionality
+    document.querySelectorAll('.resend-email-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const purchaseId = this.dataset.purchaseId;
+            const emailStatus = this.dataset.emailStatus;
+
+            if (emailStatus === 'SENT') {
+                if (!confirm(translations.resendConfirmAlreadySent)) {
+                    return;
+                }
+            }
+
+            const button = this;
+            button.disabled = true;
+
+            fetch(`/purchase_history/resend-email/${purchaseId}/`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                button.disabled = false;
+                if (data.success) {
+                    alert(translations.resendSuccess);
+                } else {
+                    alert(data.error || translations.resendFailed);
+                }
+            })
+            .catch(error => {
+                button.disabled = false;
+                console.error('Error:', error);
+                alert(translations.resendFailed);
+            });
+        });
+    });
+
+    if (config.sendEmailsEnabled && config.userCanEdit) {
+        // Bulk resend of failed confirmation emails
+        const resendFailedForm = document.getElementById('resendFailedForm');
+        const resendFailedSubmit = document.getElementById('resendFailedSubmit');
+        const resendProgress = document.getElementById('resendProgress');
+        const resendProgressBar = document.getElementById('resendProgressBar');
+        const resendProgressText = document.getElementById('resendProgressText');
+
+        function showResendProgress(data) {
+            const handled = data.sent + data.failed;
+            const percent = data.total ? Math.round(handled * 100 / data.total) : 100;
+            resendProgress.style.display = '';
+            resendProgressBar.style.width = `${percent}%`;
+            resendProgressBar.classList.toggle('bg-danger', data.done && data.failed > 0);
+            resendProgressBar.classList.toggle('bg-success', data.done && data.failed === 0);
+            resendProgressText.textContent = data.total
+                ? translations.resendFailedProgress
+                    .replace('%(sent)s', data.sent)
+                    .replace('%(failed)s', data.failed)
+                    .replace('%(total)s', data.total)
+                : translations.resendFailedNone;
+        }
+
+        function pollResendJob(jobId) {
+            fetch(`/purchase_history/resend-failed/${jobId}/`)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        throw new Error(data.error);
+                    }
+                    showResendProgress(data);
+                    if (data.done) {
+                        resendFailedSubmit.disabled = false;
+                    } else {
+                        setTimeout(() => pollResendJob(jobId), 2000);
+                    }
+                })
+                .catch(error => {
+                    resendFailedSubmit.disabled = false;
+                    console.error('Error:', error);
+                    alert(translations.resendFailed);
+                });
+        }
+
+        resendFailedForm.addEventListener('submit', function(e) {
+            e.preventDefault();
+            resendFailedSubmit.disabled = true;
+
+            const associations = Array.from(document.getElementById('resendAssociations').selectedOptions)
+                .map(option => option.value);
+
+            fetch('/purchase_history/resend-failed/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                },
+                body: JSON.stringify({
+                    date_from: document.getElementById('resendDateFrom').value,
+                    date_to: document.getElementById('resendDateTo').value,
+                    associations: associations,
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    resendFailedSubmit.disabled = false;
+                    alert(data.error || translations.resendFailed);
+                    return;
+                }
+                showResendProgress(data);
+                if (data.done) {
+                    resendFailedSubmit.disabled = false;
+                } else {
+                    pollResendJob(data.job_id);
+                }
+            })
+            .catch(error => {
+                resendFailedSubmit.disabled = false;
+                console.error('Error:', error);
+                alert(translations.resendFailed);
+            });
+        });
+    }
+
+    if (config.userCanEdit) {
+        // Edit functionality
+        const editModal = new bootstrap.Modal(document.getElementById('editModal'));
+        const editForm = document.getElementById('editForm');
+        let originalPrice = 0;
+
+        // Culture card toggle in edit modal
+        const editCultureCardCheckbox = document.getElementById('editHasCultureCard');
+        const editStudentIdContainer = document.getElementById('editStudentIdContainer');
+        if (editCultureCardCheckbox && editStudentIdContainer) {
+            editCultureCardCheckbox.addEventListener('change', function() {
+                editStudentIdContainer.style.display = this.checked ? 'block' : 'none';
+                updatePriceComparison();
+            });
+        }
+
+        document.querySelectorAll('.edit-btn').forEach(btn => {
+            btn.addEventListener('click', function() {
+                const purchaseId = this.dataset.purchaseId;
+                const card = document.querySelector(`[data-purchase-id="${purchaseId}"]`);
+                const name = card.querySelector('[data-field="name"] strong').textContent;
+                const email = card.querySelector('[data-field="email"]').textContent.trim().replace(/^.*\s/, '');
+
+                document.getElementById('editPurchaseId').value = purchaseId;
+                document.getElementById('editName').value = name;
+                document.getElementById('editEmail').value = email;
+
+                const ticket1Key = this.dataset.ticket1Key;
+                const ticket2Key = this.dataset.ticket2Key;
+                document.getElementById('editPerformance1').value = ticket1Key;
+                document.getElementById('editPerformance2').value = ticket2Key;
+
+                // Restore culture card state
+                const hasCultureCard = card.dataset.hasCultureCard === 'true';
+                editCultureCardCheckbox.checked = hasCultureCard;
+                editStudentIdContainer.style.display = hasCultureCard ? 'block' : 'none';
+                document.getElementById('editStudentId').value = card.dataset.studentId || '';
+
+                // Original price from the data attributes (already effective price)
+                originalPrice = parseFloat(card.dataset.ticket1Price || 0) + parseFloat(card.dataset.ticket2Price || 0);
+
+                const originalPriceDiv = document.getElementById('originalPrice');
+                const newPriceDiv = document.getElementById('newPrice');
+                const priceDifferenceDiv = document.getElementById('priceDifference');
+                const priceMessageDiv = document.getElementById('priceMessage');
+                originalPriceDiv.textContent = '€' + originalPrice.toFixed(2);
+                newPriceDiv.textContent = '€' + originalPrice.toFixed(2);
+                priceDifferenceDiv.textContent = '€0.00';
+                priceMessageDiv.textContent = '';
+                document.getElementById('priceComparison').style.display = 'none';
+
+                editModal.show();
+            });
+        });
+
+        document.getElementById('editPerformance1').addEventListener('change', updatePriceComparison);
+        document.getElementById('editPerformance2').addEventListener('change', updatePriceComparison);
+
+        function updatePriceComparison() {
+            const perf1Key = document.getElementById('editPerformance1').value;
+            const perf2Key = document.getElementById('editPerformance2').value;
+            const hasCultureCard = document.getElementById('editHasCultureCard').checked;
+
+            const newPrice = getEffectivePrice(perf1Key, hasCultureCard) + getEffectivePrice(perf2Key, hasCultureCard);
+            const priceDifference = newPrice - originalPrice;
+
+            const originalPriceDiv = document.getElementById('originalPrice');
+            const newPriceDiv = document.getElementById('newPrice');
+            const priceDifferenceDiv = document.getElementById('priceDifference');
+            const priceMessageDiv = document.getElementById('priceMessage');
+            const priceComparisonDiv = document.getElementById('priceComparison');
+
+            newPriceDiv.textContent = '€' + newPrice.toFixed(2);
+            priceDifferenceDiv.textContent = (priceDifference >= 0 ? '+' : '') + '€' + priceDifference.toFixed(2);
+
+            if (hasCultureCard) {
+                const discountNote = document.createElement('small');
+            }
+
+            if (priceDifference > 0) {
+                priceDifferenceDiv.className = 'h6 mb-0 text-danger';
+                priceMessageDiv.textContent = translations.extraChargeRequired + ' €' + priceDifference.toFixed(2);
+                priceMessageDiv.className = 'mt-2 small text-danger';
+            } else if (priceDifference < 0) {
+                priceDifferenceDiv.className = 'h6 mb-0 text-success';
+                priceMessageDiv.textContent = translations.refundDue + ' €' + Math.abs(priceDifference).toFixed(2);
+                priceMessageDiv.className = 'mt-2 small text-success';
+            } else {
+                priceDifferenceDiv.className = 'h6 mb-0 text-muted';
+                priceMessageDiv.textContent = translations.noPriceChange;
+                priceMessageDiv.className = 'mt-2 small text-muted';
+            }
+
+            if (hasCultureCard) {
+                priceMessageDiv.textContent += ' (' + translations.discountApplied + ')';
+            }
+
+            priceComparisonDiv.style.display = 'block';
+        }
+
+        editForm.addEventListener('submit', function(e) {
+            e.preventDefault();
+
+            const purchaseId = document.getElementById('editPurchaseId').value;
+            const name = document.getElementById('editName').value;
+            const email = document.getElementById('editEmail').value;
+            const ticket1 = document.getElementById('editPerformance1').value;
+            const ticket2 = document.getElementById('editPerformance2').value;
+            const hasCultureCard = document.getElementById('editHasCultureCard').checked;
+            const studentId = document.getElementById('editStudentId').value;
+
+            fetch(`/purchase_history/edit/${purchaseId}/`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                },
+                body: JSON.stringify({ name, email, ticket1, ticket2, has_culture_card: hasCultureCard, student_id: studentId })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    location.reload();
+                } else {
+                    alert(data.error || translations.errorOccurred);
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                alert(translations.errorOccurred);
+            });
+        });
+
+        // Delete functionality
+        document.querySelectorAll('.delete-btn').forEach(btn => {
+            btn.addEventListener('click', function() {
+                if (confirm(translations.deleteConfirm)) {
+                    const purchaseId = this.dataset.purchaseId;
+
+                    fetch(`/purchase_history/delete/${purchaseId}/`, {
+                        method: 'POST',
+                        headers: {
+                            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                        }
+                    })
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.success) {
+                            location.reload();
+                        } else {
+                            alert(data.error || translations.errorOccurred);
+                        }
+                    })
+                    .catch(error => {
+                        console.error('Error:', error);
+                        alert(translations.errorOccurred);
+                    });
+                }
+            });
+        });
+    }
+});
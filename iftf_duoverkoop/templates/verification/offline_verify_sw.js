@@ -0,0 +1,66 @@
+// Service worker for the offline verify page.
+// The page is fetched from the network when possible and from the cache when
+// the venue network is down; its styles and scripts are cached on first use.
+// Bundles are never cached here: the page keeps them in localStorage itself.
+const CACHE_NAME = 'iftf-offline-verify-v1';
+const PAGE_URL = '{% url "offline_verify" %}';
+const BUNDLE_URL = '{% url "offline_verify_bundle" %}';
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then((cache) => cache.add(PAGE_URL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(names.filter((name) => name !== CACHE_NAME).map((name) => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function pageFromNetworkOrCache(request) {
+    const cache = await caches.open(CACHE_NAME);
+    try {
+        const response = await fetch(request);
+        // A redirect means the session expired: show the login page, keep the cached copy.
+        if (response.ok && !response.redirected) {
+            cache.put(PAGE_URL, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(PAGE_URL, { ignoreSearch: true });
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function assetFromCacheOrNetwork(request) {
+    const cache = await caches.open(CACHE_NAME);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET' || new URL(request.url).pathname === BUNDLE_URL) {
+        return;
+    }
+    if (request.mode === 'navigate') {
+        event.respondWith(pageFromNetworkOrCache(request));
+    } else {
+        event.respondWith(assetFromCacheOrNetwork(request));
+    }
+});
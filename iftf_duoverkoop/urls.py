@@ -6,10 +6,16 @@ from django.views.static import serve
 
 from iftf_duoverkoop.src.views.auth import login_view, logout_view
 from iftf_duoverkoop.src.views.order import order, main, get_last_customer
-from iftf_duoverkoop.src.views.history import purchase_history, edit_purchase, delete_purchase, resend_email
+from iftf_duoverkoop.src.views.history import (
+    purchase_history, edit_purchase, delete_purchase, resend_email, resend_failed_emails, resend_job_status,
+)
 from iftf_duoverkoop.src.views.export import export
-from iftf_duoverkoop.src.views.verify import verify_code
-from iftf_duoverkoop.src.views.api import db_info, get_performances_by_association, get_performance_prices, get_availability
+from iftf_duoverkoop.src.views.verify import (
+    verify_code, offline_verify, offline_verify_bundle, offline_verify_service_worker, check_in,
+)
+from iftf_duoverkoop.src.views.api import (
+    db_info, get_performances_by_association, get_performance_prices, get_availability, get_order_bootstrap,
+)
 from iftf_duoverkoop.src.dashboard.urls import urlpatterns as dashboard_urlpatterns
 from iftf_duoverkoop import urls_dev
 
@@ -26,7 +32,13 @@ urlpatterns = [
     path('purchase_history/edit/<int:purchase_id>/', edit_purchase, name='edit_purchase'),
     path('purchase_history/delete/<int:purchase_id>/', delete_purchase, name='delete_purchase'),
     path('purchase_history/resend-email/<int:purchase_id>/', resend_email, name='resend_email'),
+    path('purchase_history/resend-failed/', resend_failed_emails, name='resend_failed_emails'),
+    path('purchase_history/resend-failed/<int:job_id>/', resend_job_status, name='resend_job_status'),
     path('verify/', verify_code, name='verify_code'),
+    path('verify/offline/', offline_verify, name='offline_verify'),
+    path('verify/offline/bundle/', offline_verify_bundle, name='offline_verify_bundle'),
+    path('verify/offline/sw.js', offline_verify_service_worker, name='offline_verify_service_worker'),
+    path('verify/check-in/', check_in, name='check_in'),
     path('export/', export, name='export'),
 
     # Internal JSON API
@@ -35,6 +47,7 @@ urlpatterns = [
     path('api/performance-prices/', get_performance_prices, name='get_performance_prices'),
     path('api/last-customer/', get_last_customer, name='get_last_customer'),
     path('api/availability/', get_availability, name='get_availability'),
+    path('api/order-bootstrap/', get_order_bootstrap, name='get_order_bootstrap'),
 ]
 
 if settings.DEBUG:
@@ -42,9 +55,7 @@ if settings.DEBUG:
         path('--DEBUG--/', include(urls_dev.urls(), namespace='debug')),
     ] + urlpatterns
 
-urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-]
+# Media files are served by MediaFilesMiddleware: only the logos, never the backups under MEDIA_ROOT.
 
 if settings.DEBUG:
     urlpatterns += [